@@ -2,6 +2,10 @@ import os
 from flask import Flask
 from flask_cors import CORS
 from .config import Config
+from .services import client as spotify_client
+from .services import llm
+from .utils import compression, metrics
+from .utils.json_provider import FastJSONProvider
 from .routes.ai_routes import bp as ai_routes_bp
 from .routes.spotify_api import bp as api_bp
 from .routes.auth import bp as auth_bp
@@ -10,6 +14,8 @@ from .spotify_tools import bp as spotify_tools_bp  # or .routes.spotify_tools
 def create_app() -> Flask:
     app = Flask(__name__)
     app.config.from_object(Config)
+    if app.config.get("FAST_JSON_ENABLED", True):
+        app.json = FastJSONProvider(app)
 
     # CORS (frontend <-> backend with cookies)
     origin = app.config.get("FRONTEND_ORIGIN")  # e.g. http://localhost:3000
@@ -24,6 +30,26 @@ def create_app() -> Flask:
             },
         )
 
+    # One pooled keep-alive client per process, shared by every request thread
+    spotify_client.init_app(app)
+    # ...and one OpenAI client, so LLM calls reuse their connections too (built on first use)
+    llm.init_app(app)
+
+    # gzip/zstd for large JSON bodies, negotiated per request
+    compression.init_app(app)
+
+    # Per-route timing; outbound calls are instrumented in the clients themselves
+    if app.config.get("METRICS_ENABLED", False):
+        metrics.init_app(app)
+
+    # On-demand cProfile traces (header or sampled), browsed under /admin/profiles.
+    # Imported only when enabled; most workers never load the profiler or admin routes
+    if app.config.get("PROFILE_ENABLED", False):
+        from .utils import profiling
+        from .routes.admin import bp as admin_bp
+        profiling.init_app(app)
+        app.register_blueprint(admin_bp)
+
     # Register blueprints
     app.register_blueprint(auth_bp)                 # your /login, /callback, etc.
     app.register_blueprint(api_bp, url_prefix="/api")  # /api/me, /api/search, ...
@@ -34,4 +60,14 @@ def create_app() -> Flask:
     def health():
         return "", 200
 
+    if app.config.get("METRICS_ENABLED", False):
+        @app.get("/metrics")
+        def metrics_endpoint():
+            return metrics.metrics_response()
+
+    # Open upstream connections and load the OpenAI SDK before the first request
+    if app.config.get("WARMUP_ENABLED", False):
+        from .services.warmup import warmup
+        warmup(app)
+
     return app
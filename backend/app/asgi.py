@@ -0,0 +1,155 @@
+"""
+ASGI entry point: the whole app on an async server (uvicorn asgi:app, hypercorn
+asgi:app), where one process keeps hundreds of upstream calls in flight.
+
+- Routes with an event-loop implementation (routes/async_api.py ASYNC_VIEWS) run as
+  coroutines over services/spotify_async.py: a request waiting on Spotify holds no
+  thread. They still go through the Flask request context, so sessions, before/after
+  request hooks (metrics, compression, CORS) and error handlers apply unchanged.
+- Every other route runs on the Flask WSGI app in a pool of ASGI_SYNC_WORKERS
+  threads, streamed bodies (SSE, NDJSON) chunk by chunk.
+
+With PROFILE_ENABLED everything runs on WSGI: request profiles are per thread.
+"""
+import asyncio, io, sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from flask import Flask
+from .routes.async_api import ASYNC_VIEWS
+from .services import spotify_async
+
+_DONE = object()
+
+
+def _environ(scope: dict, body: bytes) -> dict:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name, value = raw_name.decode("latin-1").upper().replace("-", "_"), raw_value.decode("latin-1")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive) -> Optional[bytes]:
+    """The request body, or None if the client went away first."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def _headers(pairs) -> list:
+    return [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in pairs]
+
+
+class AsgiApp:
+    def __init__(self, flask_app: Flask):
+        self.flask_app = flask_app
+        self.async_views = {} if flask_app.config.get("PROFILE_ENABLED", False) else ASYNC_VIEWS
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(int(flask_app.config.get("ASGI_SYNC_WORKERS", 8)), 1), thread_name_prefix="asgi-wsgi",
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return  # no websockets
+        body = await _read_body(receive)
+        if body is None:
+            return
+        environ = _environ(scope, body)
+        ctx = self.flask_app.request_context(environ)
+        ctx.match_request()  # push() would match too; the dispatch decision is needed before it
+        rule = ctx.request.url_rule
+        view = self.async_views.get(rule.endpoint) if rule is not None and ctx.request.routing_exception is None else None
+        if view is not None and ctx.request.method in ("GET", "HEAD") and view[1](ctx.request):
+            return await self._async_view(ctx, view[0], send)
+        await self._wsgi(environ, send)
+
+    async def _async_view(self, ctx, view, send) -> None:
+        # Mirrors Flask.full_dispatch_request/wsgi_app with an awaited view
+        app, error = self.flask_app, None
+        ctx.push()
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view(**ctx.request.view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        try:
+            await send({"type": "http.response.start", "status": response.status_code,
+                        "headers": _headers(response.headers.items())})
+            await send({"type": "http.response.body", "body": b"" if ctx.request.method == "HEAD" else response.get_data()})
+        finally:
+            response.close()
+            ctx.pop(error)
+
+    async def _wsgi(self, environ: dict, send) -> None:
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"], started["headers"] = int(status.split(" ", 1)[0]), headers
+
+        body = await loop.run_in_executor(self._pool, self.flask_app.wsgi_app, environ, start_response)
+        chunks = iter(body)
+        try:
+            first = await loop.run_in_executor(self._pool, next, chunks, _DONE)
+            await send({"type": "http.response.start", "status": started["status"], "headers": _headers(started["headers"])})
+            chunk = first
+            while chunk is not _DONE:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(self._pool, next, chunks, _DONE)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self._pool, close)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                with self.flask_app.app_context():
+                    await spotify_async.close_async_client()
+                self._pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app: Optional[Flask] = None) -> AsgiApp:
+    if flask_app is None:
+        from . import create_app
+        flask_app = create_app()
+    return AsgiApp(flask_app)
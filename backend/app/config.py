@@ -12,4 +12,136 @@ class Config:
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = "Lax"
     SESSION_COOKIE_SECURE = False
-    OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
\ No newline at end of file
+    OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
+    OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "")  # e.g. a local fake for benchmarks
+    OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", 60))
+
+    # Upstream Spotify HTTP client (connection pooling / keep-alive)
+    SPOTIFY_API_BASE = os.environ.get("SPOTIFY_API_BASE", "https://api.spotify.com/v1")
+    SPOTIFY_ACCOUNTS_BASE = os.environ.get("SPOTIFY_ACCOUNTS_BASE", "https://accounts.spotify.com")
+    SPOTIFY_POOL_CONNECTIONS = int(os.environ.get("SPOTIFY_POOL_CONNECTIONS", 4))
+    SPOTIFY_POOL_MAXSIZE = int(os.environ.get("SPOTIFY_POOL_MAXSIZE", 20))
+    SPOTIFY_POOL_BLOCK = os.environ.get("SPOTIFY_POOL_BLOCK", "false").lower() == "true"
+    SPOTIFY_KEEPALIVE = os.environ.get("SPOTIFY_KEEPALIVE", "true").lower() == "true"
+    SPOTIFY_HTTP_TIMEOUT = float(os.environ.get("SPOTIFY_HTTP_TIMEOUT", 15))
+    # Async client (services/spotify_async.py): one pool per event loop
+    SPOTIFY_ASYNC_POOL_MAXSIZE = int(os.environ.get("SPOTIFY_ASYNC_POOL_MAXSIZE", 32))
+    SPOTIFY_ASYNC_KEEPALIVE_EXPIRY = float(os.environ.get("SPOTIFY_ASYNC_KEEPALIVE_EXPIRY", 30))
+    # ASGI entry (asgi.py): threads for the routes that still run on the WSGI app
+    ASGI_SYNC_WORKERS = int(os.environ.get("ASGI_SYNC_WORKERS", 8))
+
+    # Outbound rate limiting: token bucket per client_id, Retry-After backoff on 429.
+    # The bucket lives in each worker process, so N workers send up to N x this rate.
+    # Off by default; to enable, divide the app's Spotify allowance by the worker count
+    SPOTIFY_RATE_LIMIT = float(os.environ.get("SPOTIFY_RATE_LIMIT", 0))  # requests/second per worker, 0 disables
+    SPOTIFY_RATE_BURST = int(os.environ.get("SPOTIFY_RATE_BURST", 20))
+    SPOTIFY_RATE_MAX_WAIT = float(os.environ.get("SPOTIFY_RATE_MAX_WAIT", 10))
+    SPOTIFY_429_MAX_RETRIES = int(os.environ.get("SPOTIFY_429_MAX_RETRIES", 2))
+
+    # /spotify-tools/resolve fan-out (concurrent searches per request)
+    RESOLVE_MAX_WORKERS = int(os.environ.get("RESOLVE_MAX_WORKERS", 8))
+
+    # Shared catalog search cache (TTL + LRU, bounded by entries and bytes)
+    SEARCH_CACHE_ENABLED = os.environ.get("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+    SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 300))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 2048))
+    SEARCH_CACHE_MAX_BYTES = int(os.environ.get("SEARCH_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+    # Keystroke search (/api/search?typeahead=1): per-user refinement filtering and supersession
+    TYPEAHEAD_ENABLED = os.environ.get("TYPEAHEAD_ENABLED", "true").lower() == "true"
+    TYPEAHEAD_TTL = float(os.environ.get("TYPEAHEAD_TTL", 120))
+
+    # Per-user /me and top tracks/artists, stale-while-revalidate: served from cache, refreshed
+    # in the background once older than ME_CACHE_SOFT_TTL, refetched inline past ME_CACHE_TTL
+    ME_CACHE_ENABLED = os.environ.get("ME_CACHE_ENABLED", "true").lower() == "true"
+    ME_CACHE_SOFT_TTL = float(os.environ.get("ME_CACHE_SOFT_TTL", 3600))
+    ME_CACHE_TTL = float(os.environ.get("ME_CACHE_TTL", 86400))
+    ME_CACHE_MAX_ENTRIES = int(os.environ.get("ME_CACHE_MAX_ENTRIES", 10000))
+    ME_CACHE_MAX_BYTES = int(os.environ.get("ME_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+    # Persistent (artist, track) -> Spotify entity index used by /spotify-tools/resolve.
+    # Empty path means <instance_path>/resolution_index.sqlite3
+    RESOLVE_INDEX_ENABLED = os.environ.get("RESOLVE_INDEX_ENABLED", "true").lower() == "true"
+    RESOLVE_INDEX_PATH = os.environ.get("RESOLVE_INDEX_PATH", "")
+    RESOLVE_INDEX_TTL = float(os.environ.get("RESOLVE_INDEX_TTL", 30 * 86400))
+    RESOLVE_INDEX_NEGATIVE_TTL = float(os.environ.get("RESOLVE_INDEX_NEGATIVE_TTL", 86400))
+
+    # Persistent normalized-prompt -> LLM candidates cache (TTL + LRU by entry count).
+    # Empty path means <instance_path>/prompt_cache.sqlite3
+    PROMPT_CACHE_ENABLED = os.environ.get("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+    PROMPT_CACHE_PATH = os.environ.get("PROMPT_CACHE_PATH", "")
+    PROMPT_CACHE_TTL = float(os.environ.get("PROMPT_CACHE_TTL", 7 * 86400))
+    PROMPT_CACHE_MAX_ENTRIES = int(os.environ.get("PROMPT_CACHE_MAX_ENTRIES", 5000))
+
+    # Prometheus-format /metrics and per-route request timing. Off by default: the
+    # endpoint exposes route and upstream traffic, so set METRICS_TOKEN when it is public
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")  # scrapers send Authorization: Bearer <token>
+
+    # Opt-in per-request cProfile. A request is profiled when it sends X-Profile: <PROFILE_TOKEN>
+    # or falls in the PROFILE_SAMPLE_RATE sample; /admin/profiles lists and downloads the traces
+    # (X-Admin-Token: <PROFILE_TOKEN>). Empty dir means <instance_path>/profiles
+    PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "false").lower() == "true"
+    PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0))
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+    PROFILE_MAX_TRACES = int(os.environ.get("PROFILE_MAX_TRACES", 50))
+
+    # Preconnect Spotify pools and build the OpenAI client in create_app, before traffic.
+    # Leave off when the app is created in a preloading master (gunicorn --preload)
+    WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "false").lower() == "true"
+    WARMUP_CONNECTIONS = int(os.environ.get("WARMUP_CONNECTIONS", 4))
+
+    # Refresh access tokens in the background this many seconds before expires_at
+    TOKEN_REFRESH_AHEAD = int(os.environ.get("TOKEN_REFRESH_AHEAD", 120))
+
+    # Shared playback state (/api/player/current, /api/player/stream). Upstream cadence
+    # is never tighter than the 5s/10s the dashboard's old per-tab polling produced
+    PLAYER_POLL_INTERVAL = float(os.environ.get("PLAYER_POLL_INTERVAL", 5))
+    PLAYER_POLL_MAX_INTERVAL = float(os.environ.get("PLAYER_POLL_MAX_INTERVAL", 30))
+    PLAYER_STATE_MAX_AGE = float(os.environ.get("PLAYER_STATE_MAX_AGE", 10))
+
+    # Playlist metadata / track pages cached per snapshot_id
+    PLAYLIST_CACHE_ENABLED = os.environ.get("PLAYLIST_CACHE_ENABLED", "true").lower() == "true"
+    PLAYLIST_CACHE_TTL = float(os.environ.get("PLAYLIST_CACHE_TTL", 3600))
+    PLAYLIST_CACHE_MAX_ENTRIES = int(os.environ.get("PLAYLIST_CACHE_MAX_ENTRIES", 2000))
+    PLAYLIST_CACHE_MAX_BYTES = int(os.environ.get("PLAYLIST_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+    # Concurrent page fetches for /api/playlists/<id>/tracks/all
+    PLAYLIST_FETCH_MAX_WORKERS = int(os.environ.get("PLAYLIST_FETCH_MAX_WORKERS", 4))
+
+    # Read-ahead for /api/me/playlists and /api/playlists/<id>/tracks: serving page N prefetches
+    # page N+1 into a per-user buffer (pages live READ_AHEAD_TTL seconds, MAX_BYTES overall)
+    READ_AHEAD_ENABLED = os.environ.get("READ_AHEAD_ENABLED", "true").lower() == "true"
+    READ_AHEAD_TTL = float(os.environ.get("READ_AHEAD_TTL", 20))
+    READ_AHEAD_MAX_LISTS = int(os.environ.get("READ_AHEAD_MAX_LISTS", 4))  # per user
+    READ_AHEAD_MAX_BYTES = int(os.environ.get("READ_AHEAD_MAX_BYTES", 16 * 1024 * 1024))
+    READ_AHEAD_MAX_WORKERS = int(os.environ.get("READ_AHEAD_MAX_WORKERS", 2))
+    READ_AHEAD_WAIT = float(os.environ.get("READ_AHEAD_WAIT", 10))  # max wait on an in-flight prefetch
+
+    # Bulk library/playlist mutations: chunks sent concurrently
+    BULK_MAX_WORKERS = int(os.environ.get("BULK_MAX_WORKERS", 4))
+
+    # Local library mirror (saved tracks/albums, playlist list) in SQLite
+    LIBRARY_MIRROR_ENABLED = os.environ.get("LIBRARY_MIRROR_ENABLED", "true").lower() == "true"
+    LIBRARY_MIRROR_PATH = os.environ.get("LIBRARY_MIRROR_PATH", "")  # default: <instance>/library_mirror.sqlite3
+    LIBRARY_MIRROR_MAX_AGE = float(os.environ.get("LIBRARY_MIRROR_MAX_AGE", 300))  # seconds before a delta sync
+    # Users not synced for this many days are dropped (0 keeps everyone); logout drops the user at once
+    LIBRARY_MIRROR_RETENTION_DAYS = float(os.environ.get("LIBRARY_MIRROR_RETENTION_DAYS", 30))
+    LIBRARY_SYNC_MAX_WORKERS = int(os.environ.get("LIBRARY_SYNC_MAX_WORKERS", 4))
+
+    # /api/batch
+    BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", 20))
+    BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 8))
+
+    # JSON encoding (orjson when installed) and response compression
+    FAST_JSON_ENABLED = os.environ.get("FAST_JSON_ENABLED", "true").lower() == "true"
+    COMPRESS_ENABLED = os.environ.get("COMPRESS_ENABLED", "true").lower() == "true"
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 5))
+    COMPRESS_ZSTD_LEVEL = int(os.environ.get("COMPRESS_ZSTD_LEVEL", 3))
+
+    # Trim proxied Spotify objects to the fields the frontend uses (?fields=full opts out)
+    PROJECTION_ENABLED = os.environ.get("PROJECTION_ENABLED", "true").lower() == "true"
+    PROJECTION_IMAGE_MIN_WIDTH = int(os.environ.get("PROJECTION_IMAGE_MIN_WIDTH", 300))
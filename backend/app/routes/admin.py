@@ -0,0 +1,36 @@
+import os
+from flask import Blueprint, abort, jsonify, request, send_file
+from ..utils.profiling import profile_store, token_ok
+
+bp = Blueprint("admin", __name__, url_prefix="/admin")
+
+
+@bp.before_request
+def require_admin_token():
+    # 404 rather than 401 so the routes don't advertise themselves
+    if not token_ok(request.headers.get("X-Admin-Token")):
+        abort(404)
+
+
+@bp.get("/profiles")
+def list_profiles():
+    return jsonify({"items": profile_store().list()})
+
+
+@bp.get("/profiles/<trace_id>")
+def get_profile(trace_id):
+    meta = profile_store().get(trace_id)
+    if meta is None:
+        return jsonify({"error": "not_found"}), 404
+    return jsonify(meta)
+
+
+@bp.get("/profiles/<trace_id>/download")
+def download_profile(trace_id):
+    try:
+        path = profile_store().file(trace_id)
+    except FileNotFoundError:
+        abort(404)
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=f"{trace_id}.prof")
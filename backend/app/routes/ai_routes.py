@@ -1,16 +1,17 @@
-import os
-from flask import Blueprint, request, jsonify, current_app
-from openai import OpenAI
+import json, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, request, jsonify, current_app, session, stream_with_context
+from ..services.llm import complete_candidates, iter_candidates, prompt_cache, prompt_key, stream_content
+from ..services.spotify import add_tracks_to_playlist, play
+from ..spotify_tools import candidate_key, resolve_cached, resolve_candidates
+from ..utils.tokens import require_access_token, current_user_id
+from .spotify_api import library_mutated, playback_hub
 
 bp = Blueprint("ai", __name__, url_prefix="/api/ai")
 
-# Initialize OpenAI client (your API key must already be in env var)
-
 
 @bp.route("/chat", methods=["POST"])
 def chat():
-    client = OpenAI(api_key=current_app.config["OPENAI_API_KEY"])
-    
     data = request.get_json() or {}
     user_prompt = data.get("prompt")
 
@@ -18,23 +19,198 @@ def chat():
         return jsonify({"error": "Missing prompt"}), 400
 
     try:
-        # Call OpenAI with structured response format
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",  # cheap + fast, good for structured JSON
-            messages=[
-                {"role": "system", "content": (
-                    "You are an assistant that helps recommend Spotify songs/artists. "
-                    "Always respond in strict JSON with a 'candidates' array, "
-                    "where each element is {\"artist\": <name>, \"track\": <optional track name>}."
-                )},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format={ "type": "json_object" }
-        )
-
-        # The model will give us raw JSON text
-        content = resp.choices[0].message.content
-        return jsonify(content)
+        # Repeat prompts are answered from the prompt cache without calling OpenAI
+        candidates, cached = complete_candidates(user_prompt)
+
+        # Same contract as before: the model's JSON text, as a JSON string
+        resp = jsonify(json.dumps({"candidates": candidates}))
+        resp.headers["X-Prompt-Cache"] = "hit" if cached else "miss"
+        return resp
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+def _ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+@bp.post("/recommend")
+@require_access_token
+def recommend():
+    """
+    Body:
+    {
+      "prompt": "...",
+      "limit": 20,                      # candidates to resolve, at most 50
+      "action": "play" | "add",         # optional, applied to the resolved tracks
+      "playlist_id": "...",             # required for "add"
+      "device_id": "..."                # optional for "play"
+    }
+    LLM -> parse -> concurrent resolve -> action in one server round trip. Returns the
+    resolved items in the model's order, the track uris the action used, the action's
+    own status and result, and per-stage timings (llm_ms, resolve_ms, action_ms,
+    total_ms). 207 when recommendations worked but the action failed.
+    """
+    body = request.get_json(silent=True) or {}
+    prompt = (body.get("prompt") or "").strip()
+    action = body.get("action")
+    try:
+        limit = min(max(int(body.get("limit") or 20), 1), 50)
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit must be int"}), 400
+    if not prompt:
+        return jsonify({"error": "Missing prompt"}), 400
+    if action not in (None, "play", "add"):
+        return jsonify({"error": "action must be 'play' or 'add'"}), 400
+    if action == "add" and not body.get("playlist_id"):
+        return jsonify({"error": "playlist_id is required for action 'add'"}), 400
+
+    t0 = time.perf_counter()
+    timings = {}
+    try:
+        candidates, cached = complete_candidates(prompt)
+    except Exception as e:
+        current_app.logger.exception("recommend: LLM call failed")
+        return jsonify({"error": str(e), "timings": {"llm_ms": _ms(t0)}}), 502
+    timings["llm_ms"] = _ms(t0)
+
+    t1 = time.perf_counter()
+    resolved = resolve_candidates(session._get_current_object(), candidates[:limit])
+    timings["resolve_ms"] = _ms(t1)
+
+    uris = list(dict.fromkeys(r["track"]["uri"] for r in resolved if r.get("track")))
+    result = None
+    status = 200
+    if action and uris:
+        t2 = time.perf_counter()
+        if action == "play":
+            a_status, a_data = play(session, uris=uris, device_id=body.get("device_id"))
+            if a_status < 300 and current_user_id(session):
+                playback_hub().nudge(session, current_user_id(session), {"is_playing": True})
+        else:
+            a_status, a_data = add_tracks_to_playlist(session, body["playlist_id"], uris)
+            library_mutated(a_status, "playlists")
+        timings["action_ms"] = _ms(t2)
+        result = {"type": action, "status": a_status, "result": a_data}
+        if a_status >= 300:
+            status = 207
+    elif action:
+        result = {"type": action, "status": None, "result": {"error": "no tracks resolved"}}
+    timings["total_ms"] = _ms(t0)
+
+    return jsonify({
+        "prompt_cache": "hit" if cached else "miss",
+        "resolved": resolved,
+        "uris": uris,
+        "action": result,
+        "timings": timings,
+    }), status
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+
+def _run_pipeline(app, sess, prompt: str, events: queue.Queue, stop: threading.Event):
+    """
+    Producer side of /recommend/stream: reads the LLM stream (or the prompt cache), and
+    every candidate whose JSON object has closed is handed to a resolver thread at once. Everything that
+    happens lands on `events` as (kind, payload); ("end", ...) is always the last item.
+    """
+    t0 = time.perf_counter()
+    timings = {}
+    with app.app_context():
+        workers = ThreadPoolExecutor(max_workers=app.config.get("RESOLVE_MAX_WORKERS", 8))
+        by_key = {}
+        count = 0
+
+        def resolve(artist, track):
+            with app.app_context():
+                return resolve_cached(sess, artist, track)
+
+        def deliver(index, query, fut):
+            if fut.cancelled():
+                return
+            timings.setdefault("first_resolved_ms", round((time.perf_counter() - t0) * 1000, 1))
+            try:
+                out = fut.result()
+            except Exception as e:
+                out = {"error": f"resolve_failed:{type(e).__name__}"}
+            events.put(("resolved", {"index": index, "query": query, **out}))
+
+        cache = prompt_cache()
+        pkey = prompt_key(prompt)
+        cached = cache.get(pkey) if cache else None
+        timings["prompt_cache"] = "hit" if cached is not None else "miss"
+        seen = []
+        try:
+            deltas = None if cached is not None else stream_content(prompt)
+            try:
+                for cand in (cached if deltas is None else iter_candidates(deltas)):
+                    if stop.is_set():
+                        break
+                    seen.append(cand)
+                    artist = str(cand.get("artist") or "").strip()
+                    track = str(cand.get("track") or "").strip()
+                    if not (artist or track):
+                        continue
+                    timings.setdefault("first_candidate_ms", round((time.perf_counter() - t0) * 1000, 1))
+                    query = {"artist": artist, "track": track}
+                    events.put(("candidate", {"index": count, "query": query}))
+                    key = candidate_key(artist, track)
+                    # Repeats of a candidate share its lookup
+                    fut = by_key.get(key) or by_key.setdefault(key, workers.submit(resolve, artist, track))
+                    fut.add_done_callback(lambda f, i=count, q=query: deliver(i, q, f))
+                    count += 1
+            finally:
+                if deltas is not None:
+                    deltas.close()
+            timings["llm_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            # Only a list the model finished writing is worth replaying
+            if cache and deltas is not None and seen and not stop.is_set():
+                cache.put(pkey, seen)
+        except Exception as e:
+            current_app.logger.exception("recommend stream failed")
+            events.put(("error", {"error": str(e)}))
+        finally:
+            workers.shutdown(wait=not stop.is_set(), cancel_futures=stop.is_set())
+            timings["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            events.put(("end", {"count": count, "timings": timings}))
+
+
+@bp.post("/recommend/stream")
+@require_access_token
+def recommend_stream():
+    """
+    Body: {"prompt": "..."}. Server-sent events, in order of availability:
+      candidate  {"index", "query"}                          as soon as the LLM finishes writing one
+      resolved   {"index", "query", "type", "track"|"artist"} or {..., "error"} as each lookup finishes
+      error      {"error"}                                    LLM failure; resolved events may still follow
+      done       {"count", "timings"}                         last event
+    `index` is the candidate's position in the LLM's list; resolved events arrive in completion order.
+    """
+    data = request.get_json(silent=True) or {}
+    prompt = (data.get("prompt") or "").strip()
+    if not prompt:
+        return jsonify({"error": "Missing prompt"}), 400
+
+    app = current_app._get_current_object()
+    sess = session._get_current_object()
+    events: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    threading.Thread(target=_run_pipeline, args=(app, sess, prompt, events, stop), daemon=True).start()
+
+    def stream():
+        try:
+            while True:
+                kind, payload = events.get()
+                if kind == "end":
+                    yield _sse("done", payload)
+                    return
+                yield _sse(kind, payload)
+        finally:
+            stop.set()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(stream()), mimetype="text/event-stream", headers=headers)
@@ -0,0 +1,56 @@
+"""
+Event-loop implementations of the /api routes that always wait on Spotify, used by
+the ASGI entry point (app/asgi.py) in place of their WSGI views. Each one answers
+exactly like the view of the same endpoint in routes/spotify_api.py; everything
+not listed in ASYNC_VIEWS runs on the WSGI app.
+"""
+from functools import wraps
+from flask import jsonify, request, session
+from ..services import spotify_async as spotify
+from ..utils.projection import shaped
+from .spotify_api import _use_cache
+
+
+def require_access_token(fn):
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not await spotify.ensure_fresh(session):
+            return jsonify({"error": "unauthorized"}), 401
+        return await fn(*args, **kwargs)
+    return wrapper
+
+
+@require_access_token
+async def recently_played():
+    limit = int(request.args.get("limit", 50))
+    status, data = await spotify.get_recently_played(session, limit=limit)
+    return (jsonify(shaped(data, "recently_played", status)), status)
+
+
+@require_access_token
+async def player_devices():
+    status, data = await spotify.get_devices(session)
+    return (jsonify(data), status)
+
+
+@require_access_token
+async def search_route():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "q required"}), 400
+    types = request.args.get("types", "track,album,artist,playlist")
+    limit = min(max(int(request.args.get("limit", 20)), 1), 50)
+    offset = max(int(request.args.get("offset", 0)), 0)
+    market = request.args.get("market") or None
+    status, data = await spotify.search(session, q=q, types=types, limit=limit, offset=offset, market=market,
+                                        use_cache=_use_cache())
+    return (jsonify(shaped(data, "search", status)), status)
+
+
+# endpoint -> (coroutine view, which requests it takes). Keystroke searches stay on
+# WSGI: the typeahead engine's supersession and coalescing are thread-based.
+ASYNC_VIEWS = {
+    "api.recently_played": (recently_played, lambda req: True),
+    "api.player_devices": (player_devices, lambda req: True),
+    "api.search_route": (search_route, lambda req: req.args.get("typeahead") != "1"),
+}
@@ -1,8 +1,9 @@
 import secrets
 from urllib.parse import urlencode
 from flask import Blueprint, current_app, redirect, request, session, jsonify
+from ..services.library_mirror import library_mirror, mirror_enabled
 from ..services.spotify import exchange_code_for_token
-from ..utils.tokens import set_tokens, clear_tokens
+from ..utils.tokens import set_tokens, clear_tokens, validated_user_id
 
 bp = Blueprint("auth", __name__)
 AUTH_URL = "https://accounts.spotify.com/authorize"
@@ -47,5 +48,8 @@ def auth_callback():
     
 @bp.post("/auth/logout")
 def auth_logout():
+    user_id = validated_user_id(session)
+    if user_id and mirror_enabled():
+        library_mirror().forget_user(user_id)  # a signed-out user's library does not stay on disk
     clear_tokens(session)
     return {"ok": True}
@@ -1,45 +1,120 @@
-from flask import Blueprint, request, jsonify, session
+import queue
+from werkzeug.exceptions import HTTPException
+from flask import Blueprint, Response, current_app, request, jsonify, session, stream_with_context
 from ..services.spotify import (
+    RateLimited,
     get_me, get_my_top_tracks, get_my_top_artists, get_recently_played,
     get_devices, transfer_playback, play, pause, next_track, previous_track,
-    get_current_playback, search,
-    get_my_playlists, get_playlist, get_playlist_tracks,
+    search,
+    get_my_playlists, get_playlist, get_playlist_tracks, iter_playlist_pages,
     create_playlist, add_tracks_to_playlist, remove_tracks_from_playlist,
     get_saved_tracks, save_tracks, remove_saved_tracks,
     get_saved_albums, save_albums, remove_saved_albums,
     add_to_queue, seek, set_shuffle, set_repeat, set_volume,
 )
-from ..utils.tokens import require_access_token
+from ..services.library_mirror import library_changed, library_page, mirror_enabled
+from ..services.playback_hub import PlaybackHub
+from ..services.rate_limit import BULK
+from ..services.read_ahead import has_next_page, read_ahead
+from ..services.typeahead import TypeaheadEngine
+from ..utils.concurrency import run_bounded
+from ..utils.extensions import app_singleton
+from ..utils.projection import project, requested_fields, shaped
+from ..utils.tokens import require_access_token, current_user_id, TOKEN_CHECKED_ENVIRON_KEY
 
 bp = Blueprint("api", __name__)
 
+def playback_hub() -> PlaybackHub:
+    return app_singleton("playback_hub", PlaybackHub.from_app)
+
+def typeahead() -> TypeaheadEngine:
+    return app_singleton("typeahead", lambda app: TypeaheadEngine.from_app(app, search))
+
+# Per-user state (mirror, read-ahead, playback channels, typeahead) is keyed by the
+# grant-confirmed user id; when /me cannot establish it, never fall into a shared None slot
+_NO_USER = (502, {"error": "user_id_unavailable"})
+
+def _mirrored_page(kind: str, limit: int, offset: int):
+    refresh = request.args.get("refresh", "false").lower() == "true"
+    user_id = current_user_id(session)
+    if not user_id:
+        return _NO_USER
+    return library_page(session._get_current_object(), user_id, kind, limit, offset, refresh=refresh)
+
+def library_mutated(status, kind: str, removed=()):
+    """
+    Keep the library mirror and read-ahead buffer honest after a mutation made through
+    us; every route that changes the user's library calls this with the upstream status.
+    """
+    user_id = current_user_id(session) if status < 300 else None
+    if not user_id:
+        return
+    if current_app.config.get("READ_AHEAD_ENABLED", True):
+        read_ahead().discard(user_id)  # prefetched pages may predate the change
+    if mirror_enabled():
+        # After a partial success (207) it is unknown which removals went through; the next read re-syncs
+        library_changed(user_id, kind, removed=removed if status == 200 else ())
+
+def _paged(lst: tuple, limit: int, offset: int, fetch):
+    """
+    One page of a paginated list through the user's read-ahead buffer: answered from
+    it when this page was prefetched, and the following page is prefetched after it.
+    fetch(sess, offset, **scheduler_kwargs) -> (status, data). Returns (status, data, source).
+    """
+    sess = session._get_current_object()
+    if not current_app.config.get("READ_AHEAD_ENABLED", True):
+        return (*fetch(sess, offset), "off")
+    buf, user_id = read_ahead(), current_user_id(sess)
+    if not user_id:
+        return (*fetch(sess, offset), "off")
+    hit = buf.take(user_id, lst, (limit, offset))
+    status, data = hit if hit is not None else fetch(sess, offset)
+    if status == 200 and has_next_page(data, limit, offset):
+        nxt = offset + limit
+        buf.prefetch(user_id, lst, (limit, nxt), lambda cancelled: fetch(sess, nxt, priority=BULK, cancelled=cancelled))
+    return status, data, "hit" if hit is not None else "miss"
+
+def _use_cache() -> bool:
+    return "no-cache" not in request.headers.get("Cache-Control", "")
+
+def _player_changed(status, **patch):
+    """Push a successful player command's effect to the shared playback state."""
+    user_id = current_user_id(session) if status < 300 else None
+    if user_id:
+        playback_hub().nudge(session, user_id, patch or None)
+
+@bp.errorhandler(RateLimited)
+def rate_limited(e: RateLimited):
+    return jsonify(e.payload()), 429, {"Retry-After": str(max(1, round(e.retry_after)))}
+
 @bp.get("/me")
 @require_access_token
 def me():
-    return jsonify(get_me(session))
+    status, data = get_me(session, use_cache=_use_cache())
+    return (jsonify(data), status)
 
 @bp.get("/me/top-tracks")
 @require_access_token
 def top_tracks():
     limit = int(request.args.get("limit", 50))
     time_range = request.args.get("time_range", "medium_term")
-    status, data = get_my_top_tracks(session, limit=limit, time_range=time_range)
-    return (jsonify((data.get("items", []))), status)
+    status, data = get_my_top_tracks(session, limit=limit, time_range=time_range, use_cache=_use_cache())
+    return (jsonify(shaped(data.get("items", []), "top_tracks", status)), status)
 
 @bp.get("/me/top-artists")
 @require_access_token
 def top_artists():
     limit = int(request.args.get("limit", 50))
     time_range = request.args.get("time_range", "medium_term")
-    status, data = get_my_top_artists(session, limit=limit, time_range=time_range)
-    return (jsonify(data.get("items", [])), status)
+    status, data = get_my_top_artists(session, limit=limit, time_range=time_range, use_cache=_use_cache())
+    return (jsonify(shaped(data.get("items", []), "top_artists", status)), status)
 
 @bp.get("/me/recently-played")
 @require_access_token
 def recently_played():
     limit = int(request.args.get("limit", 50))
     status, data = get_recently_played(session, limit=limit)
-    return (jsonify(data), status)
+    return (jsonify(shaped(data, "recently_played", status)), status)
 
 # ---- Player endpoints ----
 
@@ -57,6 +132,7 @@ def player_transfer():
         return jsonify({"error": "device_id required"}), 400
     force_play = request.args.get("play", "false").lower() == "true"
     status, data = transfer_playback(session, device_id, force_play=force_play)
+    _player_changed(status)
     return (jsonify(data), status)
 
 @bp.put("/player/play")
@@ -64,33 +140,71 @@ def player_transfer():
 def player_play():
     payload = request.get_json(silent=True) or {}
     status, data = play(session, **payload)  # accepts uris, context_uri, position_ms, offset
+    _player_changed(status, is_playing=True)
     return (jsonify(data), status)
 
 @bp.put("/player/pause")
 @require_access_token
 def player_pause():
     status, data = pause(session)
+    _player_changed(status, is_playing=False)
     return (jsonify(data), status)
 
 @bp.post("/player/next")
 @require_access_token
 def player_next():
     status, data = next_track(session)
+    _player_changed(status)
     return (jsonify(data), status)
 
 @bp.post("/player/previous")
 @require_access_token
 def player_previous():
     status, data = previous_track(session)
+    _player_changed(status)
     return (jsonify(data), status)
 
 @bp.get("/player/current")
 @require_access_token
 def player_current():
-    status, payload = get_current_playback(session)
+    user_id = current_user_id(session)
+    if not user_id:
+        return jsonify(_NO_USER[1]), _NO_USER[0]
+    status, payload = playback_hub().current(session, user_id)
     if status == 204:
         return ("", 204)
-    return jsonify(payload), status
+    return jsonify(shaped(payload, "playback", status)), status
+
+@bp.get("/player/stream")
+@require_access_token
+def player_stream():
+    """
+    Server-Sent Events: `playback` events carrying {"status", "playback"} whenever
+    the shared state for this user changes. Fed by one upstream poller per user.
+    """
+    hub = playback_hub()
+    user_id = current_user_id(session)
+    if not user_id:
+        return jsonify(_NO_USER[1]), _NO_USER[0]
+    dumps = current_app.json.dumps
+    fields = requested_fields()
+    q = hub.subscribe(session, user_id)
+
+    def events():
+        try:
+            while True:
+                try:
+                    msg = q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if msg["playback"] is not None and msg["status"] == 200:
+                    msg = {**msg, "playback": project(msg["playback"], "playback", fields)}
+                yield f"event: playback\ndata: {dumps(msg)}\n\n"
+        finally:
+            hub.unsubscribe(user_id, q)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @bp.get("/search")
 @require_access_token
@@ -101,8 +215,17 @@ def search_route():
     types = request.args.get("types", "track,album,artist,playlist")
     limit = min(max(int(request.args.get("limit", 20)), 1), 50)
     offset = max(int(request.args.get("offset", 0)), 0)
-    status, data = search(session, q=q, types=types, limit=limit, offset=offset)
-    return (jsonify(data), status)
+    market = request.args.get("market") or None
+    use_cache = _use_cache()
+    # ?typeahead=1 marks keystroke queries: refinements may be answered locally and stale ones dropped
+    if (request.args.get("typeahead") == "1" and offset == 0 and use_cache and market != "from_token"
+            and current_app.config.get("TYPEAHEAD_ENABLED", True) and current_user_id(session)):
+        status, data, source = typeahead().query(
+            session._get_current_object(), current_user_id(session), q, types, limit, market=market
+        )
+        return (jsonify(shaped(data, "search", status)), status, {"X-Typeahead": source})
+    status, data = search(session, q=q, types=types, limit=limit, offset=offset, market=market, use_cache=use_cache)
+    return (jsonify(shaped(data, "search", status)), status)
 
 @bp.get("/me/playlists")
 @require_access_token
@@ -110,28 +233,85 @@ def my_playlists_route():
     limit = min(max(int(request.args.get("limit", 20)), 1), 50)
     offset = max(int(request.args.get("offset", 0)), 0)
 
-    result = get_my_playlists(session, limit=limit, offset=offset)
+    if not mirror_enabled():
+        status, data, source = _paged(
+            ("my_playlists",), limit, offset,
+            lambda sess, off, **kw: get_my_playlists(sess, limit=limit, offset=off, **kw),
+        )
+        return (jsonify(shaped(data, "my_playlists", status)), status, {"X-Read-Ahead": source})
 
+    # Served from the local mirror; nothing upstream to read ahead
+    result = _mirrored_page("playlists", limit, offset)
     if isinstance(result, tuple) and len(result) == 2:
         status, data = result
     else:
         status, data = 200, result
 
-    return (jsonify(data), status)
+    return (jsonify(shaped(data, "my_playlists", status)), status)
 
 @bp.get("/playlists/<playlist_id>")
 @require_access_token
 def playlist_meta_route(playlist_id):
     status, data = get_playlist(session, playlist_id)
-    return (jsonify(data), status)
+    return (jsonify(shaped(data, "playlist", status)), status)
 
 @bp.get("/playlists/<playlist_id>/tracks")
 @require_access_token
 def playlist_tracks_route(playlist_id):
     limit = min(max(int(request.args.get("limit", 50)), 1), 100)
     offset = max(int(request.args.get("offset", 0)), 0)
-    status, data = get_playlist_tracks(session, playlist_id, limit=limit, offset=offset)
-    return (jsonify(data), status)
+    status, data, source = _paged(
+        ("playlist_tracks", playlist_id), limit, offset,
+        lambda sess, off, **kw: get_playlist_tracks(sess, playlist_id, limit=limit, offset=off, **kw),
+    )
+    return (jsonify(shaped(data, "playlist_tracks", status)), status, {"X-Read-Ahead": source})
+
+@bp.delete("/prefetch")
+@require_access_token
+def cancel_prefetch():
+    """Drop the user's read-ahead pages (?playlist_id= for one playlist); sent when a list is closed."""
+    if not current_app.config.get("READ_AHEAD_ENABLED", True):
+        return ("", 204)
+    playlist_id = request.args.get("playlist_id")
+    lst = ("playlist_tracks", playlist_id) if playlist_id else None
+    read_ahead().discard(current_user_id(session), lst)
+    return ("", 204)
+
+@bp.get("/playlists/<playlist_id>/tracks/all")
+@require_access_token
+def playlist_tracks_all_route(playlist_id):
+    """
+    Whole playlist as NDJSON, one playlist item per line, in playlist order.
+    Pages after the first are fetched concurrently (PLAYLIST_FETCH_MAX_WORKERS) and
+    written out as they complete. An upstream failure mid-stream ends the body with
+    an {"error": ...} line.
+    """
+    sess = session._get_current_object()
+    pages = iter_playlist_pages(
+        sess, playlist_id, max_workers=current_app.config.get("PLAYLIST_FETCH_MAX_WORKERS", 4)
+    )
+    status, first = next(pages)
+    if status != 200:
+        pages.close()
+        return (jsonify(first), status)
+    dumps = current_app.json.dumps
+    fields = requested_fields()
+
+    def lines():
+        page_status, page = status, first
+        while True:
+            if page_status != 200:
+                yield dumps({"error": page, "status": page_status}) + "\n"
+                return
+            for item in page.get("items") or []:
+                yield dumps(project(item, "playlist_item", fields)) + "\n"
+            nxt = next(pages, None)
+            if nxt is None:
+                return
+            page_status, page = nxt
+
+    headers = {"X-Total-Count": str(first.get("total") or 0)}
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson", headers=headers)
 
 @bp.post("/playlists")
 @require_access_token
@@ -143,6 +323,7 @@ def create_playlist_route():
     description = body.get("description") or ""
     public = bool(body.get("public", False))
     status, data = create_playlist(session, name=name, description=description, public=public)
+    library_mutated(status, "playlists")
     return (jsonify(data), status)
 
 @bp.post("/playlists/<playlist_id>/tracks")
@@ -154,6 +335,7 @@ def add_playlist_tracks_route(playlist_id):
     if not isinstance(uris, list) or not uris:
         return jsonify({"error": "uris[] required"}), 400
     status, data = add_tracks_to_playlist(session, playlist_id, uris=uris, position=position)
+    library_mutated(status, "playlists")
     return (jsonify(data), status)
 
 @bp.delete("/playlists/<playlist_id>/tracks")
@@ -164,6 +346,7 @@ def remove_playlist_tracks_route(playlist_id):
     if not isinstance(uris, list) or not uris:
         return jsonify({"error": "uris[] required"}), 400
     status, data = remove_tracks_from_playlist(session, playlist_id, uris=uris)
+    library_mutated(status, "playlists")
     return (jsonify(data), status)
 
 @bp.get("/me/library/tracks")
@@ -171,8 +354,11 @@ def remove_playlist_tracks_route(playlist_id):
 def library_tracks_get():
     limit = min(max(int(request.args.get("limit", 20)), 1), 50)
     offset = max(int(request.args.get("offset", 0)), 0)
-    status, data = get_saved_tracks(session, limit=limit, offset=offset)
-    return (jsonify(data), status)
+    if mirror_enabled():
+        status, data = _mirrored_page("tracks", limit, offset)
+    else:
+        status, data = get_saved_tracks(session, limit=limit, offset=offset)
+    return (jsonify(shaped(data, "saved_tracks", status)), status)
 
 @bp.put("/me/library/tracks")
 @require_access_token
@@ -182,6 +368,7 @@ def library_tracks_save():
     if not isinstance(ids, list) or not ids:
         return jsonify({"error": "ids[] required"}), 400
     status, data = save_tracks(session, ids=ids)
+    library_mutated(status, "tracks")
     return (jsonify(data), status)
 
 @bp.delete("/me/library/tracks")
@@ -192,6 +379,7 @@ def library_tracks_remove():
     if not isinstance(ids, list) or not ids:
         return jsonify({"error": "ids[] required"}), 400
     status, data = remove_saved_tracks(session, ids=ids)
+    library_mutated(status, "tracks", removed=ids)
     return (jsonify(data), status)
 
 @bp.get("/me/library/albums")
@@ -199,8 +387,11 @@ def library_tracks_remove():
 def library_albums_get():
     limit = min(max(int(request.args.get("limit", 20)), 1), 50)
     offset = max(int(request.args.get("offset", 0)), 0)
-    status, data = get_saved_albums(session, limit=limit, offset=offset)
-    return (jsonify(data), status)
+    if mirror_enabled():
+        status, data = _mirrored_page("albums", limit, offset)
+    else:
+        status, data = get_saved_albums(session, limit=limit, offset=offset)
+    return (jsonify(shaped(data, "saved_albums", status)), status)
 
 @bp.put("/me/library/albums")
 @require_access_token
@@ -210,6 +401,7 @@ def library_albums_save():
     if not isinstance(ids, list) or not ids:
         return jsonify({"error": "ids[] required"}), 400
     status, data = save_albums(session, ids=ids)
+    library_mutated(status, "albums")
     return (jsonify(data), status)
 
 @bp.delete("/me/library/albums")
@@ -220,6 +412,7 @@ def library_albums_remove():
     if not isinstance(ids, list) or not ids:
         return jsonify({"error": "ids[] required"}), 400
     status, data = remove_saved_albums(session, ids=ids)
+    library_mutated(status, "albums", removed=ids)
     return (jsonify(data), status)
 
 @bp.post("/player/queue")
@@ -240,6 +433,7 @@ def player_seek():
     except ValueError:
         return jsonify({"error": "position_ms must be int"}), 400
     status, data = seek(session, position_ms=position_ms)
+    _player_changed(status, progress_ms=position_ms)
     return (jsonify(data), status)
 
 @bp.put("/player/shuffle")
@@ -250,6 +444,7 @@ def player_shuffle():
         return jsonify({"error": "state must be true|false"}), 400
     device_id = request.args.get("device_id")
     status, data = set_shuffle(session, state == "true", device_id=device_id)
+    _player_changed(status, shuffle_state=(state == "true"))
     return (jsonify(data), status)
 
 @bp.put("/player/repeat")
@@ -260,6 +455,7 @@ def player_repeat():
         return jsonify({"error": "state must be off|track|context"}), 400
     device_id = request.args.get("device_id")
     status, data = set_repeat(session, state, device_id=device_id)
+    _player_changed(status, repeat_state=state)
     return (jsonify(data), status)
 
 @bp.put("/player/volume")
@@ -273,4 +469,69 @@ def player_volume():
         return jsonify({"error": "percent must be 0..100"}), 400
     device_id = request.args.get("device_id")
     status, data = set_volume(session, percent, device_id=device_id)
-    return (jsonify(data), status)
\ No newline at end of file
+    _player_changed(status, device={"volume_percent": percent})
+    return (jsonify(data), status)
+
+# ---- Batch ----
+
+# Streaming responses can't be collected into a batch result
+_NOT_BATCHABLE = {"api.batch", "api.player_stream", "api.playlist_tracks_all_route"}
+
+@bp.post("/batch")
+@require_access_token
+def batch():
+    """
+    Body:
+    {
+      "requests": [ {"method": "GET", "path": "/me/top-tracks?limit=20", "body": {...}?}, ... ]
+    }
+    Paths are relative to this blueprint (/api). Sub-requests run concurrently
+    (BATCH_MAX_WORKERS) on the caller's session and share the batch's token check.
+    Returns {"responses": [{"status": 200, "body": ...}, ...]} in request order.
+    """
+    body = request.get_json(silent=True) or {}
+    subs = body.get("requests")
+    if not isinstance(subs, list) or not subs:
+        return jsonify({"error": "requests[] required"}), 400
+    max_requests = current_app.config.get("BATCH_MAX_REQUESTS", 20)
+    if len(subs) > max_requests:
+        return jsonify({"error": f"at most {max_requests} requests per batch"}), 400
+
+    app = current_app._get_current_object()
+    sess = session._get_current_object()
+    prefix = request.path[: -len("/batch")]
+
+    def dispatch(sub):
+        if not isinstance(sub, dict) or not str(sub.get("path") or "").startswith("/"):
+            return {"status": 400, "body": {"error": "each request needs a path starting with /"}}
+        method = str(sub.get("method") or "GET").upper()
+        ctx = app.test_request_context(
+            prefix + sub["path"],
+            method=method,
+            json=sub.get("body"),
+            environ_overrides={TOKEN_CHECKED_ENVIRON_KEY: True},
+        )
+        ctx.session = sess
+        with ctx:
+            req = ctx.request
+            if req.routing_exception is not None:
+                code = getattr(req.routing_exception, "code", 404)
+                return {"status": code, "body": {"error": "no such route"}}
+            if not req.url_rule.endpoint.startswith("api.") or req.url_rule.endpoint in _NOT_BATCHABLE:
+                return {"status": 400, "body": {"error": "route can't be batched"}}
+            try:
+                try:
+                    rv = app.dispatch_request()
+                except Exception as e:
+                    # The same errorhandlers a direct request gets (RateLimited -> 429, ...)
+                    rv = app.handle_user_exception(e)
+                if isinstance(rv, HTTPException):
+                    return {"status": rv.code, "body": {"error": rv.description}}
+                resp = app.make_response(rv)
+            except Exception as e:
+                app.logger.exception("batch sub-request failed: %s %s", method, sub["path"])
+                return {"status": 500, "body": {"error": str(e)}}
+            return {"status": resp.status_code, "body": resp.get_json(silent=True)}
+
+    responses = run_bounded(dispatch, subs, current_app.config.get("BATCH_MAX_WORKERS", 8))
+    return jsonify({"responses": responses})
@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from ..utils.extensions import app_singleton
+from ..utils.metrics import endpoint_template, upstream_call
+
+API_BASE = "https://api.spotify.com/v1"
+ACCOUNTS_BASE = "https://accounts.spotify.com"
+
+
+def _pooled_session(pool_connections: int, pool_maxsize: int, pool_block: bool, keepalive: bool) -> requests.Session:
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    # The session is shared between worker threads; never let it store cookies from one user's call for the next.
+    s.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    if not keepalive:
+        s.headers["Connection"] = "close"
+    return s
+
+
+class SpotifyClient:
+    """
+    Process-wide HTTP client for Spotify. Holds one keep-alive connection pool for
+    the Web API host and one for the accounts host, so upstream calls reuse
+    TCP/TLS connections instead of handshaking on every request.
+    urllib3's pools are thread-safe; a single instance is shared by every request thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_base: str = API_BASE,
+        accounts_base: str = ACCOUNTS_BASE,
+        pool_connections: int = 4,
+        pool_maxsize: int = 20,
+        pool_block: bool = False,
+        keepalive: bool = True,
+        timeout: float = 15,
+    ):
+        self.api_base = api_base.rstrip("/")
+        self.accounts_base = accounts_base.rstrip("/")
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self._api = _pooled_session(pool_connections, pool_maxsize, pool_block, keepalive)
+        self._accounts = _pooled_session(pool_connections, pool_maxsize, pool_block, keepalive)
+
+    @classmethod
+    def from_config(cls, config) -> "SpotifyClient":
+        return cls(
+            api_base=config.get("SPOTIFY_API_BASE", API_BASE),
+            accounts_base=config.get("SPOTIFY_ACCOUNTS_BASE", ACCOUNTS_BASE),
+            pool_connections=int(config.get("SPOTIFY_POOL_CONNECTIONS", 4)),
+            pool_maxsize=int(config.get("SPOTIFY_POOL_MAXSIZE", 20)),
+            pool_block=bool(config.get("SPOTIFY_POOL_BLOCK", False)),
+            keepalive=bool(config.get("SPOTIFY_KEEPALIVE", True)),
+            timeout=float(config.get("SPOTIFY_HTTP_TIMEOUT", 15)),
+        )
+
+    def api(self, method: str, path: str, *, headers=None, params=None, json=None, timeout: Optional[float] = None) -> requests.Response:
+        with upstream_call("spotify_api", method, endpoint_template(path)) as call:
+            r = self._api.request(
+                method,
+                f"{self.api_base}{path}",
+                headers=headers,
+                params=params or {},
+                json=json,
+                timeout=timeout or self.timeout,
+            )
+            call.status = r.status_code
+            return r
+
+    def accounts(self, method: str, path: str, *, headers=None, data=None, timeout: Optional[float] = None) -> requests.Response:
+        with upstream_call("spotify_accounts", method, path) as call:
+            r = self._accounts.request(
+                method,
+                f"{self.accounts_base}{path}",
+                headers=headers,
+                data=data,
+                timeout=timeout or self.timeout,
+            )
+            call.status = r.status_code
+            return r
+
+    def preconnect(self, connections: int = 4, timeout: float = 5) -> int:
+        """
+        Open up to `connections` keep-alive connections per host so the first real
+        calls skip the TCP/TLS handshake. Concurrent HEADs force distinct connections,
+        which go back into the pool when released. Best effort; returns how many succeeded.
+        """
+        def head(target):
+            session, url = target
+            try:
+                session.head(url, timeout=timeout)  # body read, connection back in the pool
+                return 1
+            except requests.RequestException:
+                return 0
+
+        n = max(1, min(int(connections), self.pool_maxsize))
+        targets = [(self._api, self.api_base)] * n + [(self._accounts, self.accounts_base)] * n
+        with ThreadPoolExecutor(max_workers=len(targets)) as ex:
+            return sum(ex.map(head, targets))
+
+    def close(self) -> None:
+        self._api.close()
+        self._accounts.close()
+
+
+def init_app(app) -> SpotifyClient:
+    client = SpotifyClient.from_config(app.config)
+    app.extensions["spotify_client"] = client
+    return client
+
+
+def get_client() -> SpotifyClient:
+    return app_singleton("spotify_client", lambda app: SpotifyClient.from_config(app.config))
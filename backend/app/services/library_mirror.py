@@ -0,0 +1,290 @@
+import json, os, time
+from typing import Iterable, List, Optional, Tuple
+from flask import current_app
+from .spotify import SpotifyError, _get, invalidate_playlist
+from ..utils.concurrency import SingleFlight, run_bounded
+from ..utils.db import open_sqlite
+from ..utils.extensions import app_singleton
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS library_items (
+    user_id  TEXT NOT NULL,
+    kind     TEXT NOT NULL,
+    item_id  TEXT NOT NULL,
+    sort_key TEXT NOT NULL,
+    version  TEXT,
+    payload  TEXT NOT NULL,
+    PRIMARY KEY (user_id, kind, item_id)
+);
+CREATE INDEX IF NOT EXISTS library_items_order ON library_items (user_id, kind, sort_key);
+CREATE TABLE IF NOT EXISTS library_sync (
+    user_id   TEXT NOT NULL,
+    kind      TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (user_id, kind)
+);
+"""
+
+# Saved items read newest first (Spotify's order); playlists in the user's own order
+_ORDER = {"tracks": "sort_key DESC, item_id", "albums": "sort_key DESC, item_id", "playlists": "sort_key, item_id"}
+
+Row = Tuple[str, str, Optional[str], dict]  # (item_id, sort_key, version, payload)
+
+
+def _slim(value):
+    """Drop available_markets (most of a track/album's bytes; nothing reads it) before storing."""
+    if isinstance(value, dict):
+        return {k: _slim(v) for k, v in value.items() if k != "available_markets"}
+    if isinstance(value, list):
+        return [_slim(v) for v in value]
+    return value
+
+
+class LibraryMirror:
+    """
+    Per-user copy of the saved tracks, saved albums and playlist list in SQLite.
+    sort_key is added_at for saved items and the zero-padded list position for
+    playlists; version is a playlist's snapshot_id. library_sync records when each
+    (user, kind) was last brought up to date; a missing row means "never synced"
+    and synced_at = 0 means "changed locally, sync before trusting".
+
+    Users with no sync in `retention` seconds (0 keeps everyone) are dropped when the
+    mirror is opened and after every `purge_every` syncs.
+    """
+
+    def __init__(self, path: str, *, retention: float = 30 * 86400, purge_every: int = 100):
+        self.path = path
+        self.retention = retention
+        self.purge_every = max(int(purge_every), 1)
+        self.flight = SingleFlight()
+        self._syncs = 0
+        self._db, self._lock = open_sqlite(path, _SCHEMA)
+        self.purge_inactive()
+
+    @classmethod
+    def from_app(cls, app) -> "LibraryMirror":
+        return cls(
+            app.config.get("LIBRARY_MIRROR_PATH") or os.path.join(app.instance_path, "library_mirror.sqlite3"),
+            retention=app.config.get("LIBRARY_MIRROR_RETENTION_DAYS", 30) * 86400,
+        )
+
+    def synced_at(self, user_id: str, kind: str) -> Optional[float]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT synced_at FROM library_sync WHERE user_id = ? AND kind = ?", (user_id, kind)
+            ).fetchone()
+        return row[0] if row else None
+
+    def page(self, user_id: str, kind: str, limit: int, offset: int) -> Tuple[List[dict], int]:
+        with self._lock:
+            total = self._db.execute(
+                "SELECT COUNT(*) FROM library_items WHERE user_id = ? AND kind = ?", (user_id, kind)
+            ).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT payload FROM library_items WHERE user_id = ? AND kind = ? ORDER BY {_ORDER[kind]} LIMIT ? OFFSET ?",
+                (user_id, kind, limit, offset),
+            ).fetchall()
+        return [json.loads(p) for (p,) in rows], total
+
+    def count(self, user_id: str, kind: str) -> int:
+        return self.page(user_id, kind, 0, 0)[1]
+
+    def newest(self, user_id: str, kind: str) -> Tuple[Optional[str], set]:
+        """Newest sort_key stored and the ids carrying it (ties on added_at are common for bulk saves)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT sort_key, item_id FROM library_items WHERE user_id = ? AND kind = ? AND sort_key = "
+                "(SELECT MAX(sort_key) FROM library_items WHERE user_id = ? AND kind = ?)",
+                (user_id, kind, user_id, kind),
+            ).fetchall()
+        return (rows[0][0] if rows else None), {item_id for _, item_id in rows}
+
+    def versions(self, user_id: str, kind: str) -> dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT item_id, version FROM library_items WHERE user_id = ? AND kind = ?", (user_id, kind)
+            ).fetchall()
+        return dict(rows)
+
+    def _write(self, user_id: str, kind: str, rows: Iterable[Row]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO library_items (user_id, kind, item_id, sort_key, version, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, kind, item_id, sort_key, version, json.dumps(_slim(payload)))
+             for item_id, sort_key, version, payload in rows],
+        )
+
+    def _stamp(self, user_id: str, kind: str, synced_at: float) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO library_sync (user_id, kind, synced_at) VALUES (?, ?, ?)",
+            (user_id, kind, synced_at),
+        )
+        self._syncs += 1
+
+    def replace_all(self, user_id: str, kind: str, rows: Iterable[Row]) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM library_items WHERE user_id = ? AND kind = ?", (user_id, kind))
+            self._write(user_id, kind, rows)
+            self._stamp(user_id, kind, time.time())
+        self._maybe_purge()
+
+    def add(self, user_id: str, kind: str, rows: Iterable[Row]) -> None:
+        with self._lock, self._db:
+            self._write(user_id, kind, rows)
+            self._stamp(user_id, kind, time.time())
+        self._maybe_purge()
+
+    def forget(self, user_id: str, kind: str, item_ids: Iterable[str]) -> None:
+        ids = list(item_ids)
+        with self._lock, self._db:
+            for i in range(0, len(ids), 400):
+                chunk = ids[i:i + 400]
+                self._db.execute(
+                    f"DELETE FROM library_items WHERE user_id = ? AND kind = ? AND item_id IN ({','.join('?' * len(chunk))})",
+                    (user_id, kind, *chunk),
+                )
+
+    def mark_stale(self, user_id: str, kind: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE library_sync SET synced_at = 0 WHERE user_id = ? AND kind = ?", (user_id, kind))
+
+    def forget_user(self, user_id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM library_items WHERE user_id = ?", (user_id,))
+            self._db.execute("DELETE FROM library_sync WHERE user_id = ?", (user_id,))
+
+    def purge_inactive(self) -> int:
+        """Drop every user whose newest sync is older than `retention`; returns how many."""
+        if self.retention <= 0:
+            return 0
+        with self._lock, self._db:
+            users = [uid for (uid,) in self._db.execute(
+                "SELECT user_id FROM library_sync GROUP BY user_id HAVING MAX(synced_at) < ?",
+                (time.time() - self.retention,),
+            ).fetchall()]
+            for i in range(0, len(users), 400):
+                chunk = users[i:i + 400]
+                marks = ",".join("?" * len(chunk))
+                self._db.execute(f"DELETE FROM library_items WHERE user_id IN ({marks})", chunk)
+                self._db.execute(f"DELETE FROM library_sync WHERE user_id IN ({marks})", chunk)
+        return len(users)
+
+    def _maybe_purge(self) -> None:
+        if self._syncs % self.purge_every == 0:
+            self.purge_inactive()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def library_mirror() -> LibraryMirror:
+    return app_singleton("library_mirror", LibraryMirror.from_app)
+
+def mirror_enabled() -> bool:
+    return current_app.config.get("LIBRARY_MIRROR_ENABLED", True)
+
+
+_SAVED = {"tracks": ("/me/tracks", "track"), "albums": ("/me/albums", "album")}
+
+def _saved_row(kind: str, item: dict) -> Optional[Row]:
+    entity = item.get(_SAVED[kind][1]) or {}
+    if not entity.get("id"):
+        return None  # local files and unavailable items have no id to key on
+    return entity["id"], item.get("added_at") or "", None, item
+
+def _fetch_all(session, path: str, page_size: int) -> List[dict]:
+    """Every item behind a paging endpoint: the first page gives the total, the rest go concurrently."""
+    _, first = _get(session, path, params={"limit": page_size, "offset": 0})
+    offsets = range(page_size, int(first.get("total") or 0), page_size)
+    rest = run_bounded(
+        lambda off: _get(session, path, params={"limit": page_size, "offset": off})[1],
+        offsets, current_app.config.get("LIBRARY_SYNC_MAX_WORKERS", 4),
+    )
+    items = list(first.get("items") or [])
+    for page in rest:
+        items.extend(page.get("items") or [])
+    return items
+
+def _sync_saved(session, user_id: str, kind: str, full: bool) -> None:
+    mirror = library_mirror()
+    path, _ = _SAVED[kind]
+    mark, at_mark = (None, set()) if full else mirror.newest(user_id, kind)
+    if mark is None:
+        rows = [r for r in (_saved_row(kind, it) for it in _fetch_all(session, path, 50)) if r]
+        mirror.replace_all(user_id, kind, rows)
+        return
+
+    # Delta: walk newest-first until we are back at what the mirror already has
+    fresh, offset, total = [], 0, None
+    while True:
+        _, page = _get(session, path, params={"limit": 50, "offset": offset})
+        total = int(page.get("total") or 0) if total is None else total
+        items = page.get("items") or []
+        done = not items
+        for item in items:
+            row = _saved_row(kind, item)
+            if row is None:
+                continue
+            if row[1] < mark or (row[1] == mark and row[0] in at_mark):
+                done = True
+                break
+            fresh.append(row)
+        if done or not page.get("next"):
+            break
+        offset += 50
+    mirror.add(user_id, kind, fresh)
+    # added_at can't reveal removals; a count mismatch means something was unsaved upstream
+    if mirror.count(user_id, kind) != total:
+        _sync_saved(session, user_id, kind, full=True)
+
+def _sync_playlists(session, user_id: str) -> None:
+    """The list itself is small; it is re-read whole, and snapshot_id tells which playlists changed."""
+    mirror = library_mirror()
+    before = mirror.versions(user_id, "playlists")
+    rows = [
+        (pl["id"], f"{pos:08d}", pl.get("snapshot_id"), pl)
+        for pos, pl in enumerate(_fetch_all(session, "/me/playlists", 50)) if pl and pl.get("id")
+    ]
+    mirror.replace_all(user_id, "playlists", rows)
+    for pid, _, snapshot_id, _ in rows:
+        if pid in before and before[pid] != snapshot_id:
+            invalidate_playlist(pid)
+
+def sync_library(session, user_id: str, kind: str, *, full: bool = False) -> None:
+    """Bring one part of the mirror up to date; concurrent syncs of the same (user, kind) share one run."""
+    def run():
+        if kind == "playlists":
+            _sync_playlists(session, user_id)
+        else:
+            _sync_saved(session, user_id, kind, full)
+    library_mirror().flight.do((user_id, kind), run)
+
+def library_page(session, user_id: str, kind: str, limit: int, offset: int, *, refresh: bool = False):
+    """
+    One page of the user's library from the mirror, syncing first when it has never
+    been synced, is older than LIBRARY_MIRROR_MAX_AGE, or refresh=True. If a re-sync
+    fails upstream the existing copy is served as is. Returns items/total/limit/offset
+    plus synced_at (unix time of the last successful sync).
+    """
+    mirror = library_mirror()
+    synced_at = mirror.synced_at(user_id, kind)
+    max_age = current_app.config.get("LIBRARY_MIRROR_MAX_AGE", 300)
+    if refresh or synced_at is None or time.time() - synced_at > max_age:
+        try:
+            sync_library(session, user_id, kind)
+        except SpotifyError as e:
+            if synced_at is None:
+                raise
+            current_app.logger.warning("library sync failed for %s/%s, serving mirror: %s", user_id, kind, e)
+        synced_at = mirror.synced_at(user_id, kind)
+    items, total = mirror.page(user_id, kind, limit, offset)
+    return 200, {"items": items, "total": total, "limit": limit, "offset": offset, "synced_at": synced_at}
+
+def library_changed(user_id: str, kind: str, *, removed: Iterable[str] = ()) -> None:
+    """After a mutation through this app: drop removed ids now, re-check upstream on the next read."""
+    mirror = library_mirror()
+    removed = list(removed)
+    if removed:
+        mirror.forget(user_id, kind, removed)
+    mirror.mark_stale(user_id, kind)
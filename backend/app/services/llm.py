@@ -0,0 +1,223 @@
+import json, time
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
+from flask import current_app
+from .prompt_cache import PromptCache, normalize_prompt
+from ..utils.extensions import app_singleton
+from ..utils.metrics import OPENAI_FIRST_TOKEN, OPENAI_LATENCY, OPENAI_RESULTS, UPSTREAM_IN_FLIGHT
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+SYSTEM_PROMPT = (
+    "You are an assistant that helps recommend Spotify songs/artists. "
+    "Always respond in strict JSON with a 'candidates' array, "
+    "where each element is {\"artist\": <name>, \"track\": <optional track name>}."
+)
+
+
+def chat_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _build_client(app) -> "OpenAI":
+    # The SDK is the heaviest import in the process (~0.5 s); only pay for it once an
+    # AI route (or warmup) actually needs a client
+    from openai import OpenAI
+
+    cfg = app.config
+    return OpenAI(
+        api_key=cfg["OPENAI_API_KEY"],
+        base_url=cfg.get("OPENAI_BASE_URL") or None,
+        timeout=float(cfg.get("OPENAI_TIMEOUT", 60)),
+    )
+
+
+def init_app(app) -> None:
+    """
+    Drop any client built from earlier config. The process-wide client (one keep-alive
+    pool shared by every request) is built by openai_client() on first use, or before
+    traffic by warmup when WARMUP_ENABLED, so workers that never serve AI requests
+    never import the SDK.
+    """
+    app.extensions.pop("openai_client", None)
+
+
+def openai_client() -> "OpenAI":
+    return app_singleton("openai_client", _build_client)
+
+
+class _completion:
+    """Latency, outcome and in-flight accounting for one chat completion ("complete" or "stream")."""
+
+    __slots__ = ("model", "mode", "_t0", "_first")
+
+    def __init__(self, model: str, mode: str):
+        self.model, self.mode = model, mode
+        self._first = False
+
+    def __enter__(self):
+        UPSTREAM_IN_FLIGHT.inc("openai")
+        self._t0 = time.perf_counter()
+        return self
+
+    def first_token(self) -> None:
+        if not self._first:
+            self._first = True
+            OPENAI_FIRST_TOKEN.observe(time.perf_counter() - self._t0, self.model)
+
+    def __exit__(self, exc_type, exc, tb):
+        outcome = "ok" if exc_type is None else ("closed" if exc_type is GeneratorExit else "error")
+        OPENAI_LATENCY.observe(time.perf_counter() - self._t0, self.model, self.mode)
+        OPENAI_RESULTS.inc(self.model, self.mode, outcome)
+        UPSTREAM_IN_FLIGHT.dec("openai")
+        return False
+
+
+def prompt_cache() -> Optional[PromptCache]:
+    if not current_app.config.get("PROMPT_CACHE_ENABLED", True):
+        return None
+    return app_singleton("prompt_cache", PromptCache.from_app)
+
+
+def prompt_key(prompt: str) -> str:
+    return normalize_prompt(prompt, current_app.config.get("OPENAI_MODEL", "gpt-4o-mini"))
+
+
+def parse_candidates(content: str) -> Optional[List[dict]]:
+    """The candidates list of a completion, or None when the model didn't return the expected shape."""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    candidates = data.get("candidates") if isinstance(data, dict) else None
+    if not isinstance(candidates, list):
+        return None
+    return [c for c in candidates if isinstance(c, dict)]
+
+
+def complete_candidates(prompt: str) -> Tuple[List[dict], bool]:
+    """
+    (candidates, cached) for `prompt`: from the prompt cache when an equivalent prompt
+    was answered before, otherwise from one non-streaming completion, which is cached
+    if it parsed.
+    """
+    cache, key = prompt_cache(), prompt_key(prompt)
+    if cache:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit, True
+    model = current_app.config.get("OPENAI_MODEL", "gpt-4o-mini")
+    with _completion(model, "complete"):
+        resp = openai_client().chat.completions.create(
+            model=model,
+            messages=chat_messages(prompt),
+            response_format={"type": "json_object"},
+        )
+    candidates = parse_candidates(resp.choices[0].message.content)
+    if candidates is None:
+        raise ValueError("LLM response is not a candidates object")
+    if cache:
+        cache.put(key, candidates)
+    return candidates, False
+
+
+class CandidateStreamParser:
+    """
+    Incremental parser for {"candidates": [{...}, {...}, ...]} arriving in arbitrary
+    text chunks. feed() returns the candidate objects completed by that chunk, so each
+    one can be acted on while the model is still writing the rest. Anything before the
+    "candidates" array, and objects that fail to parse, are skipped.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0          # next unread char in _buf
+        self._in_array = False
+        self._done = False
+        self._depth = 0        # brace depth inside the array
+        self._start = -1       # start of the object being read
+        self._in_str = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        if self._done or not chunk:
+            return []
+        self._buf += chunk
+        out = []
+        if not self._in_array:
+            key = self._buf.find('"candidates"')
+            if key < 0:
+                return out
+            bracket = self._buf.find("[", key)
+            if bracket < 0:
+                return out
+            self._in_array = True
+            self._pos = bracket + 1
+
+        buf, i = self._buf, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._start >= 0:
+                    try:
+                        obj = json.loads(buf[self._start:i + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        out.append(obj)
+                    self._start = -1
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                break
+            i += 1
+
+        # Keep only the unfinished object so the buffer stays small
+        keep = self._start if self._start >= 0 else i
+        self._buf, self._pos = buf[keep:], i - keep
+        if self._start >= 0:
+            self._start = 0
+        return out
+
+
+def stream_content(prompt: str, *, client: Optional["OpenAI"] = None) -> Iterator[str]:
+    """Text deltas of a JSON-mode completion for `prompt`. Closing the iterator closes the HTTP stream."""
+    client = client or openai_client()
+    model = current_app.config.get("OPENAI_MODEL", "gpt-4o-mini")
+    with _completion(model, "stream") as call:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=chat_messages(prompt),
+            response_format={"type": "json_object"},
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    call.first_token()
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+
+
+def iter_candidates(deltas: Iterable[str]) -> Iterator[dict]:
+    """Candidates from a stream of text deltas, each yielded as soon as its object closes."""
+    parser = CandidateStreamParser()
+    for delta in deltas:
+        yield from parser.feed(delta)
@@ -0,0 +1,172 @@
+import queue, threading, time
+from typing import Dict, Optional
+from .spotify import get_current_playback, token_refresher
+from ..utils.concurrency import SingleFlight
+
+
+class _Channel:
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.lock = threading.Lock()
+        self.token: Optional[dict] = None  # latest token seen on one of this user's requests
+        self.status: Optional[int] = None
+        self.payload: Optional[dict] = None
+        self.updated_at = 0.0
+        self.subscribers: list = []
+        self.wake = threading.Event()
+        self.poller: Optional[threading.Thread] = None
+
+
+class PlaybackHub:
+    """
+    Shared per-user playback state. At most one upstream get_current_playback is in
+    flight per user; /api/player/current reads from here, /api/player/stream
+    subscribers are fed by a single poller thread per user, and player commands
+    patch the state and wake the poller. Polling slows down (up to max_interval)
+    while nothing is playing and stops once the last subscriber leaves, which also
+    drops the user's channel; channels only read through current() are swept once
+    idle for max_interval.
+    """
+
+    def __init__(self, app, *, interval: float = 5.0, max_interval: float = 30.0, max_age: float = 10.0, nudge_delay: float = 0.3):
+        self._app = app
+        self.interval = interval
+        self.max_interval = max_interval
+        self.max_age = max_age
+        self.nudge_delay = nudge_delay
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+        self._flight = SingleFlight()
+
+    @classmethod
+    def from_app(cls, app) -> "PlaybackHub":
+        return cls(
+            app,
+            interval=app.config.get("PLAYER_POLL_INTERVAL", 5.0),
+            max_interval=app.config.get("PLAYER_POLL_MAX_INTERVAL", 30.0),
+            max_age=app.config.get("PLAYER_STATE_MAX_AGE", 10.0),
+        )
+
+    def _channel(self, user_id: str, session=None) -> _Channel:
+        with self._lock:
+            ch = self._channels.get(user_id)
+            if ch is None:
+                self._sweep()
+                ch = self._channels[user_id] = _Channel(user_id)
+        if session is not None and session.get("token"):
+            ch.token = dict(session["token"])
+        return ch
+
+    def _sweep(self) -> None:
+        # Under self._lock. At most once per max_interval, drop channels nobody streams
+        # and nobody has read lately; their state would be refetched anyway.
+        now = time.monotonic()
+        if now - self._swept_at < self.max_interval:
+            return
+        self._swept_at = now
+        for user_id, ch in list(self._channels.items()):
+            with ch.lock:
+                idle = not ch.subscribers and ch.poller is None and now - ch.updated_at > self.max_interval
+            if idle:
+                del self._channels[user_id]
+
+    def _poll(self, ch: _Channel):
+        sess = {"token": ch.token}
+        if not token_refresher().ensure_fresh(sess):
+            return 401, {"error": "unauthorized"}
+        status, payload = get_current_playback(sess)
+        ch.token = sess["token"]
+        self._publish(ch, status, payload)
+        return status, payload
+
+    def _publish(self, ch: _Channel, status: int, payload: Optional[dict]) -> None:
+        msg = {"status": status, "playback": payload or None}
+        with ch.lock:
+            ch.status, ch.payload, ch.updated_at = status, payload, time.monotonic()
+            subscribers = list(ch.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(msg)
+            except queue.Full:
+                # Slow consumer: only the latest state matters
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait(msg)
+
+    def current(self, session, user_id: str):
+        """(status, payload) like get_current_playback, served from shared state while it is fresh."""
+        ch = self._channel(user_id, session)
+        with ch.lock:
+            if ch.status is not None and time.monotonic() - ch.updated_at < self.max_age:
+                return ch.status, ch.payload
+        return self._flight.do(user_id, lambda: self._poll(ch))
+
+    def subscribe(self, session, user_id: str) -> "queue.Queue":
+        q: "queue.Queue" = queue.Queue(maxsize=4)
+        while True:
+            ch = self._channel(user_id, session)
+            # Register under the hub lock so a concurrent unsubscribe can't drop the channel in between
+            with self._lock, ch.lock:
+                if self._channels.get(user_id) is not ch:
+                    continue
+                ch.subscribers.append(q)
+                break
+        with ch.lock:
+            if ch.status is not None:
+                q.put_nowait({"status": ch.status, "playback": ch.payload or None})
+            if ch.poller is None:
+                ch.poller = threading.Thread(target=self._run_poller, args=(ch,), daemon=True, name=f"playback-{user_id}")
+                ch.poller.start()
+        return q
+
+    def unsubscribe(self, user_id: str, q: "queue.Queue") -> None:
+        with self._lock:
+            ch = self._channels.get(user_id)
+            if ch is None:
+                return
+            with ch.lock:
+                if q in ch.subscribers:
+                    ch.subscribers.remove(q)
+                last = not ch.subscribers
+            if last:
+                del self._channels[user_id]
+        if last:
+            ch.wake.set()  # let the poller notice and exit
+
+    def nudge(self, session, user_id: str, patch: Optional[dict] = None) -> None:
+        """A player command succeeded: apply its expected effect now and re-poll shortly."""
+        ch = self._channel(user_id, session)
+        with ch.lock:
+            payload = ch.payload
+            status = ch.status
+        if patch and status == 200 and payload:
+            merged = {**payload, **{k: v for k, v in patch.items() if k != "device"}}
+            if "device" in patch and payload.get("device"):
+                merged["device"] = {**payload["device"], **patch["device"]}
+            self._publish(ch, 200, merged)
+        with ch.lock:
+            ch.updated_at = 0.0  # force the next current() to go upstream
+        ch.wake.set()
+
+    def _run_poller(self, ch: _Channel) -> None:
+        interval = self.interval
+        with self._app.app_context():
+            while True:
+                with ch.lock:
+                    if not ch.subscribers:
+                        ch.poller = None
+                        return
+                try:
+                    status, payload = self._flight.do(ch.user_id, lambda: self._poll(ch))
+                    playing = status == 200 and bool((payload or {}).get("is_playing"))
+                except Exception:
+                    self._app.logger.warning("playback poll failed for %s", ch.user_id, exc_info=True)
+                    playing = False
+                interval = self.interval if playing else min(interval * 2, self.max_interval)
+                if ch.wake.wait(interval):
+                    ch.wake.clear()
+                    interval = self.interval
+                    time.sleep(self.nudge_delay)  # give Spotify a moment to apply the command
@@ -0,0 +1,79 @@
+import json, os, re, time
+from typing import List, Optional
+from ..utils.db import open_sqlite
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    prompt     TEXT PRIMARY KEY,
+    candidates TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prompts_used ON prompts (used_at);
+"""
+
+_NON_WORD = re.compile(r"[^\w']+")
+
+
+def normalize_prompt(prompt: str, model: str = "") -> str:
+    """Case, punctuation and spacing don't change what the model is asked for."""
+    text = " ".join(_NON_WORD.sub(" ", prompt.casefold()).split())
+    return f"{model}\x1f{text}" if model else text
+
+
+class PromptCache:
+    """
+    On-disk (SQLite) cache of LLM prompt -> candidates list, keyed on the normalized
+    prompt (see normalize_prompt). Entries expire after `ttl` seconds; past
+    `max_entries` the least recently used ones are evicted. Survives restarts and is
+    shared by every worker process pointed at the same file.
+    """
+
+    def __init__(self, path: str, *, ttl: float = 7 * 86400, max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._db, self._lock = open_sqlite(path, _SCHEMA)
+
+    @classmethod
+    def from_app(cls, app) -> "PromptCache":
+        path = app.config.get("PROMPT_CACHE_PATH") or os.path.join(app.instance_path, "prompt_cache.sqlite3")
+        return cls(
+            path,
+            ttl=app.config.get("PROMPT_CACHE_TTL", 7 * 86400),
+            max_entries=app.config.get("PROMPT_CACHE_MAX_ENTRIES", 5000),
+        )
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT candidates FROM prompts WHERE prompt = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE prompts SET used_at = ? WHERE prompt = ?", (now, key))
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, candidates: List[dict]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO prompts (prompt, candidates, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(candidates), now + self.ttl, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM prompts WHERE expires_at <= ?", (now,))
+        over = self._db.execute("SELECT COUNT(*) FROM prompts").fetchone()[0] - self.max_entries
+        if over > 0:
+            self._db.execute(
+                "DELETE FROM prompts WHERE prompt IN (SELECT prompt FROM prompts ORDER BY used_at LIMIT ?)", (over,)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
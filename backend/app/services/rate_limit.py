@@ -0,0 +1,128 @@
+import heapq, itertools, threading, time
+from typing import Callable, Dict, Optional
+
+# Priority classes, lowest value served first
+INTERACTIVE = 0   # player commands a user is waiting on
+NORMAL = 1        # page loads, search, polling
+BULK = 2          # library and playlist mutations, read-ahead prefetches
+
+
+class _Bucket:
+    __slots__ = ("tokens", "stamp", "blocked_until", "waiters")
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters: list = []  # heap of (priority, seq)
+
+
+class UpstreamScheduler:
+    """
+    Gate for every outbound Spotify Web API call in the process.
+
+    - One token bucket per client_id (Spotify rate-limits per app, not per user):
+      `rate` requests/second with bursts up to `burst`. rate=0 turns throttling off.
+      The bucket is per process: with N workers the app as a whole may send N x rate.
+    - A 429 parks the whole bucket until its Retry-After has passed, so workers stop
+      hammering an app that is already over the limit.
+    - Callers that have to wait are served by priority class, then arrival order, so a
+      play/pause queued behind a bulk save goes first.
+    - Nobody waits longer than `max_wait`: acquire() returns False instead, and returns
+      it at once when Retry-After alone runs past the caller's deadline.
+    """
+
+    def __init__(self, *, rate: float = 0.0, burst: float = 20, max_wait: float = 10.0):
+        self.rate = rate
+        self.burst = max(float(burst), 1.0)
+        self.max_wait = max_wait
+        self._buckets: Dict[str, _Bucket] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_app(cls, app) -> "UpstreamScheduler":
+        return cls(
+            rate=float(app.config.get("SPOTIFY_RATE_LIMIT", 0)),
+            burst=float(app.config.get("SPOTIFY_RATE_BURST", 20)),
+            max_wait=float(app.config.get("SPOTIFY_RATE_MAX_WAIT", 10)),
+        )
+
+    def _bucket(self, client_id: str) -> _Bucket:
+        b = self._buckets.get(client_id)
+        if b is None:
+            b = self._buckets[client_id] = _Bucket(self.burst)
+        return b
+
+    def _refill(self, b: _Bucket, now: float) -> None:
+        if self.rate > 0:
+            b.tokens = min(self.burst, b.tokens + (now - b.stamp) * self.rate)
+        b.stamp = now
+
+    def acquire(self, client_id: str, priority: int = NORMAL, *, timeout: Optional[float] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Block until this caller may send one request. False if that takes longer than the
+        timeout, or once `cancelled()` turns true while waiting (checked every 250 ms).
+        """
+        deadline = time.monotonic() + (self.max_wait if timeout is None else timeout)
+        with self._cond:
+            b = self._bucket(client_id)
+            ticket = (priority, next(self._seq))
+            heapq.heappush(b.waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(b, now)
+                    if b.blocked_until > deadline:
+                        return False
+                    if now >= b.blocked_until and b.waiters[0] == ticket and (self.rate <= 0 or b.tokens >= 1):
+                        if self.rate > 0:
+                            b.tokens -= 1
+                        return True
+                    if now >= deadline or (cancelled is not None and cancelled()):
+                        return False
+                    if now < b.blocked_until:
+                        wait = b.blocked_until - now
+                    elif b.waiters[0] == ticket:
+                        wait = (1 - b.tokens) / self.rate
+                    else:
+                        wait = deadline - now  # woken when the head is served
+                    self._cond.wait(min(wait, deadline - now, 0.25 if cancelled else wait))
+            finally:
+                b.waiters.remove(ticket)
+                heapq.heapify(b.waiters)
+                self._cond.notify_all()
+
+    def reserve(self, client_id: str) -> Optional[float]:
+        """
+        Non-blocking acquire for event-loop callers: takes a slot now and returns how
+        long to sleep before using it, or None if that would exceed max_wait.
+        Reservations skip the priority queue.
+        """
+        with self._cond:
+            b = self._bucket(client_id)
+            now = time.monotonic()
+            self._refill(b, now)
+            start = max(now, b.blocked_until)
+            if self.rate > 0:
+                start = max(start, now + max(1 - b.tokens, 0.0) / self.rate)
+            if start - now > self.max_wait:
+                return None
+            if self.rate > 0:
+                b.tokens -= 1
+            return start - now
+
+    def penalize(self, client_id: str, retry_after: float) -> None:
+        """Record a 429: nothing for this client goes out for `retry_after` seconds."""
+        with self._cond:
+            b = self._bucket(client_id)
+            b.blocked_until = max(b.blocked_until, time.monotonic() + max(retry_after, 0.0))
+            b.tokens = 0.0
+            self._cond.notify_all()
+
+    def blocked_for(self, client_id: str) -> float:
+        """Seconds left on the current Retry-After backoff (0 when not backing off)."""
+        with self._cond:
+            b = self._buckets.get(client_id)
+            return max(b.blocked_until - time.monotonic(), 0.0) if b else 0.0
@@ -0,0 +1,169 @@
+import threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Optional, Tuple
+from flask import current_app
+from .spotify import UpstreamCancelled
+from ..utils.extensions import app_singleton
+from ..utils.metrics import READ_AHEAD_PAGES
+
+
+class _Page:
+    __slots__ = ("key", "expires_at", "done", "status", "data", "charged", "cancelled")
+
+    def __init__(self, key: Hashable, expires_at: float):
+        self.key = key
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.status: Optional[int] = None
+        self.data = None
+        self.charged = 0  # bytes counted against max_bytes while buffered
+        self.cancelled = False
+
+    def dropped(self) -> bool:
+        return self.cancelled or time.monotonic() >= self.expires_at
+
+
+class ReadAhead:
+    """
+    Server-side read-ahead for offset-paginated lists. Once page N of a list has been
+    served, page N+1 is fetched in the background into a short-lived per-user buffer
+    and the request for it is answered from there, waiting for the fetch if it is
+    still in flight.
+
+    - One buffered page per (user, list): serving or prefetching another position of
+      the same list replaces it, and at most `max_lists` lists are kept per user.
+    - Completed pages count against `max_bytes` overall; the oldest go first.
+    - A page is dropped `ttl` seconds after the prefetch started. A fetch still queued
+      for an upstream slot by then, replaced, evicted or cancelled (the user closed the
+      list) gives up its slot instead of calling Spotify.
+    """
+
+    def __init__(self, *, ttl: float = 20, max_lists: int = 4, max_bytes: int = 16 * 1024 * 1024,
+                 max_workers: int = 2, wait: float = 10):
+        self.ttl = ttl
+        self.max_lists = max(int(max_lists), 1)
+        self.max_bytes = max_bytes
+        self.wait = wait
+        self._pages: "OrderedDict[tuple, _Page]" = OrderedDict()  # (user_id, list) -> page
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(int(max_workers), 1), thread_name_prefix="read-ahead")
+
+    @classmethod
+    def from_app(cls, app) -> "ReadAhead":
+        return cls(
+            ttl=app.config.get("READ_AHEAD_TTL", 20),
+            max_lists=app.config.get("READ_AHEAD_MAX_LISTS", 4),
+            max_bytes=app.config.get("READ_AHEAD_MAX_BYTES", 16 * 1024 * 1024),
+            max_workers=app.config.get("READ_AHEAD_MAX_WORKERS", 2),
+            wait=app.config.get("READ_AHEAD_WAIT", 10),
+        )
+
+    def take(self, user_id: str, lst: Hashable, key: Hashable) -> Optional[Tuple[int, dict]]:
+        """The buffered (status, data) for page `key` of `lst`, or None to fetch it directly."""
+        with self._lock:
+            self._expire()
+            page = self._pages.get((user_id, lst))
+            if page is None:
+                return None
+            if page.key != key:  # the user jumped elsewhere in the list
+                self._cancel((user_id, lst))
+                return None
+            self._drop((user_id, lst))
+        joined = not page.done.is_set()
+        if not page.done.wait(max(0.0, min(self.wait, page.expires_at - time.monotonic()))):
+            page.cancelled = True
+            return None
+        if page.status != 200:
+            return None
+        READ_AHEAD_PAGES.inc("joined" if joined else "served")
+        return page.status, page.data
+
+    def prefetch(self, user_id: str, lst: Hashable, key: Hashable, fetch: Callable[[Callable[[], bool]], Tuple[int, dict]]) -> None:
+        """
+        Start fetch(cancelled) for page `key` of `lst` in the background. fetch gets a
+        callable that turns true once the page is no longer wanted and should pass it
+        on to the upstream scheduler.
+        """
+        page = _Page(key, time.monotonic() + self.ttl)
+        with self._lock:
+            self._expire()
+            if (user_id, lst) in self._pages:
+                self._cancel((user_id, lst))
+            self._pages[(user_id, lst)] = page
+            mine = [k for k in self._pages if k[0] == user_id]
+            for k in mine[:-self.max_lists]:
+                self._cancel(k)
+        app = current_app._get_current_object()
+        self._pool.submit(self._run, app, (user_id, lst), page, fetch)
+
+    def _run(self, app, slot: tuple, page: _Page, fetch) -> None:
+        if page.dropped():
+            page.done.set()
+            READ_AHEAD_PAGES.inc("cancelled")
+            return
+        size = 0
+        try:
+            with app.app_context():
+                page.status, page.data = fetch(page.dropped)
+                size = len(app.json.dumps(page.data)) if page.status == 200 else 0
+        except UpstreamCancelled:
+            READ_AHEAD_PAGES.inc("cancelled")
+        except Exception:  # a failed read-ahead just means the next page is fetched on demand
+            READ_AHEAD_PAGES.inc("failed")
+        finally:
+            page.done.set()
+        with self._lock:
+            if self._pages.get(slot) is not page:
+                return
+            if page.status != 200 or size > self.max_bytes:
+                self._drop(slot)
+                return
+            page.charged = size
+            self._bytes += size
+            for k in [k for k, p in self._pages.items() if p.charged and k != slot]:
+                if self._bytes <= self.max_bytes:
+                    break
+                self._cancel(k)
+
+    def _drop(self, slot: tuple) -> _Page:
+        page = self._pages.pop(slot)
+        self._bytes -= page.charged
+        page.charged = 0
+        return page
+
+    def _cancel(self, slot: tuple) -> None:
+        page = self._drop(slot)
+        page.cancelled = True
+        if page.status == 200:
+            READ_AHEAD_PAGES.inc("unused")
+
+    def _expire(self) -> None:
+        # Every page gets the same ttl and a re-prefetch re-inserts at the end, so the
+        # dict is in expiry order and expired pages are all at the front
+        now = time.monotonic()
+        while self._pages:
+            slot, page = next(iter(self._pages.items()))
+            if page.expires_at > now:
+                break
+            self._cancel(slot)
+
+    def discard(self, user_id: str, lst: Optional[Hashable] = None) -> int:
+        """Cancel and forget a user's buffered pages (all lists, or just `lst`); returns how many."""
+        with self._lock:
+            doomed = [k for k in self._pages if k[0] == user_id and (lst is None or k[1] == lst)]
+            for k in doomed:
+                self._cancel(k)
+            return len(doomed)
+
+
+def read_ahead() -> ReadAhead:
+    return app_singleton("read_ahead", ReadAhead.from_app)
+
+
+def has_next_page(data: dict, limit: int, offset: int) -> bool:
+    if not isinstance(data, dict):
+        return False
+    total = data.get("total")
+    return bool(data.get("next")) or (total is not None and offset + limit < int(total))
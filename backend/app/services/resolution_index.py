@@ -0,0 +1,93 @@
+import json, os, time
+from typing import Dict, Iterable, Tuple
+from ..utils.db import open_sqlite
+
+Key = Tuple[str, str]  # normalized (artist, track)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolutions (
+    artist     TEXT NOT NULL,
+    track      TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (artist, track)
+)
+"""
+
+
+class ResolutionIndex:
+    """
+    On-disk (SQLite) index of AI candidate -> Spotify entity resolutions, keyed on
+    normalized (artist, track). A payload is the resolve result without its "query";
+    an empty payload is a cached "no match". Positive and negative entries expire
+    after `ttl` and `negative_ttl` seconds respectively; expired rows are deleted when
+    the index is opened and after every `purge_every` writes.
+    """
+
+    def __init__(self, path: str, *, ttl: float = 30 * 86400, negative_ttl: float = 86400, purge_every: int = 100):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.purge_every = max(int(purge_every), 1)
+        self._writes = 0
+        self._db, self._lock = open_sqlite(path, _SCHEMA)
+        self.purge_expired()
+
+    @classmethod
+    def from_app(cls, app) -> "ResolutionIndex":
+        path = app.config.get("RESOLVE_INDEX_PATH") or os.path.join(app.instance_path, "resolution_index.sqlite3")
+        return cls(
+            path,
+            ttl=app.config.get("RESOLVE_INDEX_TTL", 30 * 86400),
+            negative_ttl=app.config.get("RESOLVE_INDEX_NEGATIVE_TTL", 86400),
+        )
+
+    def get_many(self, keys: Iterable[Key]) -> Dict[Key, dict]:
+        """Unexpired payloads for the keys that are present; unknown keys are left out."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            # One query per chunk keeps us under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 400):
+                chunk = keys[i:i + 400]
+                where = " OR ".join(["(artist = ? AND track = ?)"] * len(chunk))
+                args = [part for key in chunk for part in key]
+                rows = self._db.execute(
+                    f"SELECT artist, track, payload FROM resolutions WHERE expires_at > ? AND ({where})",
+                    [now, *args],
+                ).fetchall()
+                for artist, track, payload in rows:
+                    found[(artist, track)] = json.loads(payload)
+        return found
+
+    def put_many(self, entries: Dict[Key, dict]) -> None:
+        if not entries:
+            return
+        now = time.time()
+        rows = [
+            (artist, track, json.dumps(payload), now + (self.ttl if payload else self.negative_ttl))
+            for (artist, track), payload in entries.items()
+        ]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO resolutions (artist, track, payload, expires_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._db.execute("DELETE FROM resolutions WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
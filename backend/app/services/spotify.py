@@ -1,24 +1,53 @@
-import base64, time, requests
+import base64, json, time, requests
 from typing import Dict, Any, Optional
 from flask import current_app
-
-API_BASE = "https://api.spotify.com/v1"
-TOKEN_URL = "https://accounts.spotify.com/api/token"
+from .client import get_client
+from .rate_limit import BULK, INTERACTIVE, NORMAL, UpstreamScheduler
+from .token_refresh import TokenRefresher
+from ..utils.cache import StaleWhileRevalidate, TTLCache
+from ..utils.concurrency import iter_bounded, run_bounded
+from ..utils.extensions import app_singleton
+from ..utils.metrics import SPOTIFY_AUTH_RETRIES, SPOTIFY_RATE_LIMITED, SPOTIFY_TOKEN_REFRESHES
 
 def _basic_auth_header(client_id: str, client_secret: str):
     raw = f"{client_id}:{client_secret}".encode()
     b64 = base64.b64encode(raw).decode()
     return {"Authorization": f"Basic {b64}", "Content-Type": "application/x-www-form-urlencoded"}
 
+class SpotifyError(RuntimeError):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class RateLimited(SpotifyError):
+    """Spotify answered 429 (or the local scheduler could not get a slot in time)."""
+    def __init__(self, retry_after: float):
+        super().__init__(f"Spotify rate limit, retry after {retry_after:.0f}s", 429)
+        self.retry_after = retry_after
+
+    def payload(self) -> dict:
+        return {"error": {"status": 429, "message": "rate_limited", "retry_after": round(self.retry_after, 1)}}
+
+class UpstreamCancelled(Exception):
+    """The caller gave up on the request (see `cancelled=`) before it was sent."""
+
+def _retry_after(resp: requests.Response) -> float:
+    try:
+        return float(resp.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
 def _raise_for_spotify_error(resp: requests.Response) -> None:
+    if resp.status_code == 429:
+        raise RateLimited(_retry_after(resp))
     if not resp.ok:
         ct = resp.headers.get("content-type", "")
         snippet = resp.text[:400]
-        raise RuntimeError(f"Spotify {resp.status_code} {resp.reason} | CT={ct} | Body: {snippet}")
+        raise SpotifyError(f"Spotify {resp.status_code} {resp.reason} | CT={ct} | Body: {snippet}", resp.status_code)
 
 def exchange_code_for_token(*, code: str, redirect_uri: str, client_id: str, client_secret: str):
     data = {"grant_type": "authorization_code", "code": code, "redirect_uri": redirect_uri}
-    r = requests.post(TOKEN_URL, data=data, headers=_basic_auth_header(client_id, client_secret), timeout=15)
+    r = get_client().accounts("POST", "/api/token", data=data, headers=_basic_auth_header(client_id, client_secret))
     _raise_for_spotify_error(r)
     tok = r.json()
     tok["expires_at"] = int(time.time()) + int(tok.get("expires_in", 3600)) - 30
@@ -26,7 +55,8 @@ def exchange_code_for_token(*, code: str, redirect_uri: str, client_id: str, cli
 
 def refresh_access_token(*, refresh_token: str, client_id: str, client_secret: str):
     data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-    r = requests.post(TOKEN_URL, data=data, headers=_basic_auth_header(client_id, client_secret), timeout=15)
+    r = get_client().accounts("POST", "/api/token", data=data, headers=_basic_auth_header(client_id, client_secret))
+    SPOTIFY_TOKEN_REFRESHES.inc("ok" if r.ok else "error")
     _raise_for_spotify_error(r)
     tok = r.json()
     if "refresh_token" not in tok:
@@ -34,77 +64,159 @@ def refresh_access_token(*, refresh_token: str, client_id: str, client_secret: s
     tok["expires_at"] = int(time.time()) + int(tok.get("expires_in", 3600)) - 30
     return tok
 
+def token_refresher() -> TokenRefresher:
+    return app_singleton(
+        "token_refresher",
+        lambda app: TokenRefresher(
+            app, refresh_access_token, refresh_ahead=app.config.get("TOKEN_REFRESH_AHEAD", 120)
+        ),
+    )
+
 def _auth_headers(access_token: str):
     return {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
 
-
-def _get(session, path: str, params: Optional[Dict[str, Any]] = None):
+def upstream_scheduler() -> UpstreamScheduler:
+    return app_singleton("upstream_scheduler", UpstreamScheduler.from_app)
+
+def _send(method: str, path: str, *, headers, params=None, json=None, priority: int = NORMAL, cancelled=None) -> requests.Response:
+    """
+    One Web API call through the scheduler. A 429 backs off the whole client_id for
+    Retry-After and the call is retried (SPOTIFY_429_MAX_RETRIES); raises RateLimited
+    when no slot is available within SPOTIFY_RATE_MAX_WAIT, UpstreamCancelled when
+    `cancelled()` turns true while waiting for one.
+    """
+    scheduler = upstream_scheduler()
+    client_id = current_app.config.get("SPOTIFY_CLIENT_ID") or ""
+    retries = int(current_app.config.get("SPOTIFY_429_MAX_RETRIES", 2))
+    for _ in range(retries + 1):
+        if not scheduler.acquire(client_id, priority, cancelled=cancelled):
+            if cancelled is not None and cancelled():
+                SPOTIFY_RATE_LIMITED.inc("cancelled")
+                raise UpstreamCancelled(path)
+            SPOTIFY_RATE_LIMITED.inc("scheduler_timeout")
+            raise RateLimited(scheduler.blocked_for(client_id) or 1.0)
+        r = get_client().api(method, path, headers=headers, params=params, json=json)
+        if r.status_code != 429:
+            return r
+        SPOTIFY_RATE_LIMITED.inc("upstream_429")
+        scheduler.penalize(client_id, _retry_after(r))
+    return r
+
+
+def _get(session, path: str, params: Optional[Dict[str, Any]] = None, *, priority: int = NORMAL, cancelled=None):
     tok = session.get("token") or {}
     access = tok.get("access_token")
     if not access:
         raise PermissionError("no_access_token")
 
     def do_request(token: str):
-        return requests.get(
-            f"{API_BASE}{path}",
-            headers=_auth_headers(token),
-            params=params or {},
-            timeout=15
-        )
+        return _send("GET", path, headers=_auth_headers(token), params=params, priority=priority, cancelled=cancelled)
 
     # First try with existing access token
     r = do_request(access)
 
     # If expired, refresh and retry
     if r.status_code == 401:
-        rt = tok.get("refresh_token")
-        if not rt:
+        new_tok = token_refresher().refresh_after_401(session)
+        SPOTIFY_AUTH_RETRIES.inc("retried" if new_tok else "no_refresh_token")
+        if not new_tok:
             raise PermissionError("no_refresh_token")
-        new_tok = refresh_access_token(
-            refresh_token=rt,
-            client_id=current_app.config["SPOTIFY_CLIENT_ID"],
-            client_secret=current_app.config["SPOTIFY_CLIENT_SECRET"],
-        )
-        session["token"] = new_tok
         r = do_request(new_tok["access_token"])
 
     _raise_for_spotify_error(r)
+    if r.status_code == 204:  # e.g. /me/player with nothing playing
+        return 204, {}
     return r.status_code, r.json()
 
-def get_me(session): return _get(session, "/me")
-
-def get_my_top_tracks(session, *, limit=50, time_range="medium_term"):
-    limit = max(1, min(int(limit), 50))
-    return _get(session, "/me/top/tracks", params={"limit": limit, "time_range": time_range})
-def get_my_top_artists(session, *, limit=50, time_range="medium_term"):
+def _new_me_cache(app):
+    return StaleWhileRevalidate(
+        soft_ttl=app.config.get("ME_CACHE_SOFT_TTL", 3600),
+        ttl=app.config.get("ME_CACHE_TTL", 86400),
+        max_entries=app.config.get("ME_CACHE_MAX_ENTRIES", 10000),
+        max_bytes=app.config.get("ME_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+        sizeof=lambda data: len(json.dumps(data, separators=(",", ":"))),
+        logger=app.logger,
+    )
+
+def me_cache() -> StaleWhileRevalidate:
+    """Per-user profile and top items, keyed by (kind, user_id, ...)."""
+    return app_singleton("me_cache", _new_me_cache)
+
+def _me_cache_enabled() -> bool:
+    return current_app.config.get("ME_CACHE_ENABLED", True)
+
+def _revalidating_get(session, key: tuple, path: str, params=None):
+    """_get through me_cache: cached data comes back at once and is refreshed in the background once stale."""
+    app = current_app._get_current_object()
+    # The refresh may run after the request has ended, so hold the session itself, not the proxy
+    session = session._get_current_object() if hasattr(session, "_get_current_object") else session
+
+    def fetch():
+        with app.app_context():
+            return _get(session, path, params=params)
+
+    status, data, _ = me_cache().get(key, fetch)
+    return status, data
+
+def get_me(session, *, use_cache: bool = True):
+    """
+    The user's profile. Cached per user (ME_CACHE_*) once the session's user id has
+    been confirmed for its current grant; until then /me goes upstream, which also
+    confirms the id and seeds the cache.
+    """
+    if not use_cache or not _me_cache_enabled():
+        return _get(session, "/me")
+    from ..utils.tokens import remember_user_id, validated_user_id  # tokens imports this module
+    user_id = validated_user_id(session)
+    if not user_id:
+        status, data = _get(session, "/me")
+        if status == 200 and data.get("id"):
+            remember_user_id(session, data["id"])
+            me_cache().put(("me", data["id"]), status, data)
+        return status, data
+    return _revalidating_get(session, ("me", user_id), "/me")
+
+def _get_top(session, kind: str, limit, time_range: str, use_cache: bool):
     limit = max(1, min(int(limit), 50))
-    return _get(session, "/me/top/artists", params={"limit": limit, "time_range": time_range})
+    params = {"limit": limit, "time_range": time_range}
+    path = f"/me/top/{kind}"
+    if not use_cache or not _me_cache_enabled():
+        return _get(session, path, params=params)
+    from ..utils.tokens import current_user_id  # tokens imports this module
+    user_id = current_user_id(session)
+    if not user_id:  # identity unknown (e.g. /me failed): never share a cache slot
+        return _get(session, path, params=params)
+    return _revalidating_get(session, ("top", user_id, kind, limit, time_range), path, params)
+
+def get_my_top_tracks(session, *, limit=50, time_range="medium_term", use_cache: bool = True):
+    return _get_top(session, "tracks", limit, time_range, use_cache)
+def get_my_top_artists(session, *, limit=50, time_range="medium_term", use_cache: bool = True):
+    return _get_top(session, "artists", limit, time_range, use_cache)
 def get_recently_played(session, *, limit=50):
     limit = max(1, min(int(limit), 50))
     return _get(session, "/me/player/recently-played", params={"limit": limit})
 
-def _request(session, method: str, path: str, *, params=None, json=None, expect_json=True):
+def _request(session, method: str, path: str, *, params=None, json=None, expect_json=True, priority: int = NORMAL):
     tok = session.get("token") or {}
     access = tok.get("access_token")
     if not access:
         return 401, {"error": "no_access_token"}
 
-    url = f"{API_BASE}{path}"
     headers = _auth_headers(access)
 
-    r = requests.request(method, url, headers=headers, params=params or {}, json=json, timeout=15)
-    if r.status_code == 401:
-        rt = tok.get("refresh_token")
-        if not rt:
-            return 401, {"error": "no_refresh_token"}
-        new_tok = refresh_access_token(
-            refresh_token=rt,
-            client_id=current_app.config["SPOTIFY_CLIENT_ID"],
-            client_secret=current_app.config["SPOTIFY_CLIENT_SECRET"],
-        )
-        session["token"] = new_tok
-        headers = _auth_headers(new_tok["access_token"])
-        r = requests.request(method, url, headers=headers, params=params or {}, json=json, timeout=15)
+    try:
+        r = _send(method, path, headers=headers, params=params, json=json, priority=priority)
+        if r.status_code == 401:
+            new_tok = token_refresher().refresh_after_401(session)
+            SPOTIFY_AUTH_RETRIES.inc("retried" if new_tok else "no_refresh_token")
+            if not new_tok:
+                return 401, {"error": "no_refresh_token"}
+            headers = _auth_headers(new_tok["access_token"])
+            r = _send(method, path, headers=headers, params=params, json=json, priority=priority)
+    except RateLimited as e:
+        return 429, e.payload()
+    if r.status_code == 429:
+        return 429, RateLimited(_retry_after(r)).payload()
 
     if r.status_code == 204 and not expect_json:
         return 204, {"ok": True}
@@ -124,18 +236,21 @@ def _request(session, method: str, path: str, *, params=None, json=None, expect_
         payload = {"error": {"message": r.text[:200]}}
     return r.status_code, payload
 
-def _put(session, path: str, *, params=None, json=None, expect_json=False):
-    return _request(session, "PUT", path, params=params, json=json, expect_json=expect_json)
+def _put(session, path: str, *, params=None, json=None, expect_json=False, priority: int = NORMAL):
+    return _request(session, "PUT", path, params=params, json=json, expect_json=expect_json, priority=priority)
 
-def _post(session, path: str, *, params=None, json=None, expect_json=False):
-    return _request(session, "POST", path, params=params, json=json, expect_json=expect_json)
+def _post(session, path: str, *, params=None, json=None, expect_json=False, priority: int = NORMAL):
+    return _request(session, "POST", path, params=params, json=json, expect_json=expect_json, priority=priority)
+
+def _delete(session, path: str, *, params=None, json=None, expect_json=False, priority: int = NORMAL):
+    return _request(session, "DELETE", path, params=params, json=json, expect_json=expect_json, priority=priority)
 
 def get_devices(session):
-    return _request(session, "GET", "/me/player/devices", expect_json=True)
+    return _request(session, "GET", "/me/player/devices", expect_json=True, priority=INTERACTIVE)
 
 def transfer_playback(session, device_id: str, force_play: bool = False):
     body = {"device_ids": [device_id], "play": bool(force_play)}
-    return _put(session, "/me/player", json=body, expect_json=False)
+    return _put(session, "/me/player", json=body, expect_json=False, priority=INTERACTIVE)
 
 def play(session, *, uris=None, context_uri=None, position_ms=None, offset=None, device_id=None):
     payload = {}
@@ -144,45 +259,154 @@ def play(session, *, uris=None, context_uri=None, position_ms=None, offset=None,
     if offset is not None: payload["offset"] = offset 
     if position_ms is not None: payload["position_ms"] = position_ms
     params = {"device_id": device_id} if device_id else None
-    return _put(session, "/me/player/play", params=params, json=(payload or None), expect_json=False)
+    return _put(session, "/me/player/play", params=params, json=(payload or None), expect_json=False, priority=INTERACTIVE)
 
 def pause(session, *, device_id=None):
     params = {"device_id": device_id} if device_id else None
-    return _put(session, "/me/player/pause", params=params, expect_json=False)
+    return _put(session, "/me/player/pause", params=params, expect_json=False, priority=INTERACTIVE)
 
 def next_track(session, *, device_id=None):
     params = {"device_id": device_id} if device_id else None
-    return _post(session, "/me/player/next", params=params, expect_json=False)
+    return _post(session, "/me/player/next", params=params, expect_json=False, priority=INTERACTIVE)
 
 def previous_track(session, *, device_id=None):
     params = {"device_id": device_id} if device_id else None
-    return _post(session, "/me/player/previous", params=params, expect_json=False)
+    return _post(session, "/me/player/previous", params=params, expect_json=False, priority=INTERACTIVE)
 
 def get_current_playback(session):
-    url = f"{API_BASE}/me/player"
-    headers = _auth_headers(session["token"]["access_token"])
-    r = requests.get(url, headers=headers)
-    if r.status_code == 204: 
-        return 204, {}
-
-    _raise_for_spotify_error(r)
-    return r.status_code, r.json()
-
-def search(session, q: str, types: str, limit: int = 20, offset: int = 0):
+    return _get(session, "/me/player")
+
+def _new_search_cache(app):
+    return TTLCache(
+        ttl=app.config.get("SEARCH_CACHE_TTL", 300),
+        max_entries=app.config.get("SEARCH_CACHE_MAX_ENTRIES", 2048),
+        max_bytes=app.config.get("SEARCH_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    )
+
+def search_cache() -> TTLCache:
+    return app_singleton("search_cache", _new_search_cache)
+
+def _search_key(q: str, types: str, limit: int, offset: int, market: Optional[str]):
+    q_norm = " ".join(q.split()).casefold()
+    types_norm = ",".join(sorted({t.strip().lower() for t in types.split(",") if t.strip()}))
+    return (q_norm, types_norm, int(limit), int(offset), (market or "").upper())
+
+def search(session, q: str, types: str, limit: int = 20, offset: int = 0, market: Optional[str] = None, *, use_cache: bool = True, cancelled=None):
+    """
+    Catalog search. Results only depend on the query and market, so 200 responses are
+    shared across users through a TTL/LRU cache (SEARCH_CACHE_*). `market="from_token"`
+    is user-specific and always goes upstream, as does use_cache=False.
+    `cancelled` is passed to the scheduler (see _send).
+    """
     params = {"q": q, "type": types, "limit": limit, "offset": offset}
-    return _get(session, "/search", params=params)
-
-def get_my_playlists(session, limit: int = 20, offset: int = 0):
+    if market:
+        params["market"] = market
+    if not use_cache or not current_app.config.get("SEARCH_CACHE_ENABLED", True) or market == "from_token":
+        return _get(session, "/search", params=params, cancelled=cancelled)
+
+    cache = search_cache()
+    key = _search_key(q, types, limit, offset, market)
+    data = cache.get(key)
+    if data is not None:
+        return 200, data
+    status, data = _get(session, "/search", params=params, cancelled=cancelled)
+    if status == 200:
+        cache.set(key, data, size=len(json.dumps(data, separators=(",", ":"))))
+    return status, data
+
+def get_my_playlists(session, limit: int = 20, offset: int = 0, *, priority: int = NORMAL, cancelled=None):
     params = {"limit": limit, "offset": offset}
-    return _get(session, "/me/playlists", params=params)
-
-def get_playlist(session, playlist_id: str):
-    return _get(session, f"/playlists/{playlist_id}")
-
-def get_playlist_tracks(session, playlist_id: str, limit: int = 100, offset: int = 0):
+    return _get(session, "/me/playlists", params=params, priority=priority, cancelled=cancelled)
+
+def _new_playlist_cache(app):
+    return TTLCache(
+        ttl=app.config.get("PLAYLIST_CACHE_TTL", 3600),
+        max_entries=app.config.get("PLAYLIST_CACHE_MAX_ENTRIES", 2000),
+        max_bytes=app.config.get("PLAYLIST_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    )
+
+def playlist_cache() -> TTLCache:
+    """Playlist metadata and track pages keyed by (playlist_id, snapshot_id, ...)."""
+    return app_singleton("playlist_cache", _new_playlist_cache)
+
+def _playlist_cache_enabled() -> bool:
+    return current_app.config.get("PLAYLIST_CACHE_ENABLED", True)
+
+def get_playlist_snapshot(session, playlist_id: str, *, priority: int = NORMAL, cancelled=None) -> Optional[str]:
+    """Cheap metadata call: just the playlist's current snapshot_id."""
+    _, data = _get(session, f"/playlists/{playlist_id}", params={"fields": "snapshot_id"}, priority=priority, cancelled=cancelled)
+    return data.get("snapshot_id")
+
+def invalidate_playlist(playlist_id: str) -> None:
+    playlist_cache().discard_if(lambda k: k[0] == playlist_id)
+
+def _cached_playlist_get(session, playlist_id: str, snapshot_id: Optional[str], key: tuple, path: str, params=None,
+                         *, priority: int = NORMAL, cancelled=None):
+    # The snapshot check runs with the caller's token, so a shared entry is only
+    # served to users who can currently read the playlist.
+    if snapshot_id is None:
+        snapshot_id = get_playlist_snapshot(session, playlist_id, priority=priority, cancelled=cancelled)
+    if not snapshot_id:
+        return _get(session, path, params=params, priority=priority, cancelled=cancelled)
+    cache = playlist_cache()
+    cache_key = (playlist_id, snapshot_id, *key)
+    data = cache.get(cache_key)
+    if data is not None:
+        return 200, data
+    status, data = _get(session, path, params=params, priority=priority, cancelled=cancelled)
+    if status == 200 and data.get("snapshot_id", snapshot_id) == snapshot_id:
+        cache.set(cache_key, data, size=len(json.dumps(data, separators=(",", ":"))))
+    return status, data
+
+def get_playlist(session, playlist_id: str, *, use_cache: bool = True):
+    if not use_cache or not _playlist_cache_enabled():
+        return _get(session, f"/playlists/{playlist_id}")
+    return _cached_playlist_get(session, playlist_id, None, ("meta",), f"/playlists/{playlist_id}")
+
+def get_playlist_tracks(session, playlist_id: str, limit: int = 100, offset: int = 0, *, snapshot_id: Optional[str] = None,
+                        use_cache: bool = True, priority: int = NORMAL, cancelled=None):
+    """
+    One page of playlist items. Pages are cached per snapshot_id: the current snapshot
+    is checked first (or taken from `snapshot_id` when the caller already knows it)
+    and matching pages are served locally.
+    """
     params = {"limit": limit, "offset": offset}
-    return _get(session, f"/playlists/{playlist_id}/tracks", params=params)  
+    path = f"/playlists/{playlist_id}/tracks"
+    if not use_cache or not _playlist_cache_enabled():
+        return _get(session, path, params=params, priority=priority, cancelled=cancelled)
+    return _cached_playlist_get(session, playlist_id, snapshot_id, ("tracks", int(limit), int(offset)), path, params,
+                                priority=priority, cancelled=cancelled)
+
+def iter_playlist_pages(session, playlist_id: str, *, page_size: int = 100, max_workers: int = 4):
+    """
+    Every page of a playlist, in order. The first page gives `total`; the rest are
+    fetched concurrently with at most `max_workers` pages in flight (and in memory).
+    Yields (status, page); stops after the first non-200 page.
+    """
+    def page(offset: int, snapshot_id: Optional[str]):
+        try:
+            return get_playlist_tracks(session, playlist_id, limit=page_size, offset=offset, snapshot_id=snapshot_id)
+        except SpotifyError as e:
+            return e.status_code, {"error": {"status": e.status_code, "message": str(e)}}
 
+    try:
+        snapshot_id = get_playlist_snapshot(session, playlist_id) if _playlist_cache_enabled() else None
+    except SpotifyError as e:
+        yield e.status_code, {"error": {"status": e.status_code, "message": str(e)}}
+        return
+    status, first = page(0, snapshot_id)
+    yield status, first
+    if status != 200:
+        return
+    offsets = range(page_size, int(first.get("total") or 0), page_size)
+    pages = iter_bounded(lambda off: page(off, snapshot_id), offsets, max_workers)
+    try:
+        for status, data in pages:
+            yield status, data
+            if status != 200:
+                return
+    finally:
+        pages.close()
 
 def create_playlist(session, name: str, description: str = "", public: bool = False):
     status, me = _get(session, "/me")
@@ -190,90 +414,129 @@ def create_playlist(session, name: str, description: str = "", public: bool = Fa
     payload = {"name": name, "description": description, "public": public}
     return _post(session, f"/users/{user_id}/playlists", json=payload)
 
+def _chunks(items: list, size: int) -> list:
+    return [(i, items[i:i+size]) for i in range(0, len(items), size)]
+
+def _chunk_report(chunks: list, results: list) -> tuple:
+    """
+    Fold per-chunk (status, data) results into one response: 200 when every chunk
+    succeeded, 207 when some did, otherwise the first failing chunk's status.
+    Chunks that were never sent (results shorter than chunks) are reported as skipped.
+    """
+    report, done, failed = [], 0, 0
+    for n, (offset, chunk) in enumerate(chunks):
+        entry = {"index": n, "offset": offset, "count": len(chunk)}
+        if n >= len(results):
+            entry["status"] = None
+            entry["skipped"] = True
+            failed += len(chunk)
+        else:
+            status, data = results[n]
+            entry["status"] = status
+            if 200 <= status < 300:
+                done += len(chunk)
+            else:
+                entry["error"] = data.get("error", data) if isinstance(data, dict) else data
+                failed += len(chunk)
+        report.append(entry)
+    if not failed:
+        status = 200
+    elif done:
+        status = 207
+    else:
+        status = next((e["status"] for e in report if e["status"]), 502)
+    return status, {"ok": not failed, "succeeded": done, "failed": failed, "chunks": report}
+
+def _send_chunks(session, method: str, path: str, chunks: list, *, body_key: Optional[str] = None) -> list:
+    """
+    Send order-independent chunks concurrently (BULK_MAX_WORKERS at a time). Each chunk goes
+    as ?ids= or, with body_key, as a JSON body; failures stay with their chunk.
+    """
+    sess = session._get_current_object() if hasattr(session, "_get_current_object") else session
+
+    def send(chunk):
+        if body_key:
+            return _request(sess, method, path, json={body_key: chunk}, expect_json=False, priority=BULK)
+        return _request(sess, method, path, params={"ids": ",".join(chunk)}, expect_json=False, priority=BULK)
+
+    return run_bounded(send, [chunk for _, chunk in chunks], current_app.config.get("BULK_MAX_WORKERS", 4))
+
 def add_tracks_to_playlist(session, playlist_id: str, uris: list[str], position: Optional[int] = None):
+    """
+    Chunks go in one at a time so the playlist keeps the order of `uris`; with a
+    position each chunk is inserted after the previous one. Stops at the first
+    failed chunk (later ones are reported as skipped).
+    """
+    if not uris:
+        return 400, {"error": "no uris"}
+    chunks = _chunks(uris, 100)
     results = []
-    params = {}
-    if position is not None:
-        params["position"] = position
-    for i in range(0, len(uris), 100):
-        chunk = uris[i:i+100]
-        status, data = _post(session, f"/playlists/{playlist_id}/tracks", json={"uris": chunk}, params=params or None)
+    for offset, chunk in chunks:
+        params = {"position": position + offset} if position is not None else None
+        status, data = _post(session, f"/playlists/{playlist_id}/tracks", json={"uris": chunk}, params=params, priority=BULK)
         results.append((status, data))
-        params = {}
-    return results[-1] if results else (400, {"error": "no uris"})
+        if not 200 <= status < 300:
+            break
+    invalidate_playlist(playlist_id)
+    return _chunk_report(chunks, results)
 
 def remove_tracks_from_playlist(session, playlist_id: str, uris: list[str]):
-    results = []
-    tracks_body = [{"uri": u} for u in uris]
-    for i in range(0, len(tracks_body), 100):
-        chunk = tracks_body[i:i+100]
-        status, data = _delete(session, f"/playlists/{playlist_id}/tracks", json={"tracks": chunk})
-        results.append((status, data))
-    return results[-1] if results else (400, {"error": "no uris"})
+    if not uris:
+        return 400, {"error": "no uris"}
+    chunks = _chunks([{"uri": u} for u in uris], 100)
+    results = _send_chunks(session, "DELETE", f"/playlists/{playlist_id}/tracks", chunks, body_key="tracks")
+    invalidate_playlist(playlist_id)
+    return _chunk_report(chunks, results)
 
 def get_saved_tracks(session, limit: int = 20, offset: int = 0):
     params = {"limit": limit, "offset": offset}
     return _get(session, "/me/tracks", params=params)
 
+def _library_mutation(session, method: str, path: str, ids: list[str]):
+    if not ids:
+        return 400, {"error": "no ids"}
+    chunks = _chunks(ids, 50)
+    return _chunk_report(chunks, _send_chunks(session, method, path, chunks))
+
 def save_tracks(session, ids: list[str]):
-    results = []
-    for i in range(0, len(ids), 50):
-        chunk = ids[i:i+50]
-        status, data = _put(session, "/me/tracks", params={"ids": ",".join(chunk)})
-        results.append((status, data))
-    return results[-1] if results else (400, {"error": "no ids"})
+    return _library_mutation(session, "PUT", "/me/tracks", ids)
 
 def remove_saved_tracks(session, ids: list[str]):
-    results = []
-    for i in range(0, len(ids), 50):
-        chunk = ids[i:i+50]
-        status, data = _delete(session, "/me/tracks", params={"ids": ",".join(chunk)})
-        results.append((status, data))
-    return results[-1] if results else (400, {"error": "no ids"})
+    return _library_mutation(session, "DELETE", "/me/tracks", ids)
 
 def get_saved_albums(session, limit: int = 20, offset: int = 0):
     params = {"limit": limit, "offset": offset}
     return _get(session, "/me/albums", params=params)
 
 def save_albums(session, ids: list[str]):
-    results = []
-    for i in range(0, len(ids), 50):
-        chunk = ids[i:i+50]
-        status, data = _put(session, "/me/albums", params={"ids": ",".join(chunk)})
-        results.append((status, data))
-    return results[-1] if results else (400, {"error": "no ids"})
+    return _library_mutation(session, "PUT", "/me/albums", ids)
 
 def remove_saved_albums(session, ids: list[str]):
-    results = []
-    for i in range(0, len(ids), 50):
-        chunk = ids[i:i+50]
-        status, data = _delete(session, "/me/albums", params={"ids": ",".join(chunk)})
-        results.append((status, data))
-    return results[-1] if results else (400, {"error": "no ids"})
+    return _library_mutation(session, "DELETE", "/me/albums", ids)
 
 def add_to_queue(session, uri: str, device_id: Optional[str] = None):
     params = {"uri": uri}
     if device_id:
         params["device_id"] = device_id
-    return _post(session, "/me/player/queue", params=params)
+    return _post(session, "/me/player/queue", params=params, priority=INTERACTIVE)
 
 def seek(session, position_ms: int):
-    return _put(session, "/me/player/seek", params={"position_ms": position_ms})
+    return _put(session, "/me/player/seek", params={"position_ms": position_ms}, priority=INTERACTIVE)
 
 def set_shuffle(session, state: bool, device_id: Optional[str] = None):
     params = {"state": "true" if state else "false"}
     if device_id:
         params["device_id"] = device_id
-    return _put(session, "/me/player/shuffle", params=params)
+    return _put(session, "/me/player/shuffle", params=params, priority=INTERACTIVE)
 
 def set_repeat(session, state: str, device_id: Optional[str] = None):
     params = {"state": state}
     if device_id:
         params["device_id"] = device_id
-    return _put(session, "/me/player/repeat", params=params)
+    return _put(session, "/me/player/repeat", params=params, priority=INTERACTIVE)
 
 def set_volume(session, percent: int, device_id: Optional[str] = None):
     params = {"volume_percent": percent}
     if device_id:
         params["device_id"] = device_id
-    return _put(session, "/me/player/volume", params=params)
\ No newline at end of file
+    return _put(session, "/me/player/volume", params=params, priority=INTERACTIVE)
\ No newline at end of file
@@ -0,0 +1,416 @@
+"""
+asyncio counterpart of services/spotify.py: the same functions with the same
+arguments and (status, payload) results, as coroutines over a shared httpx
+connection pool. One process can keep hundreds of upstream calls in flight
+without holding a thread for each.
+
+httpx pools are bound to the event loop that created them, so there is one
+AsyncSpotifyClient per running loop. A long-lived loop (an ASGI server, a worker
+script) gets full keep-alive reuse; code that spins a loop per call still works
+but only pools within that loop.
+"""
+import asyncio, time, weakref
+from typing import Any, Dict, Optional
+import httpx
+from .client import API_BASE, ACCOUNTS_BASE
+from .spotify import (
+    RateLimited, SpotifyError, _basic_auth_header, _auth_headers, _chunk_report, _chunks, _retry_after,
+    _search_key, invalidate_playlist, search_cache, upstream_scheduler,
+)
+from ..utils.extensions import app_singleton
+from ..utils.metrics import (
+    SPOTIFY_AUTH_RETRIES, SPOTIFY_RATE_LIMITED, SPOTIFY_TOKEN_REFRESHES, endpoint_template, upstream_call,
+)
+from flask import current_app
+
+
+def _raise_for_spotify_error(resp: httpx.Response) -> None:
+    if resp.status_code == 429:
+        raise RateLimited(_retry_after(resp))
+    if not resp.is_success:
+        ct = resp.headers.get("content-type", "")
+        snippet = resp.text[:400]
+        raise SpotifyError(f"Spotify {resp.status_code} {resp.reason_phrase} | CT={ct} | Body: {snippet}", resp.status_code)
+
+
+class AsyncSpotifyClient:
+    """Async twin of SpotifyClient: separate keep-alive pools for the API and accounts hosts."""
+
+    def __init__(
+        self,
+        *,
+        api_base: str = API_BASE,
+        accounts_base: str = ACCOUNTS_BASE,
+        pool_maxsize: int = 32,
+        keepalive: bool = True,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 15,
+    ):
+        limits = httpx.Limits(
+            max_connections=pool_maxsize,
+            max_keepalive_connections=pool_maxsize if keepalive else 0,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._api = httpx.AsyncClient(base_url=api_base.rstrip("/"), limits=limits, timeout=timeout)
+        self._accounts = httpx.AsyncClient(base_url=accounts_base.rstrip("/"), limits=limits, timeout=timeout)
+        # httpcore rescans every queued request against every connection on each
+        # state change; queueing here instead keeps that cost bounded by the pool size
+        self._slots = asyncio.Semaphore(pool_maxsize)
+        self._refreshing: Dict[str, asyncio.Future] = {}
+
+    @classmethod
+    def from_config(cls, config) -> "AsyncSpotifyClient":
+        return cls(
+            api_base=config.get("SPOTIFY_API_BASE", API_BASE),
+            accounts_base=config.get("SPOTIFY_ACCOUNTS_BASE", ACCOUNTS_BASE),
+            pool_maxsize=int(config.get("SPOTIFY_ASYNC_POOL_MAXSIZE", 32)),
+            keepalive=bool(config.get("SPOTIFY_KEEPALIVE", True)),
+            keepalive_expiry=float(config.get("SPOTIFY_ASYNC_KEEPALIVE_EXPIRY", 30)),
+            timeout=float(config.get("SPOTIFY_HTTP_TIMEOUT", 15)),
+        )
+
+    async def api(self, method: str, path: str, *, headers=None, params=None, json=None) -> httpx.Response:
+        async with self._slots:
+            with upstream_call("spotify_api", method, endpoint_template(path)) as call:
+                r = await self._api.request(method, path, headers=headers, params=params or None, json=json)
+                call.status = r.status_code
+                return r
+
+    async def accounts(self, method: str, path: str, *, headers=None, data=None) -> httpx.Response:
+        async with self._slots:
+            with upstream_call("spotify_accounts", method, path) as call:
+                r = await self._accounts.request(method, path, headers=headers, data=data)
+                call.status = r.status_code
+                return r
+
+    async def refresh_once(self, refresh_token: str, do_refresh) -> dict:
+        """Single-flight per refresh token within this loop."""
+        fut = self._refreshing.get(refresh_token)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._refreshing[refresh_token] = fut
+        try:
+            tok = await do_refresh()
+            fut.set_result(tok)
+            return tok
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            self._refreshing.pop(refresh_token, None)
+            if fut.done() and not fut.cancelled():
+                fut.exception()  # mark retrieved when nobody else was waiting
+
+    async def aclose(self) -> None:
+        await self._api.aclose()
+        await self._accounts.aclose()
+
+
+def get_async_client() -> AsyncSpotifyClient:
+    clients = app_singleton("spotify_async_clients", lambda app: weakref.WeakKeyDictionary())
+    loop = asyncio.get_running_loop()
+    client = clients.get(loop)
+    if client is None:
+        client = clients[loop] = AsyncSpotifyClient.from_config(current_app.config)
+    return client
+
+async def close_async_client() -> None:
+    """Close the running loop's pools (ASGI lifespan shutdown)."""
+    client = app_singleton("spotify_async_clients", lambda app: weakref.WeakKeyDictionary()).pop(
+        asyncio.get_running_loop(), None
+    )
+    if client is not None:
+        await client.aclose()
+
+
+async def exchange_code_for_token(*, code: str, redirect_uri: str, client_id: str, client_secret: str):
+    data = {"grant_type": "authorization_code", "code": code, "redirect_uri": redirect_uri}
+    r = await get_async_client().accounts("POST", "/api/token", data=data, headers=_basic_auth_header(client_id, client_secret))
+    _raise_for_spotify_error(r)
+    tok = r.json()
+    tok["expires_at"] = int(time.time()) + int(tok.get("expires_in", 3600)) - 30
+    return tok
+
+async def refresh_access_token(*, refresh_token: str, client_id: str, client_secret: str):
+    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
+    r = await get_async_client().accounts("POST", "/api/token", data=data, headers=_basic_auth_header(client_id, client_secret))
+    SPOTIFY_TOKEN_REFRESHES.inc("ok" if r.is_success else "error")
+    _raise_for_spotify_error(r)
+    tok = r.json()
+    if "refresh_token" not in tok:
+        tok["refresh_token"] = refresh_token
+    tok["expires_at"] = int(time.time()) + int(tok.get("expires_in", 3600)) - 30
+    return tok
+
+async def _refresh_session(session) -> Optional[dict]:
+    tok = session.get("token") or {}
+    rt = tok.get("refresh_token")
+    if not rt:
+        return None
+    cfg = current_app.config
+    new_tok = await get_async_client().refresh_once(
+        rt,
+        lambda: refresh_access_token(
+            refresh_token=rt, client_id=cfg["SPOTIFY_CLIENT_ID"], client_secret=cfg["SPOTIFY_CLIENT_SECRET"]
+        ),
+    )
+    session["token"] = new_tok
+    return new_tok
+
+async def ensure_fresh(session) -> bool:
+    """Async equivalent of TokenRefresher.ensure_fresh (without the background pre-refresh)."""
+    tok = session.get("token")
+    if not tok or not tok.get("access_token"):
+        return False
+    if int(tok.get("expires_at", 0)) <= int(time.time()):
+        return await _refresh_session(session) is not None
+    return True
+
+
+async def _send(method: str, path: str, *, headers, params=None, json=None) -> httpx.Response:
+    """Same token bucket and Retry-After backoff as the sync layer, waited on with asyncio.sleep."""
+    scheduler = upstream_scheduler()
+    client_id = current_app.config.get("SPOTIFY_CLIENT_ID") or ""
+    retries = int(current_app.config.get("SPOTIFY_429_MAX_RETRIES", 2))
+    for _ in range(retries + 1):
+        wait = scheduler.reserve(client_id)
+        if wait is None:
+            SPOTIFY_RATE_LIMITED.inc("scheduler_timeout")
+            raise RateLimited(scheduler.blocked_for(client_id) or 1.0)
+        if wait:
+            await asyncio.sleep(wait)
+        r = await get_async_client().api(method, path, headers=headers, params=params, json=json)
+        if r.status_code != 429:
+            return r
+        SPOTIFY_RATE_LIMITED.inc("upstream_429")
+        scheduler.penalize(client_id, _retry_after(r))
+    return r
+
+
+async def _get(session, path: str, params: Optional[Dict[str, Any]] = None):
+    tok = session.get("token") or {}
+    access = tok.get("access_token")
+    if not access:
+        raise PermissionError("no_access_token")
+
+    r = await _send("GET", path, headers=_auth_headers(access), params=params)
+    if r.status_code == 401:
+        new_tok = await _refresh_session(session)
+        SPOTIFY_AUTH_RETRIES.inc("retried" if new_tok else "no_refresh_token")
+        if not new_tok:
+            raise PermissionError("no_refresh_token")
+        r = await _send("GET", path, headers=_auth_headers(new_tok["access_token"]), params=params)
+
+    _raise_for_spotify_error(r)
+    if r.status_code == 204:  # e.g. /me/player with nothing playing
+        return 204, {}
+    return r.status_code, r.json()
+
+async def _request(session, method: str, path: str, *, params=None, json=None, expect_json=True):
+    tok = session.get("token") or {}
+    access = tok.get("access_token")
+    if not access:
+        return 401, {"error": "no_access_token"}
+
+    try:
+        r = await _send(method, path, headers=_auth_headers(access), params=params, json=json)
+        if r.status_code == 401:
+            new_tok = await _refresh_session(session)
+            SPOTIFY_AUTH_RETRIES.inc("retried" if new_tok else "no_refresh_token")
+            if not new_tok:
+                return 401, {"error": "no_refresh_token"}
+            r = await _send(method, path, headers=_auth_headers(new_tok["access_token"]), params=params, json=json)
+    except RateLimited as e:
+        return 429, e.payload()
+    if r.status_code == 429:
+        return 429, RateLimited(_retry_after(r)).payload()
+
+    if r.status_code == 204 and not expect_json:
+        return 204, {"ok": True}
+
+    if 200 <= r.status_code < 300:
+        if expect_json:
+            try:
+                return r.status_code, r.json()
+            except ValueError:
+                return r.status_code, {"ok": True}
+        return r.status_code, {"ok": True}
+
+    try:
+        payload = r.json()
+    except ValueError:
+        payload = {"error": {"message": r.text[:200]}}
+    return r.status_code, payload
+
+async def _put(session, path: str, *, params=None, json=None, expect_json=False):
+    return await _request(session, "PUT", path, params=params, json=json, expect_json=expect_json)
+
+async def _post(session, path: str, *, params=None, json=None, expect_json=False):
+    return await _request(session, "POST", path, params=params, json=json, expect_json=expect_json)
+
+async def _delete(session, path: str, *, params=None, json=None, expect_json=False):
+    return await _request(session, "DELETE", path, params=params, json=json, expect_json=expect_json)
+
+
+async def get_me(session):
+    return await _get(session, "/me")
+
+async def get_my_top_tracks(session, *, limit=50, time_range="medium_term"):
+    limit = max(1, min(int(limit), 50))
+    return await _get(session, "/me/top/tracks", params={"limit": limit, "time_range": time_range})
+
+async def get_my_top_artists(session, *, limit=50, time_range="medium_term"):
+    limit = max(1, min(int(limit), 50))
+    return await _get(session, "/me/top/artists", params={"limit": limit, "time_range": time_range})
+
+async def get_recently_played(session, *, limit=50):
+    limit = max(1, min(int(limit), 50))
+    return await _get(session, "/me/player/recently-played", params={"limit": limit})
+
+async def get_devices(session):
+    return await _request(session, "GET", "/me/player/devices", expect_json=True)
+
+async def transfer_playback(session, device_id: str, force_play: bool = False):
+    body = {"device_ids": [device_id], "play": bool(force_play)}
+    return await _put(session, "/me/player", json=body, expect_json=False)
+
+async def play(session, *, uris=None, context_uri=None, position_ms=None, offset=None, device_id=None):
+    payload = {}
+    if uris: payload["uris"] = uris
+    if context_uri: payload["context_uri"] = context_uri
+    if offset is not None: payload["offset"] = offset
+    if position_ms is not None: payload["position_ms"] = position_ms
+    params = {"device_id": device_id} if device_id else None
+    return await _put(session, "/me/player/play", params=params, json=(payload or None), expect_json=False)
+
+async def pause(session, *, device_id=None):
+    params = {"device_id": device_id} if device_id else None
+    return await _put(session, "/me/player/pause", params=params, expect_json=False)
+
+async def next_track(session, *, device_id=None):
+    params = {"device_id": device_id} if device_id else None
+    return await _post(session, "/me/player/next", params=params, expect_json=False)
+
+async def previous_track(session, *, device_id=None):
+    params = {"device_id": device_id} if device_id else None
+    return await _post(session, "/me/player/previous", params=params, expect_json=False)
+
+async def get_current_playback(session):
+    return await _get(session, "/me/player")
+
+async def search(session, q: str, types: str, limit: int = 20, offset: int = 0, market: Optional[str] = None, *, use_cache: bool = True):
+    """Shares the process-wide search cache with the sync implementation."""
+    params = {"q": q, "type": types, "limit": limit, "offset": offset}
+    if market:
+        params["market"] = market
+    if not use_cache or not current_app.config.get("SEARCH_CACHE_ENABLED", True) or market == "from_token":
+        return await _get(session, "/search", params=params)
+
+    cache = search_cache()
+    key = _search_key(q, types, limit, offset, market)
+    data = cache.get(key)
+    if data is not None:
+        return 200, data
+    status, data = await _get(session, "/search", params=params)
+    if status == 200:
+        cache.set(key, data, size=len(current_app.json.dumps(data)))
+    return status, data
+
+async def get_my_playlists(session, limit: int = 20, offset: int = 0):
+    return await _get(session, "/me/playlists", params={"limit": limit, "offset": offset})
+
+async def get_playlist(session, playlist_id: str):
+    return await _get(session, f"/playlists/{playlist_id}")
+
+async def get_playlist_tracks(session, playlist_id: str, limit: int = 100, offset: int = 0):
+    return await _get(session, f"/playlists/{playlist_id}/tracks", params={"limit": limit, "offset": offset})
+
+async def create_playlist(session, name: str, description: str = "", public: bool = False):
+    status, me = await _get(session, "/me")
+    payload = {"name": name, "description": description, "public": public}
+    return await _post(session, f"/users/{me.get('id')}/playlists", json=payload)
+
+async def add_tracks_to_playlist(session, playlist_id: str, uris: list[str], position: Optional[int] = None):
+    # Chunks go in one after another so the playlist keeps the given order
+    if not uris:
+        return 400, {"error": "no uris"}
+    chunks = _chunks(uris, 100)
+    results = []
+    for offset, chunk in chunks:
+        params = {"position": position + offset} if position is not None else None
+        status, data = await _post(session, f"/playlists/{playlist_id}/tracks", json={"uris": chunk}, params=params)
+        results.append((status, data))
+        if not 200 <= status < 300:
+            break
+    invalidate_playlist(playlist_id)
+    return _chunk_report(chunks, results)
+
+async def _send_chunks(session, method: str, path: str, chunks: list, *, body_key: Optional[str] = None) -> list:
+    """Order-independent chunks, all in flight at once (the pool and scheduler bound them)."""
+    calls = []
+    for _, chunk in chunks:
+        if body_key:
+            calls.append(_request(session, method, path, json={body_key: chunk}, expect_json=False))
+        else:
+            calls.append(_request(session, method, path, params={"ids": ",".join(chunk)}, expect_json=False))
+    return list(await asyncio.gather(*calls))
+
+async def remove_tracks_from_playlist(session, playlist_id: str, uris: list[str]):
+    if not uris:
+        return 400, {"error": "no uris"}
+    chunks = _chunks([{"uri": u} for u in uris], 100)
+    results = await _send_chunks(session, "DELETE", f"/playlists/{playlist_id}/tracks", chunks, body_key="tracks")
+    invalidate_playlist(playlist_id)
+    return _chunk_report(chunks, results)
+
+async def get_saved_tracks(session, limit: int = 20, offset: int = 0):
+    return await _get(session, "/me/tracks", params={"limit": limit, "offset": offset})
+
+async def _library_mutation(session, method: str, path: str, ids: list[str]):
+    if not ids:
+        return 400, {"error": "no ids"}
+    chunks = _chunks(ids, 50)
+    return _chunk_report(chunks, await _send_chunks(session, method, path, chunks))
+
+async def save_tracks(session, ids: list[str]):
+    return await _library_mutation(session, "PUT", "/me/tracks", ids)
+
+async def remove_saved_tracks(session, ids: list[str]):
+    return await _library_mutation(session, "DELETE", "/me/tracks", ids)
+
+async def get_saved_albums(session, limit: int = 20, offset: int = 0):
+    return await _get(session, "/me/albums", params={"limit": limit, "offset": offset})
+
+async def save_albums(session, ids: list[str]):
+    return await _library_mutation(session, "PUT", "/me/albums", ids)
+
+async def remove_saved_albums(session, ids: list[str]):
+    return await _library_mutation(session, "DELETE", "/me/albums", ids)
+
+async def add_to_queue(session, uri: str, device_id: Optional[str] = None):
+    params = {"uri": uri}
+    if device_id:
+        params["device_id"] = device_id
+    return await _post(session, "/me/player/queue", params=params)
+
+async def seek(session, position_ms: int):
+    return await _put(session, "/me/player/seek", params={"position_ms": position_ms})
+
+async def set_shuffle(session, state: bool, device_id: Optional[str] = None):
+    params = {"state": "true" if state else "false"}
+    if device_id:
+        params["device_id"] = device_id
+    return await _put(session, "/me/player/shuffle", params=params)
+
+async def set_repeat(session, state: str, device_id: Optional[str] = None):
+    params = {"state": state}
+    if device_id:
+        params["device_id"] = device_id
+    return await _put(session, "/me/player/repeat", params=params)
+
+async def set_volume(session, percent: int, device_id: Optional[str] = None):
+    params = {"volume_percent": percent}
+    if device_id:
+        params["device_id"] = device_id
+    return await _put(session, "/me/player/volume", params=params)
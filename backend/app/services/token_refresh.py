@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from ..utils.cache import TTLCache
+from ..utils.concurrency import SingleFlight
+
+
+class TokenRefresher:
+    """
+    The one place that refreshes Spotify access tokens.
+
+    - Concurrent refreshes of the same refresh token are collapsed: one call to the
+      accounts endpoint serves every waiter.
+    - Each result is remembered under the refresh token it replaced until the new access
+      token expires. Requests still carrying the old cookie pick it up without going upstream.
+    - Once a token is within `refresh_ahead` seconds of `expires_at`, a background refresh
+      is started. The next request then swaps tokens without waiting on the accounts endpoint.
+    """
+
+    def __init__(self, app, refresh_fn: Callable[..., dict], *, refresh_ahead: float = 120, max_entries: int = 10000):
+        self._app = app
+        self._refresh_fn = refresh_fn
+        self.refresh_ahead = refresh_ahead
+        self._flight = SingleFlight()
+        self._recent = TTLCache(ttl=3600, max_entries=max_entries)  # old refresh_token -> new token
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="token-refresh")
+
+    def _do_refresh(self, refresh_token: str) -> dict:
+        tok = self._refresh_fn(
+            refresh_token=refresh_token,
+            client_id=self._app.config["SPOTIFY_CLIENT_ID"],
+            client_secret=self._app.config["SPOTIFY_CLIENT_SECRET"],
+        )
+        ttl = max(int(tok.get("expires_at", 0)) - time.time(), 0)
+        self._recent.set(refresh_token, tok, ttl=ttl)
+        return tok
+
+    def refresh(self, refresh_token: str, *, rejected_access: Optional[str] = None) -> dict:
+        """
+        A valid token for `refresh_token`. Reuses a recent refresh unless its access
+        token is `rejected_access`, i.e. the one Spotify just answered 401 for.
+        """
+        tok = self._recent.get(refresh_token)
+        if tok and tok["access_token"] != rejected_access:
+            return tok
+        return self._flight.do(refresh_token, lambda: self._do_refresh(refresh_token))
+
+    def schedule(self, refresh_token: str) -> None:
+        if self._recent.get(refresh_token) or self._flight.in_flight(refresh_token):
+            return
+
+        def run():
+            with self._app.app_context():
+                try:
+                    self.refresh(refresh_token)
+                except Exception:
+                    self._app.logger.warning("background token refresh failed", exc_info=True)
+
+        self._executor.submit(run)
+
+    def ensure_fresh(self, session) -> bool:
+        """Make sure session["token"] holds a usable access token. False if there is none."""
+        tok = session.get("token")
+        if not tok or not tok.get("access_token"):
+            return False
+        rt = tok.get("refresh_token")
+        newer = self._recent.get(rt) if rt else None
+        if newer and int(newer.get("expires_at", 0)) > int(tok.get("expires_at", 0)):
+            session["token"] = tok = newer
+
+        remaining = int(tok.get("expires_at", 0)) - time.time()
+        if remaining <= 0:
+            if not rt:
+                return False
+            session["token"] = self.refresh(rt)
+        elif remaining <= self.refresh_ahead and rt:
+            self.schedule(rt)
+        return True
+
+    def refresh_after_401(self, session) -> Optional[dict]:
+        """Replace a rejected access token in the session. None if there is no refresh token."""
+        tok = session.get("token") or {}
+        rt = tok.get("refresh_token")
+        if not rt:
+            return None
+        new_tok = self.refresh(rt, rejected_access=tok.get("access_token"))
+        session["token"] = new_tok
+        return new_tok
@@ -0,0 +1,120 @@
+import itertools, re, threading
+from typing import Callable, Optional
+from .spotify import UpstreamCancelled
+from ..utils.cache import TTLCache
+from ..utils.concurrency import SingleFlight
+
+_WORD = re.compile(r"\w+")
+
+# Search response bucket -> the parts of an item a query can match
+_TEXT = {
+    "tracks": lambda it: [it.get("name"), *(a.get("name") for a in it.get("artists") or []), (it.get("album") or {}).get("name")],
+    "albums": lambda it: [it.get("name"), *(a.get("name") for a in it.get("artists") or [])],
+    "artists": lambda it: [it.get("name")],
+    "playlists": lambda it: [it.get("name"), (it.get("owner") or {}).get("display_name")],
+}
+
+
+def _normalize(q: str) -> str:
+    return " ".join(q.split()).casefold()
+
+
+def _matches(item: dict, bucket: str, tokens: list) -> bool:
+    """Every query token is a prefix of some word in the item's name/artist/album/owner."""
+    words = [w for text in _TEXT[bucket](item) if text for w in _WORD.findall(text.casefold())]
+    return all(any(w.startswith(t) for w in words) for t in tokens)
+
+
+def _complete(data: dict) -> bool:
+    """True when every bucket holds its whole result set, so narrower queries can be answered from it."""
+    return all(
+        isinstance(page, dict) and len(page.get("items") or []) >= int(page.get("total") or 0)
+        for page in data.values()
+    )
+
+
+class _Result:
+    __slots__ = ("q", "data", "complete")
+
+    def __init__(self, q: str, data: dict, complete: bool):
+        self.q, self.data, self.complete = q, data, complete
+
+
+class TypeaheadEngine:
+    """
+    Keystroke searches for one user arrive as a chain of refinements ("radi" ->
+    "radio" -> "radiohead"). For each (user, types, market) the engine remembers the
+    last upstream result, fetched at the requested limit like a plain search:
+
+    - A query that extends the remembered one is answered by filtering that result
+      locally, provided it was complete (every bucket's total fit in the page). With
+      real catalogue searches that is rare for short prefixes; it pays off for narrow
+      queries and small catalogues, and costs nothing otherwise.
+    - Only the newest query of a user counts. An older one still queued in the
+      upstream scheduler is dropped there, and one that comes back after a newer query
+      arrived is reported superseded instead of rendered.
+    - Identical normalized queries in flight at the same time (double submits,
+      several users typing the same thing) share one upstream call.
+    """
+
+    def __init__(self, search_fn: Callable[..., tuple], *, ttl: float = 120, max_users: int = 10000):
+        self._search = search_fn
+        self._flight = SingleFlight()
+        self._last = TTLCache(ttl=ttl, max_entries=max_users)
+        self._latest = TTLCache(ttl=ttl, max_entries=max_users)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app, search_fn) -> "TypeaheadEngine":
+        return cls(search_fn, ttl=app.config.get("TYPEAHEAD_TTL", 120))
+
+    def _begin(self, user_key) -> int:
+        with self._lock:
+            gen = next(self._seq)
+            self._latest.set(user_key, gen)
+            return gen
+
+    def _superseded(self, user_key, gen: int) -> bool:
+        return self._latest.get(user_key, gen) != gen
+
+    def local(self, user_key, qn: str, limit: int) -> Optional[dict]:
+        prev = self._last.get(user_key)
+        if prev is None or not prev.complete or not qn.startswith(prev.q):
+            return None
+        tokens = qn.split()
+        out = {}
+        for bucket, page in prev.data.items():
+            if bucket not in _TEXT or not isinstance(page, dict):
+                continue
+            items = [it for it in page.get("items") or [] if it and _matches(it, bucket, tokens)]
+            out[bucket] = {"items": items[:limit], "total": len(items), "limit": limit, "offset": 0, "next": None, "previous": None}
+        return out
+
+    def query(self, session, user_id: str, q: str, types: str, limit: int, market: Optional[str] = None):
+        """(status, data, source) with source "local", "upstream" or "superseded"."""
+        qn = _normalize(q)
+        types_key = ",".join(sorted(t.strip().lower() for t in types.split(",") if t.strip()))
+        user_key = (user_id, types_key, (market or "").upper())
+        gen = self._begin(user_key)
+
+        data = self.local(user_key, qn, limit)
+        if data is not None:
+            return 200, data, "local"
+        flight_key = (qn, types_key, (market or "").upper(), limit)
+        cancelled = lambda: self._superseded(user_key, gen)
+        try:
+            status, data = self._flight.do(
+                flight_key,
+                lambda: self._search(session, q, types, limit=limit, offset=0, market=market, cancelled=cancelled),
+            )
+        except UpstreamCancelled:
+            if cancelled():
+                return 409, {"error": "superseded"}, "superseded"
+            # We were riding on another user's call that got dropped; go on our own
+            status, data = self._search(session, q, types, limit=limit, offset=0, market=market, cancelled=cancelled)
+        if status == 200:
+            self._last.set(user_key, _Result(qn, data, _complete(data)))
+        if cancelled():
+            return 409, {"error": "superseded"}, "superseded"
+        return status, data, "upstream"
@@ -0,0 +1,36 @@
+import time
+from typing import Dict
+from . import client, llm
+
+
+def warmup(app) -> Dict[str, float]:
+    """
+    Pay the one-off costs of a fresh worker before it takes traffic rather than on its
+    first requests: Spotify keep-alive connections, the OpenAI SDK import and client,
+    and the on-disk caches. Every step is best effort; returns milliseconds per step.
+    Run it in the worker (create_app with WARMUP_ENABLED, or a post-fork hook), not in
+    a preloading master, or the forked workers would share the same sockets.
+    """
+    timings = {}
+    with app.app_context():
+        t = time.perf_counter()
+        opened = client.get_client().preconnect(int(app.config.get("WARMUP_CONNECTIONS", 4)))
+        timings["spotify_pool"] = (time.perf_counter() - t) * 1000
+
+        if app.config.get("OPENAI_API_KEY"):
+            t = time.perf_counter()
+            llm.openai_client()
+            timings["openai_client"] = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        llm.prompt_cache()
+        if app.config.get("RESOLVE_INDEX_ENABLED", True):
+            from ..spotify_tools import resolution_index
+            resolution_index()
+        timings["stores"] = (time.perf_counter() - t) * 1000
+
+    app.logger.info(
+        "warmup: %d connections, %s",
+        opened, ", ".join(f"{k}={v:.0f}ms" for k, v in timings.items()),
+    )
+    return timings
@@ -1,13 +1,118 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app
 from .services.spotify import (
+    SpotifyError,
     search,
     add_tracks_to_playlist,
     play,
 )
+from .routes.spotify_api import library_mutated
+from .services.resolution_index import ResolutionIndex
+from .utils.concurrency import run_bounded
+from .utils.extensions import app_singleton
 from .utils.tokens import require_access_token
 
 bp = Blueprint("spotify_tools", __name__, url_prefix="/spotify-tools")
 
+def resolution_index() -> ResolutionIndex:
+    return app_singleton("resolution_index", ResolutionIndex.from_app)
+
+def candidate_key(artist: str, track: str):
+    """Normalized (artist, track) identity of an AI candidate: resolution index and dedup key."""
+    return (" ".join(artist.split()).casefold(), " ".join(track.split()).casefold())
+
+def _search_query(artist: str, track: str):
+    if artist and track:
+        return f'track:"{track}" artist:"{artist}"', "track"
+    if track:
+        return f'track:"{track}"', "track"
+    if artist:
+        return f'artist:"{artist}"', "artist"
+    return None
+
+def _resolve_one(sess, artist: str, track: str):
+    """Search Spotify for one candidate. Returns the resolved fields (without "query")."""
+    q, types = _search_query(artist, track)
+    try:
+        status, data = search(sess, q=q, types=types, limit=1, offset=0)
+    except SpotifyError as e:
+        status = e.status_code
+    except RuntimeError:
+        status = 502
+    if status != 200:
+        return {"error": f"spotify_search_failed:{status}"}
+
+    out = {}
+    if types == "track" and data.get("tracks", {}).get("items"):
+        t = data["tracks"]["items"][0]
+        out["type"] = "track"
+        out["track"] = {
+            "id": t["id"],
+            "uri": t["uri"],
+            "name": t["name"],
+            "artist_names": [a["name"] for a in t["artists"]],
+            "image": (t["album"]["images"][0]["url"] if t["album"]["images"] else None),
+        }
+    if types == "artist" and data.get("artists", {}).get("items"):
+        a = data["artists"]["items"][0]
+        out["type"] = "artist"
+        out["artist"] = {
+            "id": a["id"],
+            "uri": a["uri"],
+            "name": a["name"],
+            "image": (a["images"][0]["url"] if a.get("images") else None),
+        }
+    return out
+
+def resolve_cached(sess, artist: str, track: str):
+    """_resolve_one() behind the resolution index, for callers resolving one candidate at a time."""
+    index = resolution_index() if current_app.config.get("RESOLVE_INDEX_ENABLED", True) else None
+    key = candidate_key(artist, track)
+    if index:
+        hit = index.get_many([key]).get(key)
+        if hit is not None:
+            return hit
+    out = _resolve_one(sess, artist, track)
+    if index and "error" not in out:
+        index.put_many({key: out})
+    return out
+
+def resolve_candidates(sess, candidates):
+    """
+    Resolve a list of {"artist", "track"} candidates to Spotify entities, in order.
+    Candidates are deduplicated on normalized (artist, track) and looked up in the
+    persistent resolution index first; the rest are searched concurrently, at most
+    RESOLVE_MAX_WORKERS at a time.
+    """
+    queries = []
+    for c in candidates:
+        artist = (c.get("artist") or "").strip()
+        track  = (c.get("track") or "").strip()
+        if artist or track:
+            queries.append((artist, track))
+
+    unique = {}
+    for artist, track in queries:
+        unique.setdefault(candidate_key(artist, track), (artist, track))
+
+    index = resolution_index() if current_app.config.get("RESOLVE_INDEX_ENABLED", True) else None
+    by_key = index.get_many(unique) if index else {}
+
+    missing = [k for k in unique if k not in by_key]
+    found = run_bounded(
+        lambda k: _resolve_one(sess, *unique[k]),
+        missing,
+        current_app.config.get("RESOLVE_MAX_WORKERS", 8),
+    )
+    by_key.update(zip(missing, found))
+    if index:
+        # Errors are transient; matches and "no match" answers are worth remembering
+        index.put_many({k: out for k, out in zip(missing, found) if "error" not in out})
+
+    return [
+        {"query": {"artist": artist, "track": track}, **by_key[candidate_key(artist, track)]}
+        for artist, track in queries
+    ]
+
 @bp.post("/resolve")
 @require_access_token
 def resolve():
@@ -17,55 +122,11 @@ def resolve():
       "candidates": [ {"artist":"...", "track":"...?"}, ... ],
       "limit": 10
     }
-    Uses existing `search(session, ...)` from services/spotify.py.
+    Uses existing `search(session, ...)` from services/spotify.py via
+    resolve_candidates(). Results keep the order of `candidates`.
     """
     body = request.get_json(force=True) or {}
-    candidates = body.get("candidates") or []
-    resolved = []
-
-    for c in candidates:
-        artist = (c.get("artist") or "").strip()
-        track  = (c.get("track") or "").strip()
-
-        if artist and track:
-            q = f'track:"{track}" artist:"{artist}"'
-            types = "track"
-        elif track:
-            q = f'track:"{track}"'
-            types = "track"
-        elif artist:
-            q = f'artist:"{artist}"'
-            types = "artist"
-        else:
-            continue
-
-        status, data = search(session, q=q, types=types, limit=1, offset=0)
-        if status != 200:
-            resolved.append({"query": {"artist": artist, "track": track}, "error": f"spotify_search_failed:{status}"})
-            continue
-
-        out = {"query": {"artist": artist, "track": track}}
-        if types == "track" and data.get("tracks", {}).get("items"):
-            t = data["tracks"]["items"][0]
-            out["type"] = "track"
-            out["track"] = {
-                "id": t["id"],
-                "uri": t["uri"],
-                "name": t["name"],
-                "artist_names": [a["name"] for a in t["artists"]],
-                "image": (t["album"]["images"][0]["url"] if t["album"]["images"] else None),
-            }
-        if types == "artist" and data.get("artists", {}).get("items"):
-            a = data["artists"]["items"][0]
-            out["type"] = "artist"
-            out["artist"] = {
-                "id": a["id"],
-                "uri": a["uri"],
-                "name": a["name"],
-                "image": (a["images"][0]["url"] if a.get("images") else None),
-            }
-        resolved.append(out)
-
+    resolved = resolve_candidates(session._get_current_object(), body.get("candidates") or [])
     return jsonify({"resolved": resolved})
 
 
@@ -80,6 +141,7 @@ def add_to_playlist_route():
         return jsonify({"error": "playlist_id and track_uris are required"}), 400
 
     status, data = add_tracks_to_playlist(session, playlist_id, track_uris)
+    library_mutated(status, "playlists")
     return jsonify(data), status
 
 
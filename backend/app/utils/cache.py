@@ -0,0 +1,153 @@
+import logging, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with per-entry TTL and LRU eviction, bounded by
+    entry count and by an approximate byte budget (sizes are supplied by the caller
+    or computed with `sizeof`). Keeps hit/miss/eviction counters for stats().
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = 60.0,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: Hashable, value: Any, *, ttl: Optional[float] = None, size: Optional[int] = None) -> None:
+        if size is None:
+            size = self._sizeof(value) if self._sizeof else 1
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def discard_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches predicate; returns how many were removed."""
+        with self._lock:
+            doomed = [k for k in self._data if predicate(k)]
+            for k in doomed:
+                self._remove(k)
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+class StaleWhileRevalidate:
+    """
+    Cache for slow-changing upstream data on top of a TTLCache whose `ttl` is the hard
+    limit. An entry younger than `soft_ttl` is served as is; an older one is still
+    served immediately while one background refresh per key replaces it. Misses and
+    hard-expired entries are fetched inline. Only 200 results are kept, and a failed
+    refresh leaves the stale copy in place for the next read to try again (and is
+    logged to `logger`). fetch() -> (status, data) must be safe to run on another thread.
+    """
+
+    def __init__(self, *, soft_ttl: float, ttl: float, max_entries: int = 10000, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None, max_workers: int = 2,
+                 logger: Optional[logging.Logger] = None):
+        self.soft_ttl = soft_ttl
+        self._logger = logger or logging.getLogger(__name__)
+        self._cache = TTLCache(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes,
+                               sizeof=(lambda entry: sizeof(entry[1])) if sizeof else None)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(int(max_workers), 1), thread_name_prefix="revalidate")
+
+    def get(self, key: Hashable, fetch: Callable[[], Tuple[int, Any]]) -> Tuple[int, Any, str]:
+        """(status, data, state) with state "hit", "stale" (refresh started) or "miss"."""
+        entry = self._cache.get(key)
+        if entry is None:
+            status, data = fetch()
+            self.put(key, status, data)
+            return status, data, "miss"
+        fetched_at, data = entry
+        if time.monotonic() - fetched_at < self.soft_ttl:
+            return 200, data, "hit"
+        with self._lock:
+            start = key not in self._refreshing
+            self._refreshing.add(key)
+        if start:
+            self._pool.submit(self._refresh, key, fetch)
+        return 200, data, "stale"
+
+    def put(self, key: Hashable, status: int, data: Any) -> None:
+        if status == 200:
+            self._cache.set(key, (time.monotonic(), data))
+
+    def _refresh(self, key: Hashable, fetch) -> None:
+        try:
+            self.put(key, *fetch())
+        except Exception:
+            self._logger.warning("background refresh failed for %r, serving the stale copy", key, exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def discard_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        return self._cache.discard_if(predicate)
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "refreshing": len(self._refreshing)}
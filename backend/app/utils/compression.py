@@ -0,0 +1,78 @@
+import gzip
+from typing import Optional
+from flask import current_app, request
+
+try:  # optional: zstd is only offered when the binding is installed
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_COMPRESSIBLE = ("application/json", "text/")
+
+
+def _accepted(header: str) -> dict:
+    """Accept-Encoding -> {coding: q}."""
+    out = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        out[coding.strip().lower()] = q
+    return out
+
+
+def negotiate(header: str) -> Optional[str]:
+    """Pick zstd or gzip from an Accept-Encoding header, or None for identity."""
+    accepted = _accepted(header)
+    offers = (["zstd"] if zstandard is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in offers:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data: bytes, coding: str, *, gzip_level: int = 5, zstd_level: int = 3) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compress(data)
+    return gzip.compress(data, compresslevel=gzip_level)
+
+
+def compress_response(resp):
+    cfg = current_app.config
+    if not cfg.get("COMPRESS_ENABLED", True):
+        return resp
+    if resp.direct_passthrough or resp.is_streamed or "Content-Encoding" in resp.headers:
+        return resp
+    if resp.status_code < 200 or resp.status_code in (204, 206, 304):
+        return resp
+    if not (resp.mimetype or "").startswith(_COMPRESSIBLE):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if resp.content_length is not None and resp.content_length < cfg.get("COMPRESS_MIN_SIZE", 1024):
+        return resp
+    coding = negotiate(request.headers.get("Accept-Encoding", ""))
+    if coding is None:
+        return resp
+    data = resp.get_data()
+    if len(data) < cfg.get("COMPRESS_MIN_SIZE", 1024):
+        return resp
+    resp.set_data(compress(
+        data, coding,
+        gzip_level=cfg.get("COMPRESS_GZIP_LEVEL", 5),
+        zstd_level=cfg.get("COMPRESS_ZSTD_LEVEL", 3),
+    ))
+    resp.headers["Content-Encoding"] = coding
+    return resp
+
+
+def init_app(app) -> None:
+    app.after_request(compress_response)
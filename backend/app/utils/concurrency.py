@@ -0,0 +1,108 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, TypeVar
+from flask import current_app
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def run_bounded(fn: Callable[[T], R], items: Iterable[T], max_workers: int) -> List[R]:
+    """
+    Call fn(item) for every item on at most `max_workers` threads and return the
+    results in input order. Each worker runs inside the caller's app context so
+    service functions can still reach current_app; pass the real session object
+    (session._get_current_object()) rather than the request-local proxy.
+    Exceptions propagate from the first failing item, so fn should catch what it wants isolated.
+    """
+    items = list(items)
+    if not items:
+        return []
+    app = current_app._get_current_object()
+
+    def call(item):
+        with app.app_context():
+            return fn(item)
+
+    workers = max(1, min(int(max_workers), len(items)))
+    if workers == 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(call, items))
+
+
+def iter_bounded(fn: Callable[[T], R], items: Iterable[T], max_workers: int) -> Iterator[R]:
+    """
+    Lazy, streaming counterpart of run_bounded: yields fn(item) in input order while
+    keeping at most `max_workers` calls in flight, so memory stays bounded by the
+    window no matter how many items there are. Closing the generator cancels what
+    has not started yet.
+    """
+    app = current_app._get_current_object()
+
+    def call(item):
+        with app.app_context():
+            return fn(item)
+
+    it = iter(items)
+    workers = max(1, int(max_workers))
+    ex = ThreadPoolExecutor(max_workers=workers)
+    pending = deque(ex.submit(call, item) for item in islice(it, workers))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            for item in islice(it, 1):
+                pending.append(ex.submit(call, item))
+            yield result
+    finally:
+        for fut in pending:
+            fut.cancel()
+        ex.shutdown(wait=False)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key: the first caller runs fn(), everyone
+    who arrives while it is in flight waits and gets the same result (or exception).
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: Hashable, fn: Callable[[], R]) -> R:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
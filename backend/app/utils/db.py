@@ -0,0 +1,18 @@
+import os, sqlite3, threading
+from typing import Tuple
+
+
+def open_sqlite(path: str, schema: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """
+    Open (creating its directory) the SQLite file behind one of the on-disk stores,
+    in WAL mode so worker processes sharing it don't block each other's reads, with
+    `schema` applied. The connection is shared by the process's threads, so every
+    use must hold the returned lock.
+    """
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(schema)
+    db.commit()
+    return db, threading.Lock()
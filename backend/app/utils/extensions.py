@@ -0,0 +1,16 @@
+import threading
+from flask import current_app
+
+_lock = threading.Lock()
+
+
+def app_singleton(name: str, factory):
+    """Return current_app.extensions[name], building it once with factory(app) on first use."""
+    ext = current_app.extensions
+    obj = ext.get(name)
+    if obj is None:
+        with _lock:
+            obj = ext.get(name)
+            if obj is None:
+                obj = ext[name] = factory(current_app._get_current_object())
+    return obj
@@ -0,0 +1,43 @@
+import typing as t
+from flask.json.provider import DefaultJSONProvider
+
+try:  # optional fast path
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson when it is installed, stdlib json otherwise.
+    Output is compact UTF-8 and keys keep their insertion order (sort_keys=False), which
+    skips a sort of every dict in large Spotify payloads. Calls that ask for stdlib-only
+    options (indent, custom separators, ...) and debug-mode pretty printing go through
+    the stdlib implementation unchanged.
+    """
+
+    sort_keys = False
+
+    def _orjson_option(self) -> int:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj: t.Any, **kwargs: t.Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode()
+
+    def loads(self, s: t.Union[str, bytes], **kwargs: t.Any) -> t.Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: t.Any, **kwargs: t.Any):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,234 @@
+import bisect, hmac, re, threading, time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+from flask import Response, abort, current_app, g, request
+
+# Seconds; wide enough for an LLM completion at the top end
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """
+    A metric family with fixed label names. Values are keyed by the label values as a
+    positional tuple, so recording is a dict lookup and an add under one lock.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), *, registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _labels(self, values: tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_items(items))
+        return lines
+
+    def _render_items(self, items) -> List[str]:
+        return [f"{self.name}{self._labels(k)} {_fmt(v)}" for k, v in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), *, buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry=registry)
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def _render_items(self, items) -> List[str]:
+        lines = []
+        for labels, (counts, total) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                lines.append(f"{self.name}_bucket{self._labels(labels, (('le', _fmt(bound)),))} {running}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_fmt(round(total, 6))}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {running}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---- Outbound calls (Spotify Web API, Spotify accounts, OpenAI) ----
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Outbound HTTP call latency.", ("upstream", "method", "endpoint"))
+UPSTREAM_RESPONSES = Counter(
+    "upstream_responses_total", "Outbound HTTP calls by response status (\"exception\": no response).",
+    ("upstream", "method", "endpoint", "status"))
+UPSTREAM_IN_FLIGHT = Gauge("upstream_requests_in_flight", "Outbound HTTP calls currently waiting on a response.", ("upstream",))
+
+SPOTIFY_AUTH_RETRIES = Counter(
+    "spotify_auth_retries_total", "Web API calls answered 401 and retried after a token refresh.", ("result",))
+SPOTIFY_TOKEN_REFRESHES = Counter("spotify_token_refreshes_total", "Access token refreshes against the accounts service.", ("result",))
+SPOTIFY_RATE_LIMITED = Counter(
+    "spotify_rate_limited_total", "429s from Spotify and calls the local scheduler turned away.", ("reason",))
+
+OPENAI_LATENCY = Histogram("openai_completion_duration_seconds", "Chat completion time, to the last token when streaming.", ("model", "mode"))
+OPENAI_FIRST_TOKEN = Histogram("openai_first_token_seconds", "Time to the first streamed content delta.", ("model",))
+OPENAI_RESULTS = Counter("openai_completions_total", "Chat completions by outcome.", ("model", "mode", "outcome"))
+
+READ_AHEAD_PAGES = Counter(
+    "read_ahead_pages_total",
+    "Prefetched list pages: served/joined (answered a request), unused, cancelled before fetching, failed.",
+    ("outcome",))
+
+# ---- Inbound requests ----
+
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Flask request handling time, to the response object.", ("method", "route"))
+HTTP_RESPONSES = Counter("http_responses_total", "Responses by route and status.", ("method", "route", "status"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+
+
+class upstream_call:
+    """
+    with upstream_call("spotify_api", "GET", endpoint) as call:
+        resp = ...; call.status = resp.status_code
+    Records latency, the status (or "exception") and the in-flight gauge.
+    """
+
+    __slots__ = ("upstream", "method", "endpoint", "status", "_t0")
+
+    def __init__(self, upstream: str, method: str, endpoint: str):
+        self.upstream, self.method, self.endpoint = upstream, method, endpoint
+        self.status = "exception"
+
+    def __enter__(self):
+        UPSTREAM_IN_FLIGHT.inc(self.upstream)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        UPSTREAM_LATENCY.observe(time.perf_counter() - self._t0, self.upstream, self.method, self.endpoint)
+        UPSTREAM_RESPONSES.inc(self.upstream, self.method, self.endpoint, str(self.status))
+        UPSTREAM_IN_FLIGHT.dec(self.upstream)
+        return False
+
+
+# Path segments that follow these are ids, unless they are one of the literal sub-resources
+_ID_AFTER = {"albums", "artists", "audio-analysis", "audio-features", "audiobooks", "categories",
+             "chapters", "episodes", "playlists", "shows", "tracks", "users"}
+_LITERAL = {"albums", "contains", "episodes", "followers", "images", "playlists", "related-artists",
+            "several", "top-tracks", "tracks"}
+_SPOTIFY_ID = re.compile(r"[0-9A-Za-z]{22}")
+
+
+@lru_cache(maxsize=4096)
+def endpoint_template(path: str) -> str:
+    """/playlists/37i9dQZF1DXcBWIGoYBM5M/tracks -> /playlists/{id}/tracks, to keep label cardinality bounded."""
+    parts = path.partition("?")[0].strip("/").split("/")
+    out = []
+    for i, seg in enumerate(parts):
+        prev = parts[i - 1] if i else ""
+        if (prev in _ID_AFTER and seg not in _LITERAL) or _SPOTIFY_ID.fullmatch(seg):
+            seg = "{id}"
+        out.append(seg)
+    return "/" + "/".join(out)
+
+
+def _before_request():
+    HTTP_IN_FLIGHT.inc()
+    g._metrics_t0 = time.perf_counter()
+
+
+def _after_request(resp):
+    g._metrics_status = resp.status_code
+    return resp
+
+
+def _teardown_request(exc):
+    t0 = g.pop("_metrics_t0", None)
+    if t0 is None:
+        return
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    HTTP_LATENCY.observe(time.perf_counter() - t0, request.method, route)
+    HTTP_RESPONSES.inc(request.method, route, str(g.pop("_metrics_status", 500)))
+    HTTP_IN_FLIGHT.dec()
+
+
+def metrics_response() -> Response:
+    """The registry in Prometheus text format. With METRICS_TOKEN set, scrapers must send
+    Authorization: Bearer <token>; anyone else gets a 404, as for /admin."""
+    token = current_app.config.get("METRICS_TOKEN") or ""
+    if token:
+        sent = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(sent.encode(), token.encode()):
+            abort(404)
+    return Response(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def init_app(app) -> None:
+    """Per-route timing for every request (streamed bodies are timed to the response object, not the last byte)."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
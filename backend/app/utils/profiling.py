@@ -0,0 +1,203 @@
+import cProfile, hmac, json, os, pstats, random, threading, time, uuid
+from typing import List, Optional
+from flask import current_app, g, request
+
+# Where a function's own time (tottime) goes, by the file it lives in / its name
+_IO_PATHS = ("/requests/", "/urllib3/", "/httpx/", "/httpcore/", "/openai/", "/ssl.py", "/socket.py",
+             "/http/client.py", "/selectors.py")
+_IO_NAMES = ("socket", "ssl", "select", "poll", "recv", "sendall", "getaddrinfo", "connect")
+_JSON_PATHS = ("/json/", "/json_provider.py")
+_JSON_NAMES = ("orjson", "_json", "scanstring", "scan_once", "encode_basestring")
+_WAIT_NAMES = ("acquire", "wait", "sleep", "join")
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CATEGORIES = ("upstream_io", "json", "app", "wait", "other")
+
+# Python 3.12 allows one active profiler per process (sys.monitoring), and overlapping
+# cProfile runs would attribute each other's threads anyway: one profile at a time
+_ACTIVE = threading.Lock()
+
+
+def _category(filename: str, name: str) -> str:
+    if filename.startswith(_APP_ROOT) and not filename.endswith("/json_provider.py"):
+        return "app"
+    if any(p in filename for p in _JSON_PATHS) or any(n in name for n in _JSON_NAMES):
+        return "json"
+    if any(p in filename for p in _IO_PATHS) or (filename == "~" and any(n in name for n in _IO_NAMES)):
+        return "upstream_io"
+    if filename == "~" and any(n in name for n in _WAIT_NAMES):
+        return "wait"
+    return "other"
+
+
+def attribute(stats: pstats.Stats) -> dict:
+    """
+    Split the profiled wall time by where each function's own time was spent. tottime
+    excludes callees, so the buckets add up to the total; "wait" is time blocked on
+    locks/sleeps, e.g. for worker threads doing concurrent upstream calls.
+    """
+    out = dict.fromkeys(CATEGORIES, 0.0)
+    for (filename, _, name), (_, _, tottime, _, _) in stats.stats.items():
+        out[_category(filename, name)] += tottime
+    return {k: round(v * 1000, 2) for k, v in out.items()}
+
+
+def top_functions(stats: pstats.Stats, n: int = 25) -> List[dict]:
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:n]
+    return [
+        {
+            "function": f"{os.path.relpath(fn, _APP_ROOT) if fn.startswith(_APP_ROOT) else fn}:{line}({name})",
+            "calls": nc, "tottime_ms": round(tt * 1000, 2), "cumtime_ms": round(ct * 1000, 2),
+            "category": _category(fn, name),
+        }
+        for (fn, line, name), (_, nc, tt, ct, _) in rows
+    ]
+
+
+class ProfileStore:
+    """
+    On-disk ring buffer of request profiles: <id>.prof (pstats, loadable with
+    pstats/snakeviz) next to <id>.json (route, timing, attribution, top functions).
+    Ids sort by capture time; past `max_traces` the oldest pairs are deleted.
+    """
+
+    def __init__(self, path: str, *, max_traces: int = 50):
+        self.path = path
+        self.max_traces = max(int(max_traces), 1)
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def from_app(cls, app) -> "ProfileStore":
+        return cls(
+            app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles"),
+            max_traces=app.config.get("PROFILE_MAX_TRACES", 50),
+        )
+
+    def _ids(self) -> List[str]:
+        return sorted(f[:-5] for f in os.listdir(self.path) if f.endswith(".json"))
+
+    def save(self, profile: cProfile.Profile, meta: dict) -> str:
+        now = time.time()
+        trace_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}.{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:6]}"
+        stats = pstats.Stats(profile)
+        meta = {**meta, "id": trace_id, "attribution_ms": attribute(stats), "top": top_functions(stats)}
+        with self._lock:
+            stats.dump_stats(os.path.join(self.path, f"{trace_id}.prof"))
+            with open(os.path.join(self.path, f"{trace_id}.json"), "w") as f:
+                json.dump(meta, f)
+            for old in self._ids()[:-self.max_traces]:
+                for ext in (".json", ".prof"):
+                    try:
+                        os.remove(os.path.join(self.path, old + ext))
+                    except FileNotFoundError:
+                        pass
+        return trace_id
+
+    def list(self) -> List[dict]:
+        out = []
+        for trace_id in reversed(self._ids()):
+            meta = self.get(trace_id)
+            if meta is not None:
+                out.append({k: v for k, v in meta.items() if k != "top"})
+        return out
+
+    def get(self, trace_id: str) -> Optional[dict]:
+        try:
+            with open(self.file(trace_id, ".json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def file(self, trace_id: str, ext: str = ".prof") -> str:
+        if os.path.basename(trace_id) != trace_id or trace_id.startswith("."):
+            raise FileNotFoundError(trace_id)
+        return os.path.join(self.path, trace_id + ext)
+
+
+def profile_store() -> ProfileStore:
+    from .extensions import app_singleton
+    return app_singleton("profile_store", ProfileStore.from_app)
+
+
+def token_ok(value: Optional[str]) -> bool:
+    """Constant-time check against PROFILE_TOKEN; with no token configured nothing matches."""
+    token = current_app.config.get("PROFILE_TOKEN") or ""
+    return bool(token) and bool(value) and hmac.compare_digest(value.encode(), token.encode())
+
+
+def _wanted() -> Optional[str]:
+    if request.path.startswith("/admin/") or request.path == "/metrics":
+        return None
+    if token_ok(request.headers.get("X-Profile")):
+        return "header"
+    rate = float(current_app.config.get("PROFILE_SAMPLE_RATE", 0.0))
+    if rate > 0 and random.random() < rate:
+        return "sampled"
+    return None
+
+
+def _before_request():
+    trigger = _wanted()
+    if trigger is None:
+        return
+    if not _ACTIVE.acquire(blocking=False):
+        return  # another request is being profiled; this one runs unprofiled
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:  # some other profiler (a debugger, coverage) holds the hook
+        _ACTIVE.release()
+        current_app.logger.debug("request profiling skipped: another profiler is active")
+        return
+    g._profile = (prof, trigger, time.perf_counter())
+
+
+def _stop() -> Optional[tuple]:
+    state = g.pop("_profile", None)
+    if state is not None:
+        try:
+            state[0].disable()
+        finally:
+            _ACTIVE.release()
+    return state
+
+
+def _after_request(resp):
+    state = _stop()
+    if state is None:
+        return resp
+    prof, trigger, t0 = state
+    meta = {
+        "method": request.method,
+        "path": request.path,
+        "route": request.url_rule.rule if request.url_rule is not None else None,
+        "status": resp.status_code,
+        "trigger": trigger,
+        "wall_ms": round((time.perf_counter() - t0) * 1000, 2),
+        "streamed": resp.is_streamed,  # a streamed body is generated after this point and not in the profile
+        "captured_at": time.time(),
+    }
+    try:
+        resp.headers["X-Profile-Id"] = profile_store().save(prof, meta)
+    except Exception:  # a lost trace must not turn into a failed request
+        current_app.logger.exception("could not store request profile")
+    return resp
+
+
+def _teardown_request(exc):
+    _stop()  # after_request did not run (the request failed before or inside it)
+
+
+def init_app(app) -> None:
+    """
+    Opt-in per-request cProfile: a request carrying X-Profile: <PROFILE_TOKEN>, or a
+    PROFILE_SAMPLE_RATE fraction of all requests, is profiled in its handling thread
+    (work handed to pool threads shows up as "wait") and stored in the ring buffer.
+    Only one request per process is profiled at a time; others, header-triggered
+    ones included, run unprofiled meanwhile, and profiling never fails a request.
+    """
+    # Registered last so it runs first after the view, before compression and metrics
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
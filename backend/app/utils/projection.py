@@ -0,0 +1,137 @@
+"""
+Declarative response shapes for the proxied Spotify objects.
+
+A spec is one of
+  True          keep the value as is
+  [spec]        apply spec to every element of a list
+  {key: spec}   structural object (paging wrappers etc.): keep the listed keys
+  Entity(...)   a Spotify object; the primary entities of a response can be
+                narrowed further by the caller with ?fields=a,b,c
+  callable      transform the value
+
+Shapes keep Spotify's key names and nesting so the frontend reads them the same
+way; they drop what it never uses (available_markets, external_ids, hrefs, ...)
+and trim image lists to a single URL.
+"""
+from typing import Any, Optional, Sequence
+from flask import current_app, request
+
+
+class Entity:
+    def __init__(self, **spec):
+        self.spec = spec
+
+    def narrowed(self, fields: Optional[Sequence[str]]) -> dict:
+        if not fields:
+            return self.spec
+        # Unknown keys pass through raw, so ?fields= can also ask for dropped data
+        return {k: self.spec.get(k, True) for k in fields}
+
+
+def _one_image(images):
+    """Smallest image at least PROJECTION_IMAGE_MIN_WIDTH wide (Spotify lists them largest first)."""
+    if not images:
+        return images
+    min_width = current_app.config.get("PROJECTION_IMAGE_MIN_WIDTH", 300)
+    pick = images[0]
+    for img in images:
+        if (img.get("width") or 0) >= min_width:
+            pick = img
+    return [pick]
+
+
+def _project(spec, value, fields=None):
+    if value is None or spec is True:
+        return value
+    if isinstance(spec, Entity):
+        if not isinstance(value, dict):
+            return value
+        return {k: _project(sub, value[k]) for k, sub in spec.narrowed(fields).items() if k in value}
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            return value
+        return {k: _project(sub, value[k], fields) for k, sub in spec.items() if k in value}
+    if isinstance(spec, list):
+        if not isinstance(value, list):
+            return value
+        return [_project(spec[0], v, fields) for v in value]
+    return spec(value)
+
+
+EXTERNAL_URLS = {"spotify": True}
+
+# References nested inside other objects carry only what is rendered next to them
+ARTIST_REF = Entity(id=True, name=True)
+ALBUM_REF = Entity(id=True, name=True, images=_one_image)
+
+ARTIST = Entity(id=True, uri=True, name=True, external_urls=EXTERNAL_URLS, genres=True, popularity=True, images=_one_image)
+ALBUM = Entity(
+    id=True, uri=True, name=True, album_type=True, release_date=True, total_tracks=True,
+    artists=[ARTIST_REF], images=_one_image, external_urls=EXTERNAL_URLS,
+)
+TRACK = Entity(
+    id=True, uri=True, name=True, duration_ms=True, explicit=True, popularity=True,
+    artists=[ARTIST_REF], album=ALBUM_REF, external_urls=EXTERNAL_URLS,
+)
+OWNER = {"id": True, "display_name": True}
+PLAYLIST = Entity(
+    id=True, uri=True, name=True, description=True, public=True, collaborative=True, snapshot_id=True,
+    owner=OWNER, images=_one_image, tracks={"total": True}, external_urls=EXTERNAL_URLS,
+)
+PLAYLIST_ITEM = Entity(added_at=True, track=TRACK)
+SAVED_TRACK = Entity(added_at=True, track=TRACK)
+SAVED_ALBUM = Entity(added_at=True, album=ALBUM)
+DEVICE = {"id": True, "name": True, "type": True, "is_active": True, "volume_percent": True}
+PLAYBACK = Entity(
+    is_playing=True, progress_ms=True, timestamp=True, shuffle_state=True, repeat_state=True,
+    currently_playing_type=True, context=True, device=DEVICE, item=TRACK,
+)
+
+
+def paging(item_spec) -> dict:
+    return {
+        "items": [item_spec], "total": True, "limit": True, "offset": True,
+        "next": True, "previous": True, "cursors": True, "synced_at": True,
+    }
+
+
+SHAPES = {
+    "top_tracks": [TRACK],
+    "top_artists": [ARTIST],
+    "recently_played": paging(Entity(track=TRACK, played_at=True, context=True)),
+    "search": {
+        "tracks": paging(TRACK), "albums": paging(ALBUM),
+        "artists": paging(ARTIST), "playlists": paging(PLAYLIST),
+    },
+    "my_playlists": paging(PLAYLIST),
+    "playlist": Entity(**{**PLAYLIST.spec, "followers": {"total": True}, "tracks": paging(PLAYLIST_ITEM)}),
+    "playlist_tracks": paging(PLAYLIST_ITEM),
+    "playlist_item": PLAYLIST_ITEM,
+    "saved_tracks": paging(SAVED_TRACK),
+    "saved_albums": paging(SAVED_ALBUM),
+    "playback": PLAYBACK,
+}
+
+
+def requested_fields() -> Optional[list]:
+    """?fields=a,b,c as a list; None for the route's default shape."""
+    raw = request.args.get("fields")
+    if not raw:
+        return None
+    return [f.strip() for f in raw.split(",") if f.strip()]
+
+
+def project(data: Any, shape: str, fields: Optional[Sequence[str]] = None) -> Any:
+    """Trim a Spotify payload to SHAPES[shape]. fields=["full"] (or "*") returns it untouched."""
+    if not current_app.config.get("PROJECTION_ENABLED", True):
+        return data
+    if fields and fields[0] in ("full", "*"):
+        return data
+    return _project(SHAPES[shape], data, fields)
+
+
+def shaped(data: Any, shape: str, status: int = 200) -> Any:
+    """project() with ?fields= from the current request; error bodies pass through."""
+    if not 200 <= status < 300:
+        return data
+    return project(data, shape, requested_fields())
@@ -1,9 +1,19 @@
-import time
+import hashlib
 from functools import wraps
-from flask import current_app, session, jsonify
-from ..services.spotify import refresh_access_token
+from flask import request, session, jsonify
+from ..services.spotify import get_me, token_refresher
+
+TOKEN_CHECKED_ENVIRON_KEY = "musiq.token_checked"
+
+def _grant(token: dict) -> str:
+    """Fingerprint of the grant a token belongs to: its refresh token, which survives access-token refreshes."""
+    secret = token.get("refresh_token") or token.get("access_token") or ""
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
 
 def set_tokens(session_obj, token_dict):
+    # A new login may be another account: forget the user id learned with the old token
+    session_obj.pop("user_id", None)
+    session_obj.pop("user_grant", None)
     session_obj["token"] = {
         "access_token": token_dict["access_token"],
         "refresh_token": token_dict.get("refresh_token"),
@@ -14,27 +24,42 @@ def set_tokens(session_obj, token_dict):
 
 def clear_tokens(session_obj):
     session_obj.pop("token", None)
+    session_obj.pop("user_id", None)
+    session_obj.pop("user_grant", None)
+
+def validated_user_id(session_obj):
+    """
+    The user id kept in the session, but only if it was learned with the grant the
+    session's token belongs to. Per-user caches must be keyed with this, never with a
+    bare session["user_id"].
+    """
+    uid = session_obj.get("user_id")
+    if uid and session_obj.get("user_grant") == _grant(session_obj.get("token") or {}):
+        return uid
+    return None
+
+def remember_user_id(session_obj, uid):
+    session_obj["user_id"] = uid
+    session_obj["user_grant"] = _grant(session_obj.get("token") or {})
+
+def current_user_id(session_obj):
+    """Spotify user id for this session; looked up once per grant via /me and kept in the session."""
+    uid = validated_user_id(session_obj)
+    if not uid:
+        _, me = get_me(session_obj)
+        uid = me.get("id")
+        if uid:
+            remember_user_id(session_obj, uid)
+    return uid
 
 def _ensure_fresh_access_token():
-    tok = session.get("token")
-    if not tok or not tok.get("access_token"):
-        return False
-    if int(tok.get("expires_at", 0)) <= int(time.time()):
-        rt = tok.get("refresh_token")
-        if not rt:
-            return False
-        new_tok = refresh_access_token(
-            refresh_token=rt,
-            client_id=current_app.config["SPOTIFY_CLIENT_ID"],
-            client_secret=current_app.config["SPOTIFY_CLIENT_SECRET"],
-        )
-        session["token"] = new_tok
-    return True
+    return token_refresher().ensure_fresh(session)
 
 def require_access_token(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        if not _ensure_fresh_access_token():
+        # Sub-requests of /api/batch share the token check of the batch itself
+        if not request.environ.get(TOKEN_CHECKED_ENVIRON_KEY) and not _ensure_fresh_access_token():
             return jsonify({"error": "unauthorized"}), 401
         return fn(*args, **kwargs)
     return wrapper
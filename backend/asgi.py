@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# uvicorn asgi:app --port $PORT (run.py serves the same app over WSGI)
+app = create_asgi_app()
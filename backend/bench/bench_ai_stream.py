@@ -0,0 +1,71 @@
+"""
+Time to first track for AI recommendations: /api/ai/chat followed by
+/spotify-tools/resolve (the two browser round trips) vs. /api/ai/recommend/stream.
+Runs against the stub's fake LLM stream and Spotify search.
+
+    python -m bench.bench_ai_stream --llm-token-ms 15 --latency-ms 150 --candidates 10 --runs 3
+"""
+import argparse, json, os, statistics, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app  # noqa: E402
+from app.services import client, llm  # noqa: E402
+from bench.stub_server import serve  # noqa: E402
+
+
+def _two_step(c, prompt: str):
+    t0 = time.perf_counter()
+    raw = c.post("/api/ai/chat", json={"prompt": prompt}).get_json()
+    candidates = json.loads(raw)["candidates"] if isinstance(raw, str) else raw["candidates"]
+    resolved = c.post("/spotify-tools/resolve", json={"candidates": candidates}).get_json()["resolved"]
+    done = (time.perf_counter() - t0) * 1000
+    return done, done, len(resolved)  # nothing is visible until both calls return
+
+
+def _streamed(c, prompt: str):
+    t0 = time.perf_counter()
+    first, count = None, 0
+    resp = c.post("/api/ai/recommend/stream", json={"prompt": prompt}, buffered=False)
+    for chunk in resp.response:
+        for line in (chunk.decode() if isinstance(chunk, bytes) else chunk).splitlines():
+            if line == "event: resolved":
+                count += 1
+                if first is None:
+                    first = (time.perf_counter() - t0) * 1000
+    resp.close()
+    return first, (time.perf_counter() - t0) * 1000, count
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--llm-token-ms", type=float, default=15.0)
+    ap.add_argument("--latency-ms", type=float, default=150.0, help="Spotify search latency")
+    ap.add_argument("--candidates", type=int, default=10)
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    server, _, base = serve(latency_ms=args.latency_ms, llm_token_ms=args.llm_token_ms, llm_candidates=args.candidates)
+    app = create_app()
+    app.config.update(
+        SPOTIFY_API_BASE=f"{base}/v1", SPOTIFY_ACCOUNTS_BASE=base, OPENAI_BASE_URL=f"{base}/v1",
+        OPENAI_API_KEY="stub", SPOTIFY_CLIENT_ID="stub",
+        SEARCH_CACHE_ENABLED=False, RESOLVE_INDEX_ENABLED=False, PROMPT_CACHE_ENABLED=False,
+    )
+    client.init_app(app)
+    llm.init_app(app)
+    print(f"llm chunk={args.llm_token_ms:.0f}ms  search latency={args.latency_ms:.0f}ms  candidates={args.candidates}")
+    try:
+        with app.test_client() as c:
+            with c.session_transaction() as s:
+                s["token"] = {"access_token": "stub-access", "refresh_token": "stub-refresh", "expires_at": int(time.time()) + 3600}
+            for label, fn in (("chat+resolve", _two_step), ("stream", _streamed)):
+                runs = [fn(c, f"prompt {label} {i}") for i in range(args.runs)]
+                first = statistics.median(r[0] for r in runs)
+                total = statistics.median(r[1] for r in runs)
+                print(f"{label:<14} first track={first:8.1f}ms  all tracks={total:8.1f}ms  resolved={runs[0][2]}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
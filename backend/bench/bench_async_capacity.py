@@ -0,0 +1,119 @@
+"""
+Concurrent-user capacity of the app served over WSGI worker threads vs. over ASGI
+(app/asgi.py), where routes/async_api.py answers on one event loop.
+
+Each simulated user makes one request to an /api route that always waits on
+Spotify (GET /api/me/recently-played by default) against the local stub with
+fixed server-side latency. The WSGI side gets a fixed number of worker threads
+(what a sync WSGI server has); the ASGI side runs all users on one event loop,
+as uvicorn would. All users arrive at once and latency is measured from arrival,
+so time spent waiting for a free worker (WSGI) or pool slot (ASGI) is included.
+
+    python -m bench.bench_async_capacity --users 50 100 200 400 --workers 8 --latency-ms 200
+"""
+import argparse, asyncio, os, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app  # noqa: E402
+from app.asgi import create_asgi_app  # noqa: E402
+from app.services import client, spotify_async  # noqa: E402
+from app.utils.tokens import remember_user_id  # noqa: E402
+from bench.stub_server import serve  # noqa: E402
+
+
+def _session_cookie(app) -> str:
+    """A signed session cookie for one logged-in bench user, shared by every simulated request."""
+    c = app.test_client()
+    with c.session_transaction() as s:
+        s["token"] = {"access_token": "stub-access", "refresh_token": "stub-refresh", "expires_at": int(time.time()) + 3600}
+        remember_user_id(s, "bench")
+    return c.get_cookie("session").value
+
+
+def _summary(label: str, users: int, wall: float, latencies: list, errors: int, state) -> str:
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    return (f"{label:<5} users={users:<5} wall={wall:7.3f}s  throughput={users / wall:8.1f} req/s  "
+            f"p50={latencies[len(latencies) // 2]:8.1f}ms  p95={p95:8.1f}ms  errors={errors}  "
+            f"connections={state.connections}")
+
+
+def run_wsgi(app, cookie: str, path: str, users: int, workers: int, state) -> str:
+    latencies, errors = [], []
+
+    def one(_):
+        c = app.test_client()
+        c.set_cookie("session", cookie)
+        if c.get(path).status_code != 200:
+            errors.append(1)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    state.reset()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(one, range(users)))
+    return _summary("wsgi", users, time.perf_counter() - t0, latencies, len(errors), state)
+
+
+def run_asgi(app, cookie: str, path: str, users: int, state) -> str:
+    latencies, errors = [], []
+    asgi_app = create_asgi_app(app)
+
+    async def one(http, t0):
+        if (await http.get(path)).status_code != 200:
+            errors.append(1)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    async def main():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies={"session": cookie}) as http:
+            await http.get(path)  # open the upstream pool outside the measurement
+            state.reset()
+            t0 = time.perf_counter()
+            await asyncio.gather(*(one(http, t0) for _ in range(users)))
+            wall = time.perf_counter() - t0
+        with app.app_context():
+            await spotify_async.close_async_client()
+        return wall
+
+    wall = asyncio.run(main())
+    return _summary("asgi", users, wall, latencies, len(errors), state)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, nargs="+", default=[50, 100, 200, 400])
+    ap.add_argument("--workers", type=int, default=8, help="WSGI worker threads")
+    ap.add_argument("--async-pool", type=int, default=None, help="SPOTIFY_ASYNC_POOL_MAXSIZE override")
+    ap.add_argument("--latency-ms", type=float, default=200.0)
+    ap.add_argument("--path", default="/api/me/recently-played?limit=20",
+                    help="route to load; one of routes/async_api.py ASYNC_VIEWS for a like-for-like comparison")
+    args = ap.parse_args()
+
+    server, state, base = serve(latency_ms=args.latency_ms)
+    tmp = tempfile.mkdtemp(prefix="bench-async-")
+    app = create_app()
+    # SPOTIFY_RATE_LIMIT=0: measure the serving model, not the outbound token bucket
+    app.config.update(SPOTIFY_API_BASE=f"{base}/v1", SPOTIFY_ACCOUNTS_BASE=base,
+                      SPOTIFY_POOL_MAXSIZE=args.workers, SPOTIFY_RATE_LIMIT=0, FRONTEND_ORIGIN="",
+                      RESOLVE_INDEX_PATH=os.path.join(tmp, "resolution_index.sqlite3"),
+                      LIBRARY_MIRROR_PATH=os.path.join(tmp, "library_mirror.sqlite3"),
+                      PROMPT_CACHE_PATH=os.path.join(tmp, "prompt_cache.sqlite3"))
+    if args.async_pool:
+        app.config["SPOTIFY_ASYNC_POOL_MAXSIZE"] = args.async_pool
+    client.init_app(app)
+    cookie = _session_cookie(app)
+    print(f"route={args.path}  stub latency={args.latency_ms:.0f}ms  wsgi workers={args.workers}  "
+          f"async pool={app.config['SPOTIFY_ASYNC_POOL_MAXSIZE']}")
+    try:
+        for users in args.users:
+            print(run_wsgi(app, cookie, args.path, users, args.workers, state))
+            print(run_asgi(app, cookie, args.path, users, state))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Pooled SpotifyClient vs. one-shot requests.get against the local stub.
+
+    python -m bench.bench_client_pool --calls 500 --threads 8
+    python -m bench.bench_client_pool --tls   # self-signed cert, shows TLS handshake savings
+
+Reports wall time, per-call latency and how many TCP connections the stub accepted.
+"""
+import argparse, os, statistics, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import urllib3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.client import SpotifyClient  # noqa: E402
+from bench.stub_server import serve  # noqa: E402
+
+
+def _self_signed_cert(tmpdir: str):
+    cert, key = os.path.join(tmpdir, "cert.pem"), os.path.join(tmpdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def _run(label: str, call, *, calls: int, threads: int, state):
+    state.reset()
+    latencies = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        r = call()
+        r.content
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(one, range(calls)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<10} wall={wall:7.3f}s  mean={statistics.mean(latencies):7.2f}ms  "
+        f"p50={statistics.median(latencies):7.2f}ms  p95={p95:7.2f}ms  connections={state.connections}"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=500)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="server-side think time per request")
+    ap.add_argument("--tls", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert = key = None
+        if args.tls:
+            cert, key = _self_signed_cert(tmp)
+            urllib3.disable_warnings()
+        server, state, base = serve(latency_ms=args.latency_ms, tls_cert=cert, tls_key=key)
+        verify = False if args.tls else True
+        headers = {"Authorization": "Bearer bench", "Accept": "application/json"}
+
+        def unpooled():
+            return requests.get(f"{base}/v1/me", headers=headers, timeout=15, verify=verify)
+
+        client = SpotifyClient(api_base=f"{base}/v1", accounts_base=base, pool_maxsize=args.threads)
+        client._api.verify = verify
+
+        def pooled():
+            return client.api("GET", "/me", headers=headers)
+
+        print(f"{args.calls} calls, {args.threads} threads, {'https' if args.tls else 'http'} stub at {base}")
+        _run("unpooled", unpooled, calls=args.calls, threads=args.threads, state=state)
+        _run("pooled", pooled, calls=args.calls, threads=args.threads, state=state)
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Worker cold start: import time of the app package, create_app(), and the latency of
+the first Spotify-backed and first AI request, each in a fresh interpreter.
+
+    eager   - openai imported up front, as every worker used to
+    lazy    - heavy dependencies load on first use (the default)
+    warmup  - lazy, plus WARMUP_ENABLED: pools and the OpenAI client are ready before traffic
+
+    python -m bench.bench_cold_start --runs 5 --latency-ms 20
+"""
+import argparse, json, os, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("eager", "lazy", "warmup")
+
+
+def _child(mode: str) -> None:
+    sys.path.insert(0, ROOT)
+    t0 = time.perf_counter()
+    if mode == "eager":
+        import openai  # noqa: F401
+    from app import create_app
+    t1 = time.perf_counter()
+    app = create_app()
+    t2 = time.perf_counter()
+    openai_loaded = "openai" in sys.modules
+    with app.test_client() as c:
+        with c.session_transaction() as s:
+            s["token"] = {"access_token": "stub-access", "refresh_token": "stub-refresh", "expires_at": int(time.time()) + 3600}
+        t = time.perf_counter()
+        status = c.get("/api/me").status_code
+        first = time.perf_counter() - t
+        t = time.perf_counter()
+        ai_status = c.post("/api/ai/chat", json={"prompt": "cold start"}).status_code
+        first_ai = time.perf_counter() - t
+    print(json.dumps({
+        "import_ms": (t1 - t0) * 1000, "create_ms": (t2 - t1) * 1000,
+        "first_ms": first * 1000, "first_ai_ms": first_ai * 1000,
+        "openai_at_boot": openai_loaded, "status": [status, ai_status],
+    }))
+
+
+def _run(mode: str, env: dict) -> dict:
+    env = dict(env, WARMUP_ENABLED="true" if mode == "warmup" else "false")
+    out = subprocess.run([sys.executable, "-m", "bench.bench_cold_start", "--child", mode],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--latency-ms", type=float, default=20.0, help="stub upstream latency")
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return _child(args.child)
+
+    sys.path.insert(0, ROOT)
+    from bench.stub_server import serve
+
+    server, _, base = serve(latency_ms=args.latency_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            SPOTIFY_API_BASE=f"{base}/v1", SPOTIFY_ACCOUNTS_BASE=base, OPENAI_BASE_URL=f"{base}/v1",
+            OPENAI_API_KEY="stub", SPOTIFY_CLIENT_ID="stub", SPOTIFY_RATE_LIMIT="0",
+            PROMPT_CACHE_PATH=os.path.join(tmp, "prompts.sqlite3"), PROMPT_CACHE_ENABLED="false",
+            RESOLVE_INDEX_PATH=os.path.join(tmp, "resolve.sqlite3"), LIBRARY_MIRROR_ENABLED="false",
+        )
+        print(f"stub latency={args.latency_ms:.0f}ms  runs={args.runs} (median)")
+        print(f"{'mode':<8} {'import':>9} {'create_app':>11} {'1st /me':>9} {'1st ai':>9} {'boot->me':>9}  openai@boot")
+        try:
+            for mode in args.modes.split(","):
+                _run(mode, env)  # populate bytecode caches so every run is a warm-disk cold start
+                runs = [_run(mode, env) for _ in range(args.runs)]
+                med = {k: statistics.median(r[k] for r in runs) for k in ("import_ms", "create_ms", "first_ms", "first_ai_ms")}
+                boot = med["import_ms"] + med["create_ms"] + med["first_ms"]
+                print(f"{mode:<8} {med['import_ms']:8.1f}ms {med['create_ms']:10.1f}ms {med['first_ms']:8.1f}ms "
+                      f"{med['first_ai_ms']:8.1f}ms {boot:8.1f}ms  {runs[0]['openai_at_boot']}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Serialization CPU time and bytes on the wire for large Spotify payloads, before
+(Flask's stock provider, identity encoding) and after (FastJSONProvider + gzip/zstd).
+
+    python -m bench.bench_json_compression
+    python -m bench.bench_json_compression --payloads recorded.json --repeat 200
+"""
+import argparse, os, sys, time
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils.compression import compress, zstandard  # noqa: E402
+from app.utils.json_provider import FastJSONProvider, orjson  # noqa: E402
+from bench.payloads import load  # noqa: E402
+
+
+def _time_ms(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1000 / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--payloads", help="JSON file of {name: recorded response body}")
+    ap.add_argument("--repeat", type=int, default=100)
+    args = ap.parse_args()
+
+    app = Flask(__name__)
+    stock, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    codings = ["gzip"] + (["zstd"] if zstandard is not None else [])
+    print(f"orjson={'yes' if orjson else 'no'}  zstd={'yes' if zstandard else 'no'}  repeat={args.repeat}")
+    print(f"{'payload':<16}{'stock ms':>10}{'fast ms':>10}{'raw KB':>10}"
+          + "".join(f"{c + ' KB':>10}{c + ' ms':>10}" for c in codings))
+
+    with app.app_context():
+        for name, body in load(args.payloads).items():
+            stock_ms = _time_ms(lambda: stock.response(body).get_data(), args.repeat)
+            fast_ms = _time_ms(lambda: fast.response(body).get_data(), args.repeat)
+            raw = fast.response(body).get_data()
+            row = f"{name:<16}{stock_ms:>10.3f}{fast_ms:>10.3f}{len(raw) / 1024:>10.1f}"
+            for coding in codings:
+                packed = compress(raw, coding)
+                ms = _time_ms(lambda: compress(raw, coding), max(1, args.repeat // 10))
+                row += f"{len(packed) / 1024:>10.1f}{ms:>10.3f}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
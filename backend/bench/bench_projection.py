@@ -0,0 +1,48 @@
+"""
+Payload size per route before and after the projection layer (app/utils/projection.py).
+
+    python -m bench.bench_projection
+    python -m bench.bench_projection --payloads recorded.json
+"""
+import argparse, gzip, os, sys
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils.json_provider import FastJSONProvider  # noqa: E402
+from app.utils.projection import project  # noqa: E402
+from bench.payloads import load  # noqa: E402
+
+# payload name -> (route, shape, how the route picks its body out of the Spotify response)
+ROUTES = {
+    "search": ("/api/search", "search", lambda d: d),
+    "playlist_tracks": ("/api/playlists/<id>/tracks", "playlist_tracks", lambda d: d),
+    "recently_played": ("/api/me/recently-played", "recently_played", lambda d: d),
+    "top_tracks": ("/api/me/top-tracks", "top_tracks", lambda d: d.get("items", [])),
+    "top_artists": ("/api/me/top-artists", "top_artists", lambda d: d.get("items", [])),
+    "my_playlists": ("/api/me/playlists", "my_playlists", lambda d: d),
+}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--payloads", help="JSON file of {name: recorded response body}")
+    args = ap.parse_args()
+
+    app = Flask(__name__)
+    dumps = FastJSONProvider(app).dumps
+    print(f"{'route':<30}{'raw KB':>10}{'slim KB':>10}{'ratio':>8}{'raw gz KB':>11}{'slim gz KB':>12}")
+    with app.test_request_context():
+        for name, body in load(args.payloads).items():
+            if name not in ROUTES:
+                continue
+            route, shape, pick = ROUTES[name]
+            raw = dumps(pick(body)).encode()
+            slim = dumps(project(pick(body), shape)).encode()
+            print(
+                f"{route:<30}{len(raw) / 1024:>10.1f}{len(slim) / 1024:>10.1f}{len(raw) / len(slim):>7.1f}x"
+                f"{len(gzip.compress(raw)) / 1024:>11.1f}{len(gzip.compress(slim)) / 1024:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Load benchmark for every blueprint route (api, spotify_tools, ai, auth), driven
+against the local stub (bench/stub_server.py) with weighted traffic mixes:
+
+    browse   profile, top items, recently played, playlists, library pages, search,
+             keystroke search, current playback, /api/batch
+    player   devices, current playback and every player command
+    library  saves/removals, playlist creation and edits, then library re-reads
+    ai       /api/ai/chat, /api/ai/recommend(/stream), /spotify-tools/resolve
+    auth     /auth/login -> /auth/callback -> /auth/logout
+
+Each mix runs `--concurrency` client threads through the WSGI app (Flask test
+clients, one per thread) after a short warmup, and reports throughput plus
+p50/p95/p99 for the mix and per route. /api/player/stream is left out: it is an
+open-ended event stream, not a request/response.
+
+    python -m bench.bench_routes                         # run all mixes, compare with bench/baseline.json
+    python -m bench.bench_routes --mix browse player --per-route
+    python -m bench.bench_routes --save-baseline         # record the current numbers as the baseline
+    python -m bench.bench_routes --error-rate 0.02 --rate-429 0.01 --no-check
+
+Exits 1 when a mix's throughput drops, or its p95 rises, by more than --tolerance
+against the baseline recorded with the same settings. Numbers depend on the machine:
+re-record the baseline wherever the check runs (the stored one is from a 1-CPU box).
+"""
+import argparse, itertools, json, os, random, sys, tempfile, threading, time
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app  # noqa: E402
+from app.services import client, llm  # noqa: E402
+from app.utils.tokens import remember_user_id  # noqa: E402
+from bench.stub_server import serve  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+_WORDS = ["radiohead", "daft punk", "lofi beats", "taylor swift", "miles davis", "bonobo", "kendrick", "burial"]
+_PROMPTS = [f"music like {w}" for w in _WORDS] + ["chill lofi for studying", "songs for a rainy day", "90s hip hop"]
+_IDS = [f"{i:022d}" for i in range(40)]
+_URIS = [f"spotify:track:{i}" for i in _IDS]
+
+
+def _login(c):
+    """Seed the client's session as its own user (per-user state: typeahead, mirror, playback hub)."""
+    with c.session_transaction() as s:
+        s["token"] = {"access_token": "stub-access", "refresh_token": "stub-refresh", "expires_at": int(time.time()) + 3600}
+        remember_user_id(s, c.bench_user)  # as if /me had been looked up for this grant
+
+
+def _call(c, label, method, path, **kw):
+    t0 = time.perf_counter()
+    resp = c.open(path, method=method, **kw)
+    resp.get_data()  # drain streamed bodies
+    return label, resp.status_code, (time.perf_counter() - t0) * 1000, resp
+
+
+def _get(label, path):
+    return lambda c, rng: [_call(c, label, "GET", path(rng) if callable(path) else path)[:3]]
+
+
+def _send(label, method, path, body=None):
+    def op(c, rng):
+        return [_call(c, label, method, path(rng) if callable(path) else path,
+                      json=body(rng) if callable(body) else body)[:3]]
+    return op
+
+
+def _typeahead(c, rng):
+    word = rng.choice(_WORDS)
+    return [_call(c, "search_typeahead", "GET", f"/api/search?q={word[:n]}&types=track,artist&typeahead=1")[:3]
+            for n in range(3, len(word) + 1)]
+
+
+def _auth_flow(c, rng):
+    label, status, ms, resp = _call(c, "auth_login", "GET", "/auth/login")
+    state = parse_qs(urlparse(resp.headers.get("Location", "")).query).get("state", [""])[0]
+    out = [
+        (label, status, ms),
+        _call(c, "auth_callback", "GET", f"/auth/callback?code=stub-code&state={state}")[:3],
+        _call(c, "auth_logout", "POST", "/auth/logout")[:3],
+    ]
+    _login(c)  # back to the seeded session for whatever this client runs next
+    return out
+
+
+def _batch(rng):
+    return {"requests": [
+        {"method": "GET", "path": "/me/top-tracks?limit=20"},
+        {"method": "GET", "path": "/me/top-artists?limit=20"},
+        {"method": "GET", "path": "/me/playlists?limit=20"},
+    ]}
+
+
+# mix -> [(weight, op)], ops per mix run
+MIXES = {
+    "browse": (400, [
+        (4, _get("me", "/api/me")),
+        (10, _get("top_tracks", "/api/me/top-tracks?limit=20&time_range=medium_term")),
+        (8, _get("top_artists", "/api/me/top-artists?limit=20")),
+        (6, _get("recently_played", "/api/me/recently-played?limit=50")),
+        (8, _get("my_playlists", lambda rng: f"/api/me/playlists?limit=20&offset={rng.choice((0, 20, 40))}")),
+        (5, _get("playlist", "/api/playlists/stub-playlist")),
+        (8, _get("playlist_tracks", lambda rng: f"/api/playlists/stub-playlist/tracks?limit=100&offset={rng.choice((0, 100))}")),
+        (1, _get("playlist_tracks_all", "/api/playlists/stub-playlist/tracks/all")),
+        (6, _get("library_tracks", lambda rng: f"/api/me/library/tracks?limit=50&offset={rng.choice((0, 50, 100))}")),
+        (3, _get("library_albums", "/api/me/library/albums?limit=50")),
+        (6, _get("search", lambda rng: f"/api/search?q={rng.choice(_WORDS)}&types=track,album,artist,playlist")),
+        (4, _typeahead),
+        (8, _get("player_current", "/api/player/current")),
+        (3, _send("batch", "POST", "/api/batch", _batch)),
+    ]),
+    "player": (400, [
+        (4, _get("player_devices", "/api/player/devices")),
+        (20, _get("player_current", "/api/player/current")),
+        (6, _send("player_play", "PUT", "/api/player/play", lambda rng: {"uris": rng.sample(_URIS, 3)})),
+        (6, _send("player_pause", "PUT", "/api/player/pause")),
+        (6, _send("player_next", "POST", "/api/player/next")),
+        (2, _send("player_previous", "POST", "/api/player/previous")),
+        (3, _send("player_queue", "POST", lambda rng: f"/api/player/queue?uri={rng.choice(_URIS)}")),
+        (3, _send("player_seek", "PUT", lambda rng: f"/api/player/seek?position_ms={rng.randrange(0, 200000)}")),
+        (2, _send("player_shuffle", "PUT", lambda rng: f"/api/player/shuffle?state={rng.choice(('true', 'false'))}")),
+        (2, _send("player_repeat", "PUT", lambda rng: f"/api/player/repeat?state={rng.choice(('off', 'track', 'context'))}")),
+        (4, _send("player_volume", "PUT", lambda rng: f"/api/player/volume?percent={rng.randrange(0, 101)}")),
+        (1, _send("player_transfer", "PUT", "/api/player/transfer?device_id=stub-device")),
+        (3, _send("tools_play", "POST", "/spotify-tools/play", lambda rng: {"uris": rng.sample(_URIS, 5)})),
+    ]),
+    "library": (300, [
+        (4, _send("library_tracks_save", "PUT", "/api/me/library/tracks", lambda rng: {"ids": rng.sample(_IDS, 5)})),
+        (3, _send("library_tracks_remove", "DELETE", "/api/me/library/tracks", lambda rng: {"ids": rng.sample(_IDS, 2)})),
+        (2, _send("library_albums_save", "PUT", "/api/me/library/albums", lambda rng: {"ids": rng.sample(_IDS, 3)})),
+        (2, _send("library_albums_remove", "DELETE", "/api/me/library/albums", lambda rng: {"ids": rng.sample(_IDS, 1)})),
+        (1, _send("playlist_create", "POST", "/api/playlists", lambda rng: {"name": f"Mix {rng.randrange(1000)}"})),
+        (4, _send("playlist_add", "POST", "/api/playlists/stub-playlist/tracks", lambda rng: {"uris": rng.sample(_URIS, 10)})),
+        (2, _send("playlist_remove", "DELETE", "/api/playlists/stub-playlist/tracks", lambda rng: {"uris": rng.sample(_URIS, 3)})),
+        (3, _send("tools_add_to_playlist", "POST", "/spotify-tools/add-to-playlist",
+                  lambda rng: {"playlist_id": "stub-playlist", "track_uris": rng.sample(_URIS, 5)})),
+        (6, _get("library_tracks", "/api/me/library/tracks?limit=50")),
+        (3, _get("library_albums", "/api/me/library/albums?limit=50")),
+        (3, _get("my_playlists", "/api/me/playlists?limit=50")),
+    ]),
+    "ai": (120, [
+        (3, _send("ai_chat", "POST", "/api/ai/chat", lambda rng: {"prompt": rng.choice(_PROMPTS)})),
+        (3, _send("ai_recommend", "POST", "/api/ai/recommend", lambda rng: {"prompt": rng.choice(_PROMPTS)})),
+        (2, _send("ai_recommend_stream", "POST", "/api/ai/recommend/stream", lambda rng: {"prompt": rng.choice(_PROMPTS)})),
+        (4, _send("tools_resolve", "POST", "/spotify-tools/resolve", lambda rng: {"candidates": [
+            {"artist": w.title(), "track": f"Track {rng.randrange(20)}"} for w in rng.sample(_WORDS, 5)]})),
+    ]),
+    "auth": (60, [
+        (1, _auth_flow),
+    ]),
+}
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+def _stats(samples, wall):
+    ms = [s[2] for s in samples]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s[1] >= 500),
+        "throughput": round(len(samples) / wall, 1) if wall else 0.0,
+        "p50": round(_pct(ms, 50), 1), "p95": round(_pct(ms, 95), 1), "p99": round(_pct(ms, 99), 1),
+    }
+
+
+def run_mix(app, name: str, ops_total: int, concurrency: int, seed: int, warmup: float = 0.1):
+    """Returns (mix stats, {route: stats})."""
+    weights, ops = zip(*MIXES[name][1])
+    plan_rng = random.Random(seed)
+    plan = plan_rng.choices(ops, weights=weights, k=ops_total + int(ops_total * warmup))
+    n_warm = len(plan) - ops_total
+    cursor = itertools.count()
+    samples, lock = [], threading.Lock()
+    start_measuring = threading.Barrier(concurrency)
+    t_start = [0.0]
+
+    def worker(wid):
+        rng = random.Random(seed * 1000 + wid)
+        with app.test_client() as c:
+            c.bench_user = f"bench-user-{wid}"
+            _login(c)
+            i = next(cursor)
+            while i < n_warm:  # warmup ops are handed out first and not recorded
+                plan[i](c, rng)
+                i = next(cursor)
+            if start_measuring.wait() == 0:
+                t_start[0] = time.perf_counter()
+            while i < len(plan):
+                out = plan[i](c, rng)
+                with lock:
+                    samples.extend(out)
+                i = next(cursor)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t_start[0]
+
+    by_route = {}
+    for s in samples:
+        by_route.setdefault(s[0], []).append(s)
+    return _stats(samples, wall), {r: _stats(v, wall) for r, v in sorted(by_route.items())}
+
+
+def _build_app(base: str, args, tmp: str):
+    app = create_app()
+    app.config.update(
+        SPOTIFY_API_BASE=f"{base}/v1", SPOTIFY_ACCOUNTS_BASE=base, OPENAI_BASE_URL=f"{base}/v1",
+        OPENAI_API_KEY="stub", SPOTIFY_CLIENT_ID="stub", SPOTIFY_CLIENT_SECRET="stub",
+        REDIRECT_URI="http://127.0.0.1/auth/callback", FRONTEND_ORIGIN="",
+        SPOTIFY_RATE_LIMIT=args.rate_limit,
+        RESOLVE_INDEX_PATH=os.path.join(tmp, "resolution_index.sqlite3"),
+        LIBRARY_MIRROR_PATH=os.path.join(tmp, "library_mirror.sqlite3"),
+        PROMPT_CACHE_PATH=os.path.join(tmp, "prompt_cache.sqlite3"),
+    )
+    client.init_app(app)
+    llm.init_app(app)
+    return app
+
+
+def _settings(args) -> dict:
+    return {
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate,
+        "rate_429": args.rate_429, "llm_token_ms": args.llm_token_ms, "concurrency": args.concurrency,
+        "rate_limit": args.rate_limit, "seed": args.seed, "scale": args.scale,
+    }
+
+
+def _regressions(results: dict, baseline: dict, tolerance: float, slack_ms: float) -> list:
+    out = []
+    for mix, now in results.items():
+        base = baseline.get("mixes", {}).get(mix)
+        if not base:
+            continue
+        if now["throughput"] < base["throughput"] * (1 - tolerance):
+            out.append(f"{mix}: throughput {now['throughput']} req/s < baseline {base['throughput']} req/s")
+        if now["p95"] > base["p95"] * (1 + tolerance) + slack_ms:
+            out.append(f"{mix}: p95 {now['p95']} ms > baseline {base['p95']} ms")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mix", nargs="+", choices=sorted(MIXES), default=list(MIXES))
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--scale", type=float, default=1.0, help="multiply each mix's op count")
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--llm-token-ms", type=float, default=2.0)
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="SPOTIFY_RATE_LIMIT for the app (0: off)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--per-route", action="store_true", help="also print per-route numbers")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--no-check", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    ap.add_argument("--slack-ms", type=float, default=10.0, help="absolute p95 slack on top of --tolerance")
+    args = ap.parse_args()
+
+    server, state, base = serve(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_429=args.rate_429, llm_token_ms=args.llm_token_ms, seed=args.seed,
+    )
+    results, routes = {}, {}
+    print(" ".join(f"{k}={v}" for k, v in _settings(args).items()))
+    print(f"{'mix':<8} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = _build_app(base, args, tmp)
+            for name in args.mix:
+                state.reset()
+                total = max(1, int(MIXES[name][0] * args.scale))
+                results[name], routes[name] = run_mix(app, name, total, args.concurrency, args.seed)
+                r = results[name]
+                print(f"{name:<8} {r['requests']:>8} {r['errors']:>6} {r['throughput']:>8} {r['p50']:>8} {r['p95']:>8} {r['p99']:>8}"
+                      f"   upstream={state.requests} injected={state.injected}")
+                if args.per_route:
+                    for route, s in routes[name].items():
+                        print(f"  {route:<24} {s['requests']:>6} {s['errors']:>6} {s['p50']:>8} {s['p95']:>8} {s['p99']:>8}")
+    finally:
+        server.shutdown()
+
+    if args.save_baseline:
+        existing = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                existing = json.load(f)
+        if existing.get("settings") != _settings(args):
+            existing = {}
+        existing = {"settings": _settings(args), "mixes": {**existing.get("mixes", {}), **results},
+                    "routes": {**existing.get("routes", {}), **routes}}
+        with open(args.baseline, "w") as f:
+            json.dump(existing, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if args.no_check or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != _settings(args):
+        print("baseline was recorded with different settings; not compared")
+        return 0
+    problems = _regressions(results, baseline, args.tolerance, args.slack_ms)
+    for p in problems:
+        print(f"REGRESSION {p}")
+    if not problems:
+        print(f"no regressions against {os.path.basename(args.baseline)} (tolerance {args.tolerance:.0%})")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Spotify-shaped response bodies for the benchmarks.
+
+`load(path)` reads recorded responses (a JSON object of {name: body}); without a
+recording, `synthetic()` builds bodies with the same structure and field sizes as
+real Web API responses: full track objects with album, ~185 available_markets per
+track and album, three image sizes, and so on.
+"""
+import json, random, string
+
+_MARKETS = [a + b for a in string.ascii_uppercase for b in string.ascii_uppercase][:185]
+
+
+def _id(rng):
+    return "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(22))
+
+
+def _images(rng, kind="image"):
+    return [
+        {"url": f"https://i.scdn.co/{kind}/{_id(rng)}{_id(rng)}", "height": size, "width": size}
+        for size in (640, 300, 64)
+    ]
+
+
+def _artist(rng):
+    aid = _id(rng)
+    return {
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/{aid}"},
+        "href": f"https://api.spotify.com/v1/artists/{aid}",
+        "id": aid,
+        "name": f"Artist {aid[:6]}",
+        "type": "artist",
+        "uri": f"spotify:artist:{aid}",
+    }
+
+
+def _full_artist(rng):
+    a = _artist(rng)
+    a.update({
+        "followers": {"href": None, "total": rng.randint(0, 10 ** 7)},
+        "genres": ["indie", "alt rock", "art pop"],
+        "images": _images(rng),
+        "popularity": rng.randint(0, 100),
+    })
+    return a
+
+
+def _album(rng):
+    alid = _id(rng)
+    return {
+        "album_type": "album",
+        "artists": [_artist(rng)],
+        "available_markets": list(_MARKETS),
+        "external_urls": {"spotify": f"https://open.spotify.com/album/{alid}"},
+        "href": f"https://api.spotify.com/v1/albums/{alid}",
+        "id": alid,
+        "images": _images(rng),
+        "name": f"Album {alid[:6]}",
+        "release_date": "2001-05-21",
+        "release_date_precision": "day",
+        "total_tracks": 12,
+        "type": "album",
+        "uri": f"spotify:album:{alid}",
+    }
+
+
+def _track(rng):
+    tid = _id(rng)
+    return {
+        "album": _album(rng),
+        "artists": [_artist(rng) for _ in range(rng.randint(1, 3))],
+        "available_markets": list(_MARKETS),
+        "disc_number": 1,
+        "duration_ms": rng.randint(120000, 420000),
+        "explicit": False,
+        "external_ids": {"isrc": "GBAYE0000000"},
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{tid}"},
+        "href": f"https://api.spotify.com/v1/tracks/{tid}",
+        "id": tid,
+        "is_local": False,
+        "name": f"Track {tid[:6]}",
+        "popularity": rng.randint(0, 100),
+        "preview_url": None,
+        "track_number": rng.randint(1, 12),
+        "type": "track",
+        "uri": f"spotify:track:{tid}",
+    }
+
+
+def _playlist(rng):
+    pid = _id(rng)
+    return {
+        "collaborative": False,
+        "description": "A playlist",
+        "external_urls": {"spotify": f"https://open.spotify.com/playlist/{pid}"},
+        "href": f"https://api.spotify.com/v1/playlists/{pid}",
+        "id": pid,
+        "images": _images(rng, "mosaic"),
+        "name": f"Playlist {pid[:6]}",
+        "owner": {"display_name": "someone", "id": "someone", "type": "user", "uri": "spotify:user:someone"},
+        "public": True,
+        "snapshot_id": _id(rng) * 2,
+        "tracks": {"href": f"https://api.spotify.com/v1/playlists/{pid}/tracks", "total": rng.randint(1, 500)},
+        "type": "playlist",
+        "uri": f"spotify:playlist:{pid}",
+    }
+
+
+def _paging(items, limit, total=None):
+    return {"href": "https://api.spotify.com/v1/...", "items": items, "limit": limit, "next": None,
+            "offset": 0, "previous": None, "total": len(items) if total is None else total}
+
+
+def synthetic(seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    return {
+        "search": {
+            "tracks": _paging([_track(rng) for _ in range(20)], 20, 1000),
+            "albums": _paging([_album(rng) for _ in range(20)], 20, 1000),
+            "artists": _paging([_full_artist(rng) for _ in range(20)], 20, 1000),
+            "playlists": _paging([_playlist(rng) for _ in range(20)], 20, 1000),
+        },
+        "playlist_tracks": _paging(
+            [{"added_at": "2024-01-01T00:00:00Z", "added_by": {"id": "someone"}, "is_local": False, "track": _track(rng)}
+             for _ in range(100)],
+            100, 1200,
+        ),
+        "recently_played": {
+            "items": [{"track": _track(rng), "played_at": "2024-01-01T00:00:00.000Z", "context": None} for _ in range(50)],
+            "limit": 50, "next": None, "cursors": {"after": "1", "before": "0"}, "href": "https://api.spotify.com/v1/...",
+        },
+        "top_tracks": _paging([_track(rng) for _ in range(50)], 50),
+        "top_artists": _paging([_full_artist(rng) for _ in range(50)], 50),
+        "my_playlists": _paging([_playlist(rng) for _ in range(50)], 50, 120),
+    }
+
+
+def load(path=None) -> dict:
+    if not path:
+        return synthetic()
+    with open(path) as f:
+        return json.load(f)
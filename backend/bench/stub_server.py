@@ -0,0 +1,444 @@
+"""
+Local stand-in for the Spotify Web API, the accounts service and OpenAI's chat
+endpoint, used by the benchmarks.
+
+    python -m bench.stub_server --port 8765 --latency-ms 20
+    python -m bench.stub_server --port 8765 --latency-ms 40 --jitter-ms 20 --error-rate 0.01 --rate-429 0.02
+    python -m bench.stub_server --port 8765 --tls-cert cert.pem --tls-key key.pem
+
+Point the backend at it with SPOTIFY_API_BASE=http://127.0.0.1:8765/v1,
+SPOTIFY_ACCOUNTS_BASE=http://127.0.0.1:8765 and OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+
+Every route the backend calls answers with a Spotify-shaped body (bench/payloads.py):
+profile, top items, recently played, devices and playback, search, playlists and
+their tracks, saved tracks/albums with consistent paging, and the mutations.
+/v1/chat/completions is a fake LLM: it answers with `llm_candidates` candidates and,
+with "stream": true, streams the JSON a few characters per chunk, `llm_token_ms` apart.
+
+Identity: the token endpoint hands out "stub-access" for the benches' fixed session,
+but an authorization code (or a refresh token minted from one) of "alice" yields
+"stub-access:alice:<n>". /v1/me* answers for such a token are that user's: the
+profile id is "alice" and item lists are rotated per user, so tests can tell
+accounts apart. Such a user also gets a saved tracks/albums library of their own,
+which PUT/DELETE /v1/me/{tracks,albums} really change (new saves are newest). An
+access token "stub-expired" is refused with 401, as Spotify does for an expired one.
+
+Fault injection: each Web API call waits latency_ms (+ up to jitter_ms), then fails
+with a 500/503 with probability error_rate, or a 429 carrying Retry-After:
+retry_after with probability rate_429. The token endpoint never fails; the LLM
+endpoint only takes error_rate.
+"""
+import argparse, hashlib, json, random, re, ssl, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+try:
+    from bench import payloads
+except ImportError:  # run as a script from bench/
+    import payloads
+
+
+class StubState:
+    def __init__(self, latency_ms: float = 0.0, llm_token_ms: float = 0.0, llm_candidates: int = 10, *,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0, rate_429: float = 0.0, retry_after: int = 1,
+                 seed: int = 7):
+        self.latency_ms = latency_ms
+        self.llm_token_ms = llm_token_ms
+        self.llm_candidates = llm_candidates
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.connections = 0
+        self.requests = 0
+        self.token_requests = 0
+        self.pages = {}  # (user, kind) -> offsets of the saved-item pages served to that user
+        self.libraries = {}  # (user, kind) -> that user's saved items, newest first
+        self.injected = {"errors": 0, "429": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def reset(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+            self.injected = {"errors": 0, "429": 0}
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return (self.latency_ms + jitter) / 1000.0
+
+    def fault(self, allow_429: bool = True):
+        """None, or the (status, headers) of an injected failure."""
+        with self._lock:
+            roll = self._rng.random()
+            if roll < self.error_rate:
+                self.injected["errors"] += 1
+                return self._rng.choice((500, 503)), {}
+            if allow_429 and roll < self.error_rate + self.rate_429:
+                self.injected["429"] += 1
+                return 429, {"Retry-After": str(self.retry_after)}
+        return None
+
+
+def _llm_content(prompt: str, n: int) -> str:
+    tag = hashlib.sha1(prompt.encode()).hexdigest()[:6]
+    return json.dumps({"candidates": [{"artist": f"Artist {tag} {i}", "track": f"Track {i}"} for i in range(n)]})
+
+
+def _search_result(query: str) -> dict:
+    tid = hashlib.sha1(query.encode()).hexdigest()[:22]
+    track = {
+        "id": tid, "uri": f"spotify:track:{tid}", "name": query[:40],
+        "artists": [{"id": "a" + tid[:21], "name": "Stub Artist"}], "album": {"images": []},
+    }
+    return {"tracks": {"items": [track], "total": 1}, "artists": {"items": [], "total": 0}}
+
+
+class _Catalog:
+    """Fixed, seeded bodies for every GET route; large ones are encoded once and reused."""
+
+    def __init__(self, seed: int = 7, saved_tracks: int = 200, saved_albums: int = 60):
+        rng = random.Random(seed)
+        base = payloads.synthetic(seed)
+        self.base = base
+        self.playlists = [payloads._playlist(rng) for _ in range(base["my_playlists"]["total"])]
+        self.playlist = {**self.playlists[0], "followers": {"href": None, "total": 12}, "tracks": base["playlist_tracks"]}
+        # Saved items newest first, one second apart, so delta syncs have something to stop on
+        self.saved = {
+            "tracks": [{"added_at": self._stamp(i), "track": payloads._track(rng)} for i in range(saved_tracks)],
+            "albums": [{"added_at": self._stamp(i), "album": payloads._album(rng)} for i in range(saved_albums)],
+        }
+        self.devices = {"devices": [{
+            "id": "stub-device", "is_active": True, "is_private_session": False, "is_restricted": False,
+            "name": "Stub Speaker", "type": "Computer", "volume_percent": 60, "supports_volume": True,
+        }]}
+        track = base["top_tracks"]["items"][0]
+        self.playback = {
+            "device": self.devices["devices"][0], "repeat_state": "off", "shuffle_state": False,
+            "context": None, "timestamp": 0, "progress_ms": 1000, "is_playing": True,
+            "item": track, "currently_playing_type": "track", "actions": {"disallows": {}},
+        }
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(i: int) -> str:
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_700_000_000 - i))
+
+    def encoded(self, key, build) -> bytes:
+        raw = self._encoded.get(key)
+        if raw is None:
+            raw = json.dumps(build()).encode()
+            with self._lock:
+                self._encoded[key] = raw
+        return raw
+
+    @staticmethod
+    def page(items: list, limit: int, offset: int, href: str) -> dict:
+        chunk = items[offset:offset + limit]
+        nxt = f"{href}?offset={offset + limit}&limit={limit}" if offset + limit < len(items) else None
+        return {"href": href, "items": chunk, "limit": limit, "next": nxt, "offset": offset,
+                "previous": None, "total": len(items)}
+
+    def search(self, types: str, limit: int) -> dict:
+        out = {}
+        for t in types.split(","):
+            bucket = self.base["search"].get(t.strip() + "s")
+            if bucket:
+                out[t.strip() + "s"] = {**bucket, "items": bucket["items"][:limit], "limit": limit}
+        return out
+
+
+_SAVED_PATH = re.compile(r"/v1/me/(tracks|albums)$")
+
+
+def _make_handler(state: StubState, catalog: _Catalog):
+    routes = []
+
+    def route(methods, pattern):
+        def register(fn):
+            routes.append((methods.split("|"), re.compile(pattern + r"$"), fn))
+            return fn
+        return register
+
+    def ints(qs, name, default):
+        try:
+            return int(qs.get(name, [default])[0])
+        except ValueError:
+            return default
+
+    @route("GET", r"/v1/me")
+    def _me(method, qs, m, body):
+        return 200, {"id": "stub-user", "display_name": "Stub User", "country": "SE", "product": "premium",
+                     "images": [], "followers": {"href": None, "total": 3}}
+
+    @route("GET", r"/v1/me/top/(tracks|artists)")
+    def _top(method, qs, m, body):
+        key = "top_" + m.group(1)
+        return 200, catalog.encoded((key,), lambda: catalog.base[key])
+
+    @route("GET", r"/v1/me/player/recently-played")
+    def _recent(method, qs, m, body):
+        return 200, catalog.encoded(("recent",), lambda: catalog.base["recently_played"])
+
+    @route("GET", r"/v1/me/player/devices")
+    def _devices(method, qs, m, body):
+        return 200, catalog.devices
+
+    @route("GET", r"/v1/me/player")
+    def _playback(method, qs, m, body):
+        return 200, catalog.encoded(("playback",), lambda: catalog.playback)
+
+    @route("PUT|POST", r"/v1/me/player(/(play|pause|next|previous|queue|seek|shuffle|repeat|volume))?")
+    def _player_command(method, qs, m, body):
+        return 204, None
+
+    @route("GET", r"/v1/search")
+    def _search(method, qs, m, body):
+        limit = ints(qs, "limit", 20)
+        if limit == 1:  # single-candidate lookups (/spotify-tools/resolve): one distinct track per query
+            return 200, _search_result(qs.get("q", [""])[0])
+        types = qs.get("type", ["track"])[0]
+        return 200, catalog.encoded(("search", types, limit), lambda: catalog.search(types, limit))
+
+    @route("GET", r"/v1/me/playlists")
+    def _my_playlists(method, qs, m, body):
+        limit, offset = ints(qs, "limit", 20), ints(qs, "offset", 0)
+        return 200, catalog.encoded(("playlists", limit, offset),
+                                    lambda: catalog.page(catalog.playlists, limit, offset, "/v1/me/playlists"))
+
+    @route("GET", r"/v1/me/(tracks|albums)")
+    def _saved(method, qs, m, body):
+        kind, limit, offset = m.group(1), ints(qs, "limit", 20), ints(qs, "offset", 0)
+        return 200, catalog.encoded(("saved", kind, limit, offset),
+                                    lambda: catalog.page(catalog.saved[kind], limit, offset, f"/v1/me/{kind}"))
+
+    @route("PUT|DELETE", r"/v1/me/(tracks|albums)")
+    def _saved_mutation(method, qs, m, body):
+        return 200, None
+
+    @route("GET", r"/v1/playlists/([^/]+)")
+    def _playlist(method, qs, m, body):
+        return 200, catalog.encoded(("playlist",), lambda: {**catalog.playlist, "id": "stub-playlist"})
+
+    @route("GET", r"/v1/playlists/([^/]+)/tracks")
+    def _playlist_tracks(method, qs, m, body):
+        limit, offset = ints(qs, "limit", 100), ints(qs, "offset", 0)
+        items = catalog.base["playlist_tracks"]["items"]
+        total = catalog.base["playlist_tracks"]["total"]
+        # Every page repeats the same tracks; only paging metadata changes
+        return 200, catalog.encoded(("playlist_tracks", limit, offset), lambda: {
+            **catalog.page(items * (total // len(items) + 1), limit, offset, "/v1/playlists/x/tracks"), "total": total})
+
+    @route("POST|DELETE", r"/v1/playlists/([^/]+)/tracks")
+    def _playlist_mutation(method, qs, m, body):
+        return (201 if method == "POST" else 200), {"snapshot_id": hashlib.sha1(repr(body).encode()).hexdigest()}
+
+    @route("POST", r"/v1/users/([^/]+)/playlists")
+    def _create_playlist(method, qs, m, body):
+        return 201, {**catalog.playlists[0], "name": (body or {}).get("name", "New"), "tracks": {"total": 0}}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def setup(self):
+            super().setup()
+            state.count_connection()
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body=None, headers=None):
+            raw = body if isinstance(body, bytes) else (b"" if body is None else json.dumps(body).encode())
+            self.send_response(status)
+            if raw:
+                self.send_header("Content-Type", "application/json")
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            if raw:
+                self.wfile.write(raw)
+
+        def _fail(self, fault):
+            status, headers = fault
+            message = "API rate limit exceeded" if status == 429 else "Injected failure"
+            return self._send(status, {"error": {"status": status, "message": message}}, headers)
+
+        def _chat_completion(self, body: dict):
+            prompt = next((m["content"] for m in reversed(body.get("messages") or []) if m.get("role") == "user"), "")
+            content = _llm_content(prompt, state.llm_candidates)
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+            if not body.get("stream"):
+                time.sleep(state.llm_token_ms * len(pieces) / 1000.0)
+                return self._send(200, {
+                    "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(pieces), "total_tokens": len(pieces)},
+                })
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for piece in pieces + [None]:
+                time.sleep(state.llm_token_ms / 1000.0)
+                delta = {"content": piece} if piece is not None else {}
+                chunk = {
+                    "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": "stub",
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None if piece is not None else "stop"}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def _handle(self):
+            state.count_request()
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            path, _, query = self.path.partition("?")
+            if path == "/api/token":
+                return self._send(200, _token_response(state, parse_qs(raw.decode())))
+            if path == "/v1/chat/completions":
+                fault = state.fault(allow_429=False)
+                if fault:
+                    return self._fail(fault)
+                return self._chat_completion(json.loads(raw or b"{}"))
+            delay = state.delay()
+            if delay:
+                time.sleep(delay)
+            fault = state.fault()
+            if fault:
+                return self._fail(fault)
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                body = None
+            qs = parse_qs(query)
+            if self.headers.get("Authorization") == "Bearer stub-expired":
+                return self._send(401, {"error": {"status": 401, "message": "The access token expired"}})
+            user = _token_user(self.headers.get("Authorization", ""))
+            saved = _SAVED_PATH.match(path)
+            if user and saved and self.command in ("GET", "PUT", "DELETE"):
+                return self._send(*_user_library(state, catalog, user, self.command, saved.group(1), qs, body))
+            for methods, pattern, fn in routes:
+                m = pattern.match(path)
+                if m and self.command in methods:
+                    status, payload = fn(self.command, qs, m, body)
+                    if user and path.startswith("/v1/me") and status == 200:
+                        payload = _personalize(path, payload, user)
+                    return self._send(status, payload)
+            return self._send(404, {"error": {"status": 404, "message": "Service not found"}})
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    return Handler
+
+
+def _token_response(state: StubState, form: dict) -> dict:
+    with state._lock:
+        state.token_requests += 1
+        n = state.token_requests
+    if form.get("grant_type", [""])[0] == "refresh_token":
+        user = _token_user("Bearer " + form.get("refresh_token", [""])[0].replace("stub-refresh", "stub-access", 1))
+    else:
+        user = form.get("code", [""])[0] or None
+    return {
+        "access_token": f"stub-access:{user}:{n}" if user else "stub-access",
+        "refresh_token": f"stub-refresh:{user}" if user else "stub-refresh",
+        "token_type": "Bearer", "expires_in": 3600, "scope": "",
+    }
+
+
+def _user_library(state: StubState, catalog: _Catalog, user: str, method: str, kind: str, qs: dict, body):
+    entity = kind[:-1]
+    with state._lock:
+        items = state.libraries.setdefault((user, kind), list(catalog.saved[kind]))
+        if method == "GET":
+            limit, offset = int(qs.get("limit", ["20"])[0]), int(qs.get("offset", ["0"])[0])
+            state.pages.setdefault((user, kind), []).append(offset)
+            return 200, catalog.page(items, limit, offset, f"/v1/me/{kind}")
+        ids = (body or {}).get("ids") or qs.get("ids", [""])[0].split(",")
+        items[:] = [it for it in items if it[entity]["id"] not in ids]
+        if method == "PUT":
+            stamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            items[:0] = [{"added_at": stamp, entity: {"id": i, "uri": f"spotify:{entity}:{i}", "name": i}} for i in ids]
+    return 200, None
+
+
+def _token_user(authorization: str):
+    parts = authorization.partition(" ")[2].split(":")
+    return parts[1] if len(parts) > 1 and parts[0] == "stub-access" and parts[1] else None
+
+
+def _personalize(path: str, payload, user: str):
+    data = json.loads(payload) if isinstance(payload, bytes) else payload
+    if path == "/v1/me":
+        return {**data, "id": user, "display_name": user.title()}
+    if isinstance(data, dict) and isinstance(data.get("items"), list) and data["items"]:
+        k = int(hashlib.md5(user.encode()).hexdigest(), 16) % len(data["items"])
+        data = {**data, "items": data["items"][k:] + data["items"][:k]}
+    return data
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default backlog of 5 drops connections under concurrent load
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, *, latency_ms: float = 0.0, tls_cert=None, tls_key=None,
+          llm_token_ms: float = 0.0, llm_candidates: int = 10, jitter_ms: float = 0.0,
+          error_rate: float = 0.0, rate_429: float = 0.0, retry_after: int = 1, seed: int = 7):
+    """Start the stub in a daemon thread. Returns (server, state, base_url)."""
+    state = StubState(latency_ms, llm_token_ms, llm_candidates, jitter_ms=jitter_ms,
+                      error_rate=error_rate, rate_429=rate_429, retry_after=retry_after, seed=seed)
+    server = _Server((host, port), _make_handler(state, _Catalog(seed)))
+    scheme = "http"
+    if tls_cert:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(tls_cert, tls_key)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"{scheme}://{host}:{server.server_address[1]}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="extra random latency, 0..jitter")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered 500/503")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="fraction of Web API calls answered 429")
+    ap.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on injected 429s")
+    ap.add_argument("--llm-token-ms", type=float, default=15.0, help="delay between fake LLM stream chunks")
+    ap.add_argument("--llm-candidates", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--tls-cert")
+    ap.add_argument("--tls-key")
+    args = ap.parse_args()
+    server, _, base = serve(
+        args.host, args.port, latency_ms=args.latency_ms, tls_cert=args.tls_cert, tls_key=args.tls_key,
+        llm_token_ms=args.llm_token_ms, llm_candidates=args.llm_candidates, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, rate_429=args.rate_429, retry_after=args.retry_after, seed=args.seed,
+    )
+    print(f"stub listening on {base}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
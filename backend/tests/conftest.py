@@ -0,0 +1,49 @@
+import os, sys, time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app  # noqa: E402
+from app.services import client, llm  # noqa: E402
+from bench.stub_server import serve  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def stub():
+    server, state, base = serve()
+    yield state, base
+    server.shutdown()
+
+
+@pytest.fixture
+def app(stub, tmp_path):
+    return make_app(stub[1], tmp_path)
+
+
+def make_app(base: str, tmp_path):
+    """create_app() pointed at the stub, with every on-disk store under tmp_path."""
+    app = create_app()
+    app.config.update(
+        TESTING=True,
+        SPOTIFY_API_BASE=f"{base}/v1", SPOTIFY_ACCOUNTS_BASE=base, OPENAI_BASE_URL=f"{base}/v1",
+        SPOTIFY_CLIENT_ID="stub", SPOTIFY_CLIENT_SECRET="stub", OPENAI_API_KEY="stub",
+        REDIRECT_URI="http://localhost/auth/callback", FRONTEND_ORIGIN="", SPOTIFY_RATE_LIMIT=0,
+        RESOLVE_INDEX_PATH=str(tmp_path / "resolve.sqlite3"), PROMPT_CACHE_PATH=str(tmp_path / "prompts.sqlite3"),
+        LIBRARY_MIRROR_PATH=str(tmp_path / "mirror.sqlite3"), PROFILE_DIR=str(tmp_path / "profiles"),
+    )
+    client.init_app(app)
+    llm.init_app(app)
+    return app
+
+
+def login(c, user: str):
+    """Go through /auth/callback as `user`; the stub mints tokens that answer /v1/me as that user."""
+    with c.session_transaction() as s:
+        s["oauth_state"] = "state"
+    r = c.get(f"/auth/callback?state=state&code={user}")
+    assert r.status_code == 200, r.data
+
+
+def set_token(c, **token):
+    with c.session_transaction() as s:
+        s["token"] = {"access_token": "stub-access", "refresh_token": "stub-refresh",
+                      "expires_at": int(time.time()) + 3600, **token}
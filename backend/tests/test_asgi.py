@@ -0,0 +1,77 @@
+import asyncio, time
+import httpx
+from app.asgi import create_asgi_app
+from app.routes import spotify_api
+from app.services import spotify_async
+
+
+def _cookie(app, **token) -> str:
+    c = app.test_client()
+    with c.session_transaction() as s:
+        s["token"] = {"access_token": "stub-access", "refresh_token": "stub-refresh",
+                      "expires_at": int(time.time()) + 3600, **token}
+    return c.get_cookie("session").value
+
+
+def _session(app, cookie: str) -> dict:
+    c = app.test_client()
+    c.set_cookie("session", cookie)
+    with c.session_transaction() as s:
+        return dict(s)
+
+
+def _requests(app, cookie, *calls):
+    """Run (method, path) calls concurrently against the ASGI app; returns responses and the final cookie."""
+    async def main():
+        transport = httpx.ASGITransport(app=create_asgi_app(app))
+        cookies = {"session": cookie} if cookie else {}
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", cookies=cookies) as http:
+            out = await asyncio.gather(*(http.request(method, path) for method, path in calls))
+            jar = http.cookies.get("session", domain="test.local")  # the one the app set
+        with app.app_context():
+            await spotify_async.close_async_client()
+        return out, jar
+    return asyncio.run(main())
+
+
+def test_async_routes_answer_on_the_event_loop(app, monkeypatch):
+    def sync_view_called(*a, **kw):
+        raise AssertionError("served by the WSGI view")
+    monkeypatch.setattr(spotify_api, "get_recently_played", sync_view_called)
+    monkeypatch.setattr(spotify_api, "get_devices", sync_view_called)
+
+    (recent, devices, search), _ = _requests(
+        app, _cookie(app),
+        ("GET", "/api/me/recently-played?limit=5"), ("GET", "/api/player/devices"), ("GET", "/api/search?q=bonobo"),
+    )
+    assert recent.status_code == 200 and recent.json()["items"]
+    assert devices.status_code == 200 and "devices" in devices.json()
+    assert search.status_code == 200
+    assert recent.headers["content-type"].startswith("application/json")
+
+
+def test_async_route_refreshes_an_expired_token_into_the_session_cookie(app, stub):
+    state, _ = stub
+    before = state.token_requests
+    cookie = _cookie(app, access_token="stub-access:asgi:0", refresh_token="stub-refresh:asgi", expires_at=int(time.time()) - 5)
+
+    (r,), jar = _requests(app, cookie, ("GET", "/api/player/devices"))
+    assert r.status_code == 200
+    assert state.token_requests - before == 1
+    assert _session(app, jar)["token"]["access_token"] != "stub-access:asgi:0"
+
+
+def test_async_route_without_a_session_is_unauthorized(app):
+    (r,), _ = _requests(app, None, ("GET", "/api/me/recently-played"))
+    assert r.status_code == 401
+    assert r.json() == {"error": "unauthorized"}
+
+
+def test_everything_else_runs_on_the_wsgi_app(app):
+    (me, missing, health, bad), _ = _requests(
+        app, _cookie(app), ("GET", "/api/me"), ("GET", "/api/nope"), ("GET", "/healthz"), ("POST", "/api/player/devices"),
+    )
+    assert me.status_code == 200 and me.json()["id"]
+    assert missing.status_code == 404
+    assert health.status_code == 200
+    assert bad.status_code == 405
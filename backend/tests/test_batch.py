@@ -0,0 +1,21 @@
+from conftest import set_token
+from app.routes import spotify_api
+from app.services.spotify import RateLimited
+
+
+def test_sub_requests_go_through_the_blueprint_errorhandlers(app, monkeypatch):
+    def limited(*a, **kw):
+        raise RateLimited(3.0)
+    monkeypatch.setattr(spotify_api, "get_recently_played", limited)
+    with app.test_client() as c:
+        set_token(c)
+        r = c.post("/api/batch", json={"requests": [
+            {"path": "/me"},
+            {"path": "/me/recently-played"},
+            {"path": "/no/such/route"},
+        ]})
+    assert r.status_code == 200
+    me, limited_, missing = r.get_json()["responses"]
+    assert me["status"] == 200 and me["body"]["id"]
+    assert limited_ == {"status": 429, "body": {"error": {"status": 429, "message": "rate_limited", "retry_after": 3.0}}}
+    assert missing["status"] == 404
@@ -0,0 +1,63 @@
+import logging, threading, time
+from app.utils.cache import StaleWhileRevalidate
+
+
+class _Upstream:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self):
+        self.gate.wait(5)
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return 200, {"v": self.calls}
+
+
+def _settled(swr: StaleWhileRevalidate):
+    deadline = time.monotonic() + 5
+    while swr.stats()["refreshing"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_fresh_entries_are_hits_and_stale_ones_refresh_once_in_the_background():
+    swr, up = StaleWhileRevalidate(soft_ttl=0.05, ttl=60), _Upstream()
+    assert swr.get("k", up) == (200, {"v": 1}, "miss")
+    assert swr.get("k", up) == (200, {"v": 1}, "hit")
+
+    time.sleep(0.06)
+    up.gate.clear()  # hold the refresh so every read sees it in flight
+    assert [swr.get("k", up) for _ in range(3)] == [(200, {"v": 1}, "stale")] * 3
+    up.gate.set()
+    _settled(swr)
+    assert up.calls == 2
+    assert swr.get("k", up) == (200, {"v": 2}, "hit")
+
+
+def test_a_failed_refresh_keeps_serving_the_stale_copy_and_is_logged(caplog):
+    swr, up = StaleWhileRevalidate(soft_ttl=0.05, ttl=60, logger=logging.getLogger("swr-test")), _Upstream()
+    swr.get("k", up)
+    time.sleep(0.06)
+    up.fail = True
+    with caplog.at_level(logging.WARNING, logger="swr-test"):
+        assert swr.get("k", up) == (200, {"v": 1}, "stale")
+        _settled(swr)
+    assert "background refresh failed for 'k'" in caplog.text
+
+    assert swr.get("k", up) == (200, {"v": 1}, "stale")  # still there; this read retries
+    _settled(swr)
+    up.fail = False
+    swr.get("k", up)
+    _settled(swr)
+    assert swr.get("k", up) == (200, {"v": 4}, "hit")
+
+
+def test_only_200s_are_kept_and_hard_expired_entries_are_fetched_inline():
+    swr = StaleWhileRevalidate(soft_ttl=0.01, ttl=0.05)
+    assert swr.get("k", lambda: (503, {"error": "x"})) == (503, {"error": "x"}, "miss")
+    assert swr.get("k", lambda: (200, {"v": 1})) == (200, {"v": 1}, "miss")
+    time.sleep(0.06)
+    assert swr.get("k", lambda: (200, {"v": 2})) == (200, {"v": 2}, "miss")
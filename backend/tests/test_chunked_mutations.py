@@ -0,0 +1,43 @@
+from conftest import set_token
+from app.services import spotify
+from app.services.spotify import _chunk_report, _chunks
+
+OK, FAIL = (200, {}), (502, {"error": {"status": 502, "message": "bad gateway"}})
+
+
+def test_all_chunks_succeeding_is_200():
+    chunks = _chunks(list("abcde"), 2)
+    status, body = _chunk_report(chunks, [OK, (201, {}), OK])
+    assert (status, body["ok"], body["succeeded"], body["failed"]) == (200, True, 5, 0)
+    assert [c["offset"] for c in body["chunks"]] == [0, 2, 4]
+
+
+def test_some_chunks_failing_is_207_with_the_failures_itemised():
+    chunks = _chunks(list("abcde"), 2)
+    status, body = _chunk_report(chunks, [OK, FAIL])  # the last chunk was never sent
+    assert (status, body["ok"], body["succeeded"], body["failed"]) == (207, False, 2, 3)
+    assert body["chunks"][1]["error"] == FAIL[1]["error"]
+    assert body["chunks"][2] == {"index": 2, "offset": 4, "count": 1, "status": None, "skipped": True}
+
+
+def test_nothing_succeeding_reports_the_first_failure():
+    status, body = _chunk_report(_chunks(list("abc"), 2), [(429, {"error": "slow down"}), FAIL])
+    assert status == 429 and body["succeeded"] == 0
+
+
+def test_library_route_reports_a_partial_save_as_207(app, monkeypatch):
+    request = spotify._request
+
+    def flaky(session, method, path, *, params=None, **kw):
+        if method == "PUT" and "t60" in (params or {}).get("ids", "").split(","):
+            return FAIL
+        return request(session, method, path, params=params, **kw)
+    monkeypatch.setattr(spotify, "_request", flaky)
+    ids = [f"t{i}" for i in range(120)]  # chunks of 50: 0-49, 50-99 (fails), 100-119
+    with app.test_client() as c:
+        set_token(c)
+        r = c.put("/api/me/library/tracks", json={"ids": ids})
+    body = r.get_json()
+    assert r.status_code == 207
+    assert (body["succeeded"], body["failed"]) == (70, 50)
+    assert [ch["status"] for ch in body["chunks"]] == [200, 502, 200]
@@ -0,0 +1,93 @@
+from flask import session
+from conftest import login
+from app.routes.spotify_api import playback_hub
+from app.services.library_mirror import library_mirror
+from app.utils.tokens import current_user_id, validated_user_id
+
+
+def _me_id(app, c):
+    with c.session_transaction() as s:
+        sess = dict(s)
+    with app.test_request_context():
+        session.update(sess)
+        return current_user_id(session)
+
+
+def test_relogin_as_another_user_forgets_the_previous_id(app):
+    with app.test_client() as c:
+        login(c, "alice")
+        c.get("/api/me/library/tracks?limit=5")  # remembers alice's id in the session
+        with c.session_transaction() as s:
+            assert s["user_id"] == "alice"
+        login(c, "bob")  # no logout in between
+        with c.session_transaction() as s:
+            assert "user_id" not in s
+        assert _me_id(app, c) == "bob"
+
+
+def test_stale_user_id_is_not_trusted_for_a_new_grant(app):
+    with app.test_request_context():
+        session["token"] = {"access_token": "stub-access:bob:1", "refresh_token": "stub-refresh:bob"}
+        session["user_id"] = "alice"  # e.g. a cookie written before the grant check existed
+        assert validated_user_id(session) is None
+        assert current_user_id(session) == "bob"
+        # Refreshing the access token keeps the grant, and with it the id
+        session["token"] = {**session["token"], "access_token": "stub-access:bob:2"}
+        assert validated_user_id(session) == "bob"
+
+
+def test_library_mirror_follows_the_logged_in_account(app):
+    with app.test_client() as c:
+        login(c, "alice")
+        assert c.get("/api/me/library/tracks?limit=5").status_code == 200
+        login(c, "bob")
+        assert c.get("/api/me/library/tracks?limit=5").status_code == 200
+    with app.app_context():
+        mirror = library_mirror()
+        assert mirror.synced_at("alice", "tracks") is not None
+        assert mirror.synced_at("bob", "tracks") is not None
+
+
+def test_playback_channel_is_dropped_with_its_last_subscriber(app):
+    with app.test_request_context():
+        session["token"] = {"access_token": "stub-access", "refresh_token": "stub-refresh", "expires_at": 2**31}
+        hub = playback_hub()
+        q1 = hub.subscribe(session, "u1")
+        q2 = hub.subscribe(session, "u1")
+        hub.unsubscribe("u1", q1)
+        assert "u1" in hub._channels
+        hub.unsubscribe("u1", q2)
+        assert "u1" not in hub._channels
+        hub.unsubscribe("u1", q2)  # late double-unsubscribe is harmless
+
+
+
+def test_me_and_top_caches_follow_the_logged_in_account(app):
+    with app.test_client() as c:
+        login(c, "alice")
+        assert c.get("/api/me").get_json()["id"] == "alice"
+        alice_top = c.get("/api/me/top-tracks?limit=10").get_json()
+        login(c, "bob")
+        assert c.get("/api/me").get_json()["id"] == "bob"
+        bob_top = c.get("/api/me/top-tracks?limit=10").get_json()
+        assert bob_top != alice_top
+
+
+def test_cached_me_is_not_served_to_a_session_with_an_unconfirmed_id(app):
+    with app.test_client() as c:
+        login(c, "alice")
+        assert c.get("/api/me").get_json()["id"] == "alice"
+        login(c, "bob")
+        with c.session_transaction() as s:
+            s["user_id"] = "alice"  # forged or left over, without a matching grant
+        assert c.get("/api/me").get_json()["id"] == "bob"
+
+
+def test_read_ahead_pages_are_not_served_to_the_next_account(app):
+    with app.test_client() as c:
+        login(c, "alice")
+        assert c.get("/api/playlists/p1/tracks?limit=20&offset=0").headers["X-Read-Ahead"] == "miss"
+        login(c, "bob")
+        assert c.get("/api/playlists/p1/tracks?limit=20&offset=20").headers["X-Read-Ahead"] == "miss"
+        # bob's own read-ahead still works
+        assert c.get("/api/playlists/p1/tracks?limit=20&offset=40").headers["X-Read-Ahead"] == "hit"
@@ -0,0 +1,15 @@
+from conftest import login
+from app.services.library_mirror import library_mirror
+
+
+def test_add_to_playlist_tool_drops_read_ahead_and_marks_the_mirror_stale(app):
+    with app.test_client() as c:
+        login(c, "alice")
+        assert c.get("/api/me/playlists?limit=5").status_code == 200
+        assert c.get("/api/playlists/p1/tracks?limit=20&offset=0").headers["X-Read-Ahead"] == "miss"
+        r = c.post("/spotify-tools/add-to-playlist", json={"playlist_id": "p1", "track_uris": ["spotify:track:x"]})
+        assert r.status_code < 300
+        # The prefetched next page may predate the add and is not served
+        assert c.get("/api/playlists/p1/tracks?limit=20&offset=20").headers["X-Read-Ahead"] == "miss"
+    with app.app_context():
+        assert library_mirror().synced_at("alice", "playlists") == 0
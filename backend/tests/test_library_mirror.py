@@ -0,0 +1,82 @@
+import time
+from types import SimpleNamespace
+import requests
+from conftest import login
+from app.services import library_mirror as library_mirror_module
+from app.services.library_mirror import LibraryMirror, library_mirror
+
+
+def _ids(c, **params):
+    r = c.get("/api/me/library/tracks", query_string={"limit": 50, **params})
+    assert r.status_code == 200
+    body = r.get_json()
+    return [it["track"]["id"] for it in body["items"]], body["total"]
+
+
+def test_first_read_syncs_everything_later_reads_fetch_only_whats_new(app, stub):
+    state, _ = stub
+    with app.test_client() as c:
+        login(c, "mirror-delta")
+        ids, total = _ids(c)
+        full = state.pages.pop(("mirror-delta", "tracks"))
+        assert total == 200 and sorted(full) == [0, 50, 100, 150]
+
+        assert c.put("/api/me/library/tracks", json={"ids": ["new1", "new2"]}).status_code == 200
+        after, total = _ids(c)
+        # The save marked the mirror stale; the re-sync stopped at the first known item
+        assert state.pages.pop(("mirror-delta", "tracks")) == [0]
+        assert total == 202 and set(after[:2]) == {"new1", "new2"} and after[2:] == ids[:48]
+
+        assert _ids(c) == (after, 202)
+        assert ("mirror-delta", "tracks") not in state.pages  # fresh enough: served locally
+
+
+def test_removals_made_elsewhere_are_caught_by_the_count_check(app, stub):
+    state, base = stub
+    with app.test_client() as c:
+        login(c, "mirror-removal")
+        ids, _ = _ids(c)
+        # Unsaved in another Spotify client: the mirror can't see it in added_at order
+        r = requests.delete(f"{base}/v1/me/tracks", params={"ids": ids[10]},
+                            headers={"Authorization": "Bearer stub-access:mirror-removal:0"})
+        assert r.status_code == 200
+        after, total = _ids(c, refresh="true")
+    assert total == 199 and ids[10] not in after and after[:10] == ids[:10]
+
+
+def test_logout_drops_the_users_mirror(app, stub):
+    state, _ = stub
+    with app.test_client() as c:
+        login(c, "mirror-logout")
+        _ids(c)
+        state.pages.pop(("mirror-logout", "tracks"))
+        with app.app_context():
+            assert library_mirror().synced_at("mirror-logout", "tracks") is not None
+        assert c.post("/auth/logout").status_code == 200
+        with app.app_context():
+            mirror = library_mirror()
+            assert mirror.synced_at("mirror-logout", "tracks") is None
+            assert mirror.count("mirror-logout", "tracks") == 0
+
+        login(c, "mirror-logout")
+        _, total = _ids(c)
+        assert total == 200 and len(state.pages.pop(("mirror-logout", "tracks"))) == 4  # full sync again
+
+
+def test_users_not_synced_within_the_retention_are_purged(tmp_path, monkeypatch):
+    clock = SimpleNamespace(now=time.time())
+    monkeypatch.setattr(library_mirror_module, "time", SimpleNamespace(time=lambda: clock.now))
+    path = str(tmp_path / "mirror.sqlite3")
+    mirror = LibraryMirror(path, retention=100, purge_every=2)
+    row = ("t1", "2024-01-01T00:00:00Z", None, {"track": {"id": "t1"}})
+    mirror.add("idle", "tracks", [row])
+    clock.now += 500
+    mirror.add("active", "tracks", [row])  # the second sync purges
+    assert mirror.synced_at("idle", "tracks") is None and mirror.count("idle", "tracks") == 0
+    assert mirror.count("active", "tracks") == 1
+    mirror.close()
+
+    clock.now += 500
+    reopened = LibraryMirror(path, retention=100)
+    assert reopened.count("active", "tracks") == 0  # purged on open
+    reopened.close()
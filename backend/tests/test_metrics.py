@@ -0,0 +1,21 @@
+from conftest import make_app, set_token
+from app.config import Config
+
+
+def test_metrics_are_off_by_default(app):
+    with app.test_client() as c:
+        assert c.get("/metrics").status_code == 404
+
+
+def test_metrics_token_guards_the_endpoint(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_ENABLED", True)
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "scrape")
+    app = make_app(stub[1], tmp_path)
+    with app.test_client() as c:
+        set_token(c)
+        assert c.get("/api/me").status_code == 200
+        assert c.get("/metrics").status_code == 404
+        assert c.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 404
+        r = c.get("/metrics", headers={"Authorization": "Bearer scrape"})
+        assert r.status_code == 200 and r.mimetype == "text/plain"
+        assert 'route="/api/me"' in r.get_data(as_text=True)
@@ -0,0 +1,10 @@
+from flask import session
+from app.services.spotify import get_current_playback
+
+
+def test_current_playback_refreshes_an_expired_token(app):
+    with app.test_request_context():
+        session["token"] = {"access_token": "stub-expired", "refresh_token": "stub-refresh:alice", "expires_at": 2**31}
+        status, data = get_current_playback(session)
+        assert status == 200 and data
+        assert session["token"]["access_token"].startswith("stub-access:alice:")
@@ -0,0 +1,42 @@
+import cProfile
+import pytest
+from conftest import make_app, set_token
+from app.config import Config
+from app.utils import profiling
+
+
+@pytest.fixture
+def app(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "PROFILE_ENABLED", True)
+    monkeypatch.setattr(Config, "PROFILE_TOKEN", "secret")
+    return make_app(stub[1], tmp_path)
+
+
+def test_header_triggered_request_is_profiled(app):
+    with app.test_client() as c:
+        set_token(c)
+        r = c.get("/api/me", headers={"X-Profile": "secret"})
+        assert r.status_code == 200 and r.headers.get("X-Profile-Id")
+    assert not profiling._ACTIVE.locked()
+
+
+def test_only_one_request_is_profiled_at_a_time(app):
+    with app.test_client() as c:
+        set_token(c)
+        assert profiling._ACTIVE.acquire(blocking=False)  # a profile in flight elsewhere
+        try:
+            r = c.get("/api/me", headers={"X-Profile": "secret"})
+        finally:
+            profiling._ACTIVE.release()
+        assert r.status_code == 200 and "X-Profile-Id" not in r.headers
+
+
+def test_profiler_conflict_never_fails_the_request(app, monkeypatch):
+    def busy(self):
+        raise ValueError("Another profiling tool is already active")
+    monkeypatch.setattr(cProfile.Profile, "enable", busy)
+    with app.test_client() as c:
+        set_token(c)
+        r = c.get("/api/me", headers={"X-Profile": "secret"})
+        assert r.status_code == 200 and "X-Profile-Id" not in r.headers
+    assert not profiling._ACTIVE.locked()
@@ -0,0 +1,116 @@
+import threading, time
+import requests
+from conftest import make_app, set_token
+from app.services import spotify
+from app.services.rate_limit import BULK, INTERACTIVE, NORMAL, UpstreamScheduler
+from bench.stub_server import serve
+
+
+def _drained(rate: float) -> UpstreamScheduler:
+    s = UpstreamScheduler(rate=rate, burst=1, max_wait=5)
+    assert s.acquire("app")  # the burst token; everyone after this waits for a refill
+    return s
+
+
+def _waiters(s: UpstreamScheduler) -> list:
+    return s._buckets["app"].waiters
+
+
+def test_interactive_waiters_are_served_before_bulk():
+    s, served = _drained(rate=10), []
+
+    def take(label, priority):
+        assert s.acquire("app", priority)
+        served.append(label)
+
+    threads = [threading.Thread(target=take, args=(f"bulk{i}", BULK)) for i in range(3)]
+    threads.append(threading.Thread(target=take, args=("normal", NORMAL)))
+    threads.append(threading.Thread(target=take, args=("interactive", INTERACTIVE)))
+    for t in threads:
+        t.start()
+        time.sleep(0.01)  # queue in this order, well inside the first 100ms refill
+    for t in threads:
+        t.join(5)
+    assert served == ["interactive", "normal", "bulk0", "bulk1", "bulk2"]
+    assert _waiters(s) == []
+
+
+def test_retry_after_blocks_every_priority_class():
+    s = UpstreamScheduler(rate=0, max_wait=5)
+    s.penalize("app", 0.3)
+    assert 0 < s.blocked_for("app") <= 0.3
+
+    t0 = time.monotonic()
+    assert not s.acquire("app", INTERACTIVE, timeout=0.1)  # the backoff outlasts the deadline: give up at once
+    assert time.monotonic() - t0 < 0.05
+
+    for priority in (INTERACTIVE, NORMAL, BULK):
+        assert s.acquire("app", priority)
+        assert time.monotonic() - t0 >= 0.3
+    assert s.blocked_for("app") == 0
+    assert s.acquire("other-app", BULK, timeout=0)  # per client_id
+
+
+def test_timed_out_and_cancelled_waiters_leave_the_queue():
+    s = _drained(rate=2)
+    assert not s.acquire("app", BULK, timeout=0.05)
+    assert _waiters(s) == []
+
+    stop = threading.Event()
+    result = []
+    head = threading.Thread(target=lambda: result.append(s.acquire("app", INTERACTIVE, cancelled=stop.is_set)))
+    head.start()
+    time.sleep(0.05)
+    assert len(_waiters(s)) == 1
+    stop.set()
+    head.join(1)
+    assert result == [False]
+    assert _waiters(s) == []
+
+    # the abandoned head does not hold up whoever queued behind it
+    t0 = time.monotonic()
+    assert s.acquire("app", BULK)
+    assert time.monotonic() - t0 < 0.6
+
+
+def _response(status: int, retry_after: str = "0") -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r.headers["Retry-After"] = retry_after
+    r._content = b"{}"
+    return r
+
+
+def test_send_retries_429s_and_backs_off_the_client(app, monkeypatch):
+    app.config["SPOTIFY_429_MAX_RETRIES"] = 2
+    with app.app_context():
+        api, calls = spotify.get_client().api, []
+
+        def flaky(method, path, **kw):
+            calls.append(path)
+            return _response(429, "0.1") if len(calls) <= 2 else api(method, path, **kw)
+        monkeypatch.setattr(spotify.get_client(), "api", flaky)
+
+        t0 = time.monotonic()
+        r = spotify._send("GET", "/me", headers={"Authorization": "Bearer stub-access"})
+        assert r.status_code == 200
+        assert len(calls) == 3
+        assert time.monotonic() - t0 >= 0.2  # each retry waited out its Retry-After
+
+
+def test_persistent_429s_reach_the_client_with_retry_after(tmp_path):
+    server, _, base = serve(rate_429=1.0, retry_after=3)
+    try:
+        app = make_app(base, tmp_path)
+        app.config.update(SPOTIFY_429_MAX_RETRIES=0, SPOTIFY_RATE_MAX_WAIT=1)
+        with app.test_client() as c:
+            set_token(c)
+            r = c.get("/api/me/recently-played")
+            assert r.status_code == 429
+            assert r.headers["Retry-After"] == "3"
+            # the backoff now outlasts the wait budget: the next call fails fast without going upstream
+            t0 = time.monotonic()
+            assert c.get("/api/me/recently-played").status_code == 429
+            assert time.monotonic() - t0 < 0.5
+    finally:
+        server.shutdown()
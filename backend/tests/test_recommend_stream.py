@@ -0,0 +1,61 @@
+import json
+from conftest import set_token
+from app.services.llm import CandidateStreamParser
+
+DOC = json.dumps({"note": "x", "candidates": [
+    {"artist": "Björk", "track": "Joga"},
+    {"artist": "Say \"{hi}\"", "track": "a]b\\"},
+    {"artist": "Boards of Canada", "track": "Roygbiv", "extra": {"nested": [1, {"k": "}"}]}},
+]})
+
+
+def _feed(chunks):
+    parser, out = CandidateStreamParser(), []
+    for chunk in chunks:
+        out.append(parser.feed(chunk))
+    return out
+
+
+def test_parser_yields_each_candidate_as_soon_as_it_is_complete():
+    per_char = _feed(DOC)
+    assert [c for batch in per_char for c in batch] == json.loads(DOC)["candidates"]
+    # The first candidate is out right at its closing brace, long before the document ends
+    first = next(i for i, batch in enumerate(per_char) if batch)
+    assert DOC[first] == "}" and first < DOC.index("Boards")
+
+
+def test_parser_is_indifferent_to_chunk_boundaries():
+    for size in (1, 2, 3, 7, 64, len(DOC)):
+        chunks = [DOC[i:i + size] for i in range(0, len(DOC), size)]
+        assert [c for batch in _feed(chunks) for c in batch] == json.loads(DOC)["candidates"]
+
+
+def test_parser_skips_broken_objects_and_stops_at_the_end_of_the_array():
+    doc = '{"candidates": [{"artist": "A", "track": 1}, {"artist": nope}, {"artist": "B"}], "candidates2": [{"x": 1}]}'
+    assert [c for batch in _feed(doc) for c in batch] == [{"artist": "A", "track": 1}, {"artist": "B"}]
+    assert _feed(['{"text": "no candidates here"}']) == [[]]
+
+
+def test_recommend_stream_emits_candidates_then_resolutions_then_done(app):
+    with app.test_client() as c:
+        set_token(c)
+        r = c.post("/api/ai/recommend/stream", json={"prompt": "calm electronic"})
+        assert r.status_code == 200 and r.mimetype == "text/event-stream"
+        events = []
+        for block in r.get_data(as_text=True).strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            events.append((lines["event"], json.loads(lines["data"])))
+    kinds = [k for k, _ in events]
+    assert kinds[-1] == "done" and "error" not in kinds
+    candidates = [p for k, p in events if k == "candidate"]
+    resolved = [p for k, p in events if k == "resolved"]
+    assert candidates and sorted(p["index"] for p in resolved) == [p["index"] for p in candidates]
+    assert kinds.index("candidate") < kinds.index("resolved")
+
+
+def test_recommend_rejects_a_non_numeric_limit(app):
+    with app.test_client() as c:
+        set_token(c)
+        for limit in ("ten", [5], {"n": 1}):
+            r = c.post("/api/ai/recommend", json={"prompt": "calm electronic", "limit": limit})
+            assert r.status_code == 400 and r.get_json() == {"error": "limit must be int"}
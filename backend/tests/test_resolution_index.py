@@ -0,0 +1,37 @@
+from app.services import resolution_index
+from app.services.resolution_index import ResolutionIndex
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def _rows(index: ResolutionIndex) -> int:
+    return index._db.execute("SELECT COUNT(*) FROM resolutions").fetchone()[0]
+
+
+def test_expired_rows_are_purged_every_n_writes_and_on_open(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resolution_index, "time", clock)
+    path = str(tmp_path / "resolve.sqlite3")
+    index = ResolutionIndex(path, ttl=100, negative_ttl=10, purge_every=3)
+
+    index.put_many({("bonobo", "kerala"): {"uri": "spotify:track:1"}, ("nobody", "nothing"): {}})
+    clock.now += 50  # the "no match" has expired, the hit has not
+    assert index.get_many([("bonobo", "kerala"), ("nobody", "nothing")]) == {("bonobo", "kerala"): {"uri": "spotify:track:1"}}
+    assert _rows(index) == 2  # expired rows are hidden from lookups but still on disk
+
+    index.put_many({("burial", "archangel"): {"uri": "spotify:track:2"}})
+    assert _rows(index) == 3
+    index.put_many({("burial", "near dark"): {"uri": "spotify:track:3"}})  # third write
+    assert _rows(index) == 3
+
+    clock.now += 60  # past the first hit's ttl
+    index.close()
+    reopened = ResolutionIndex(path, ttl=100, negative_ttl=10, purge_every=3)
+    assert _rows(reopened) == 2  # only the entries written 50s later survive
+    reopened.close()
@@ -0,0 +1,55 @@
+import threading, time
+from flask import session
+from conftest import set_token
+from app.services.spotify import token_refresher
+
+
+def _concurrently(n, fn):
+    barrier, out = threading.Barrier(n), [None] * n
+
+    def run(i):
+        barrier.wait()
+        out[i] = fn()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return out
+
+
+def test_expired_sessions_sharing_a_grant_refresh_once(app, stub):
+    state, _ = stub
+    before = state.token_requests
+
+    def request():
+        with app.test_client() as c:
+            set_token(c, access_token="stub-access:sf:0", refresh_token="stub-refresh:sf", expires_at=int(time.time()) - 5)
+            r = c.get("/api/me")
+            with c.session_transaction() as s:
+                return r.status_code, s["token"]["access_token"]
+
+    results = _concurrently(8, request)
+    assert state.token_requests - before == 1
+    assert {status for status, _ in results} == {200}
+    assert len({access for _, access in results}) == 1  # every session got the one new token
+
+
+def test_concurrent_401s_share_one_refresh_and_a_rejected_token_is_not_reused(app, stub):
+    state, _ = stub
+    rejected = {"access_token": "stub-expired", "refresh_token": "stub-refresh:sf401", "expires_at": 2**31}
+
+    def after_401():
+        with app.test_request_context():
+            session["token"] = dict(rejected)
+            return token_refresher().refresh_after_401(session)["access_token"]
+
+    with app.app_context():
+        before = state.token_requests
+        first = _concurrently(6, after_401)
+        assert state.token_requests - before == 1 and len(set(first)) == 1
+        # Spotify rejecting the refreshed token too must not be answered from the recent cache
+        with app.test_request_context():
+            session["token"] = {**rejected, "access_token": first[0]}
+            again = token_refresher().refresh_after_401(session)["access_token"]
+        assert state.token_requests - before == 2 and again != first[0]
@@ -0,0 +1,79 @@
+import threading, time
+from app.services.spotify import UpstreamCancelled
+from app.services.typeahead import TypeaheadEngine
+
+
+def _page(names, total=None):
+    items = [{"name": n, "artists": []} for n in names]
+    return {"items": items, "total": len(items) if total is None else total, "limit": 20, "offset": 0}
+
+
+def test_fetches_at_the_requested_limit_and_narrows_complete_results_locally():
+    calls = []
+
+    def search(session, q, types, *, limit, offset, market, cancelled):
+        calls.append((q, limit))
+        return 200, {"tracks": _page(["Radio Ga Ga", "Radioactive", "Creep"][:limit])}
+
+    engine = TypeaheadEngine(search)
+    status, data, source = engine.query(None, "u", "radi", "track", 5)
+    assert (status, source, calls) == (200, "upstream", [("radi", 5)])
+    status, data, source = engine.query(None, "u", "radioa", "track", 5)
+    assert source == "local" and [it["name"] for it in data["tracks"]["items"]] == ["Radioactive"]
+    assert len(calls) == 1
+
+
+def test_incomplete_results_are_not_narrowed_locally():
+    calls = []
+
+    def search(session, q, types, *, limit, offset, market, cancelled):
+        calls.append(q)
+        return 200, {"tracks": _page(["Radio"] * limit, total=1000)}
+
+    engine = TypeaheadEngine(search)
+    engine.query(None, "u", "ra", "track", 10)
+    assert engine.query(None, "u", "rad", "track", 10)[2] == "upstream"
+    assert calls == ["ra", "rad"]
+
+
+def _blocking_search(calls, gate, started):
+    def search(session, q, types, *, limit, offset, market, cancelled):
+        calls.append(q)
+        started.set()
+        gate.wait(5)
+        if cancelled():
+            raise UpstreamCancelled()
+        return 200, {"tracks": _page([q], total=1000)}
+    return search
+
+
+def _run(engine, results, key, user, q):
+    t = threading.Thread(target=lambda: results.__setitem__(key, engine.query(None, user, q, "track", 5)))
+    t.start()
+    return t
+
+
+def test_identical_queries_in_flight_share_one_call():
+    gate, started, calls, results = threading.Event(), threading.Event(), [], {}
+    engine = TypeaheadEngine(_blocking_search(calls, gate, started))
+    first = _run(engine, results, "a", "a", "abba")
+    started.wait(5)
+    second = _run(engine, results, "b", "b", "ABBA ")
+    time.sleep(0.1)  # let the second caller join the flight
+    gate.set()
+    first.join(5), second.join(5)
+    assert results["a"][0] == results["b"][0] == 200
+    assert calls == ["abba"]
+
+
+def test_a_newer_keystroke_supersedes_the_query_in_flight():
+    gate, started, calls, results = threading.Event(), threading.Event(), [], {}
+    engine = TypeaheadEngine(_blocking_search(calls, gate, started))
+    old = _run(engine, results, "old", "a", "abb")
+    started.wait(5)
+    new = _run(engine, results, "new", "a", "abba")
+    time.sleep(0.1)
+    gate.set()
+    old.join(5), new.join(5)
+    assert results["old"][:3:2] == (409, "superseded")
+    assert results["new"][0] == 200
@@ -27,14 +27,25 @@ export default function Dashboard() {
     setLoading(true);
     setErr(null);
     try {
-      const [rt, ra] = await Promise.all([
-        fetch(`${B}/api/me/top-tracks?limit=20&time_range=${time_range}`, { credentials: "include" }),
-        fetch(`${B}/api/me/top-artists?limit=20&time_range=${time_range}`, { credentials: "include" }),
-      ]);
-      if (!rt.ok) throw new Error(await rt.text());
-      if (!ra.ok) throw new Error(await ra.text());
-      const tracksJson = await rt.json();
-      const artistsJson = await ra.json();
+      // One round trip for both lists; the backend runs them concurrently
+      const r = await fetch(`${B}/api/batch`, {
+        method: "POST",
+        credentials: "include",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          requests: [
+            { method: "GET", path: `/me/top-tracks?limit=20&time_range=${time_range}` },
+            { method: "GET", path: `/me/top-artists?limit=20&time_range=${time_range}` },
+          ],
+        }),
+      });
+      if (!r.ok) throw new Error(await r.text());
+      const { responses } = await r.json();
+      const [rt, ra] = responses;
+      if (rt.status >= 400) throw new Error(JSON.stringify(rt.body));
+      if (ra.status >= 400) throw new Error(JSON.stringify(ra.body));
+      const tracksJson = rt.body;
+      const artistsJson = ra.body;
       setTracks(tracksJson.items || tracksJson.tracks || tracksJson);
       setArtists(artistsJson.items || artistsJson.artists || artistsJson);
     } catch (e: any) {
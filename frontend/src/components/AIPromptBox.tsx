@@ -13,7 +13,6 @@ type ResolvedTrack = {
   track?: { id: string; uri: string; name: string; artist_names: string[]; image?: string };
   artist?: { id: string; uri: string; name: string; image?: string };
 };
-type AIResponse = { candidates?: { artist?: string; track?: string }[] };
 
 export default function AIAssistOverlay() {
   const router = useRouter();
@@ -126,43 +125,44 @@ export default function AIAssistOverlay() {
     abortRef.current = ctrl;
 
     try {
-      // 1) ask your Flask AI route
-      const r1 = await fetch(`${B}/api/ai/chat`, {
+      // Stream: candidates resolve while the model is still writing the list,
+      // so rows show up one by one instead of all at the end.
+      const r = await fetch(`${B}/api/ai/recommend/stream`, {
         method: "POST",
         credentials: "include",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ prompt: p }),
         signal: ctrl.signal,
       });
-      if (!r1.ok) throw new Error(await r1.text());
-      const raw1 = await r1.json();
-      const ai: AIResponse = typeof raw1 === "string" ? JSON.parse(raw1) : raw1;
+      if (!r.ok || !r.body) throw new Error(await r.text());
 
-      const candidates = ai?.candidates ?? [];
-      if (!candidates.length) {
-        setResolved([]);
-        setErr(null);
-        return;
-      }
-
-      // 2) resolve to Spotify objects
-      const r2 = await fetch(`${B}/spotify-tools/resolve`, {
-        method: "POST",
-        credentials: "include",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ candidates }),
-        signal: ctrl.signal,
-      });
-      if (!r2.ok) throw new Error(await r2.text());
-      const raw2 = await r2.json();
-      const items: ResolvedTrack[] = raw2?.resolved ?? [];
-      setResolved(items);
+      setResolved([]);
       setFocusIndex(0);
-
-      queueMicrotask(() => {
-        const el = listRef.current?.querySelector('[data-idx="0"]') as HTMLElement | null;
-        el?.scrollIntoView({ block: "nearest" });
-      });
+      const byIndex = new Map<number, ResolvedTrack>();
+      const reader = r.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buf = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buf += value;
+        let sep: number;
+        while ((sep = buf.indexOf("\n\n")) >= 0) {
+          const frame = buf.slice(0, sep);
+          buf = buf.slice(sep + 2);
+          const ev = /^event: (.*)$/m.exec(frame)?.[1];
+          const data = /^data: (.*)$/m.exec(frame)?.[1];
+          if (!ev || !data) continue;
+          const msg = JSON.parse(data);
+          if (ev === "resolved" && (msg.track || msg.artist)) {
+            // keep the model's ordering even though lookups finish out of order
+            byIndex.set(msg.index, msg as ResolvedTrack);
+            setResolved([...byIndex.entries()].sort((a, b) => a[0] - b[0]).map(([, v]) => v));
+            setLoading(false);
+          } else if (ev === "error") {
+            setErr(msg.error || "AI request failed");
+          }
+        }
+      }
     } catch (e: any) {
       if (e?.name !== "AbortError") setErr(e?.message || "AI request failed");
     } finally {
@@ -1,8 +1,7 @@
 "use client";
 
 import { useEffect, useMemo, useRef, useState } from "react";
-
-const B = process.env.NEXT_PUBLIC_BACKEND_URL;
+import { usePlaybackStream } from "@/lib/playbackStream";
 
 type Artist = { name: string };
 type AlbumImage = { url: string; width: number; height: number };
@@ -33,41 +32,15 @@ function msToClock(ms: number) {
 
 export default function NowPlaying() {
   const [pb, setPb] = useState<Playback | null>(null);
-  const [loading, setLoading] = useState(false);
+  const ev = usePlaybackStream<Playback>();
   const timer = useRef<NodeJS.Timeout | null>(null);
 
-  const load = async () => {
-    setLoading(true);
-    try {
-      const r = await fetch(`${B}/api/player/current`, { credentials: "include" });
-      if (r.status === 204) {
-        setPb(null);
-        return;
-      }
-
-      // Any non-OK response → treat as no playback
-      if (!r.ok) {
-        setPb(null);
-        return;
-      }
-
-      // Some proxies/servers may return 200 with empty body; guard for that
-      const text = await r.text();
-      const data = text ? JSON.parse(text) : null;
-
-      // Spotify can return {} when idle; normalize to null for the UI
-      setPb(data && Object.keys(data).length ? data : null);
-    } finally {
-      setLoading(false);
-    }
-  };
-
-  // Poll every 4s; locally increment progress while playing for smooth UI
+  // Live state from the shared /api/player/stream; progress is advanced locally between events
   useEffect(() => {
-    load();
-    const poll = setInterval(load, 10000);
-    return () => clearInterval(poll);
-  }, []);
+    const data = ev?.status === 200 ? ev.playback : null;
+    // Spotify can return {} when idle; normalize to null for the UI
+    setPb(data && Object.keys(data).length ? data : null);
+  }, [ev]);
 
   useEffect(() => {
     if (timer.current) clearInterval(timer.current);
@@ -93,7 +66,7 @@ export default function NowPlaying() {
     return imgs.sort((a, b) => b.width - a.width)[imgs.length - 1]?.url || imgs[0]?.url || "";
   }, [pb?.item?.album?.images]);
 
-  if (loading && !pb) {
+  if (ev === undefined && !pb) {
     return <div className="text-sm opacity-70">Loading current playback…</div>;
   }
 
@@ -1,6 +1,7 @@
 "use client";
 
-import { useEffect, useRef, useState } from "react";
+import { useEffect, useState } from "react";
+import { usePlaybackStream } from "@/lib/playbackStream";
 
 const B = process.env.NEXT_PUBLIC_BACKEND_URL;
 
@@ -10,18 +11,10 @@ async function call(method: "PUT" | "POST", path: string) {
   if (!res.ok) throw new Error(await res.text());
 }
 
-// Fetch current playback state: expects { is_playing: boolean, ... }
-async function fetchPlaybackState(): Promise<boolean> {
-  const res = await fetch(`${B}/api/player/current`, { credentials: "include" });
-  if (!res.ok) throw new Error(await res.text());
-  const data = await res.json();
-  return Boolean(data?.is_playing);
-}
-
 export default function PlaybackControls() {
   const [loading, setLoading] = useState<string | null>(null);
   const [isPlaying, setIsPlaying] = useState<boolean | null>(null); // null = unknown (initial load)
-  const pollId = useRef<number | null>(null);
+  const ev = usePlaybackStream<{ is_playing?: boolean }>();
 
   // unified loading wrapper
   const wrap = (fn: () => Promise<void>, key: string) => async () => {
@@ -33,27 +26,12 @@ export default function PlaybackControls() {
     }
   };
 
-  // Initial load + light polling to stay in sync with external controls
+  // Stay in sync with the shared stream (external controls, other tabs, our own commands)
   useEffect(() => {
-    let cancelled = false;
-
-    const load = async () => {
-      try {
-        const playing = await fetchPlaybackState();
-        if (!cancelled) setIsPlaying(playing);
-      } catch {
-        if (!cancelled) setIsPlaying(null); // unknown
-      }
-    };
-
-    load();
-    pollId.current = window.setInterval(load, 5000);
-
-    return () => {
-      cancelled = true;
-      if (pollId.current) window.clearInterval(pollId.current);
-    };
-  }, []);
+    if (!ev) setIsPlaying(null); // unknown
+    else if (ev.status === 204) setIsPlaying(false);
+    else setIsPlaying(ev.status === 200 ? Boolean(ev.playback?.is_playing) : null);
+  }, [ev]);
 
   // Toggle handler chooses play or pause based on current state
   const togglePlayPause = async () => {
@@ -73,14 +51,8 @@ export default function PlaybackControls() {
       // Optional: surface the backend error
       console.error(err);
       alert(typeof err === "string" ? err : (err as Error).message);
-    } finally {
-      // Re-sync with the source of truth
-      try {
-        setIsPlaying(await fetchPlaybackState());
-      } catch {
-        /* ignore */
-      }
     }
+    // The command nudges the server's playback state, which comes back on the stream
   };
 
   const disableAll = loading !== null;
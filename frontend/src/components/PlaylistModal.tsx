@@ -89,6 +89,18 @@ export default function PlaylistModal({
     setError(null);
   }, [open, playlistId]);
 
+  // Closing the modal (or switching playlist) drops the backend's read-ahead page
+  useEffect(() => {
+    if (!open || !playlistId) return;
+    return () => {
+      void fetch(`${B}/api/prefetch?playlist_id=${encodeURIComponent(playlistId)}`, {
+        method: "DELETE",
+        credentials: "include",
+        keepalive: true,
+      }).catch(() => {});
+    };
+  }, [open, playlistId]);
+
   // Load me, meta, and first page
   useEffect(() => {
     if (!open || !playlistId) return;
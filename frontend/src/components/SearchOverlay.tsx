@@ -132,9 +132,10 @@ export default function SearchOverlay() {
       try {
         const types = "track,playlist,album,artist";
         const r = await fetch(
-          `${B}/api/search?q=${encodeURIComponent(debouncedQ)}&types=${encodeURIComponent(types)}&limit=10`,
+          `${B}/api/search?q=${encodeURIComponent(debouncedQ)}&types=${encodeURIComponent(types)}&limit=10&typeahead=1`,
           { credentials: "include", signal: ctrl.signal }
         );
+        if (r.status === 409) return; // superseded by a newer keystroke
         if (!r.ok) throw new Error(await r.text());
         const raw = await r.json();
         // Normalize common proxy shapes: {data: ...} or {body: ...}
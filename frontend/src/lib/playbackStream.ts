@@ -0,0 +1,67 @@
+"use client";
+
+import { useEffect, useState } from "react";
+
+const B = process.env.NEXT_PUBLIC_BACKEND_URL;
+
+// One `playback` event from /api/player/stream: status 200 with the state, 204 when idle
+export type PlaybackEvent<T> = { status: number; playback: T | null };
+
+// A single EventSource shared by every mounted component, so the dashboard holds one
+// connection however many widgets show playback
+let source: EventSource | null = null;
+let latest: PlaybackEvent<unknown> | null = null;
+let retry: ReturnType<typeof setTimeout> | null = null;
+const listeners = new Set<(ev: PlaybackEvent<unknown> | null) => void>();
+
+function emit(ev: PlaybackEvent<unknown> | null) {
+  latest = ev;
+  listeners.forEach((fn) => fn(ev));
+}
+
+function open() {
+  source = new EventSource(`${B}/api/player/stream`, { withCredentials: true });
+  source.addEventListener("playback", (e) => emit(JSON.parse((e as MessageEvent).data)));
+  source.onerror = () => {
+    // The browser reconnects by itself after a dropped connection; a non-200 answer
+    // (logged out, upstream down) closes the stream for good, so retry later ourselves
+    if (source?.readyState !== EventSource.CLOSED) return;
+    source = null;
+    emit(null);
+    retry = setTimeout(() => {
+      retry = null;
+      if (listeners.size) open();
+    }, 10000);
+  };
+}
+
+function close() {
+  source?.close();
+  source = null;
+  latest = null;
+  if (retry) clearTimeout(retry);
+  retry = null;
+}
+
+/**
+ * Live playback state for this session.
+ * undefined until the first event, null while the stream is unavailable.
+ */
+export function usePlaybackStream<T>(): PlaybackEvent<T> | null | undefined {
+  const [ev, setEv] = useState<PlaybackEvent<T> | null | undefined>(
+    () => (latest as PlaybackEvent<T> | null) ?? undefined
+  );
+
+  useEffect(() => {
+    const fn = (next: PlaybackEvent<unknown> | null) => setEv(next as PlaybackEvent<T> | null);
+    listeners.add(fn);
+    if (!source && !retry) open();
+    else if (latest) fn(latest);
+    return () => {
+      listeners.delete(fn);
+      if (!listeners.size) close();
+    };
+  }, []);
+
+  return ev;
+}